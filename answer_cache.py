@@ -0,0 +1,169 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+import numpy as np
+import logging
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+
+def normalize_question(text: str) -> str:
+    return re.sub(r"[^\w\s]", "", text.lower()).strip()
+
+
+# Words that point back into the conversation ("how much is it?", "and the villas?").
+FOLLOW_UP_RE = re.compile(
+    r"\b(?:it|its|this|that|these|those|they|them|their|same|above|previous|earlier|else)\b"
+    r"|^(?:and|but|so|or|also|then|what about|how about)\b")
+STANDALONE_MIN_WORDS = 3
+
+
+def is_standalone_question(text: str) -> bool:
+    """True if the question means the same in any conversation, so its answer can be shared.
+
+    Deliberately cautious: a standalone question that looks like a follow-up
+    only costs a cache miss, the reverse would send the wrong answer.
+    """
+    normalized = normalize_question(text)
+    return len(normalized.split()) >= STANDALONE_MIN_WORDS and not FOLLOW_UP_RE.search(normalized)
+
+
+class _Entry:
+    __slots__ = ("key", "text", "lead_state", "vector", "answer", "created")
+
+    def __init__(self, key: int, text: str, lead_state: str, vector: Optional[np.ndarray], answer: str):
+        self.key = key
+        self.text = text
+        self.lead_state = lead_state
+        self.vector = vector
+        self.answer = answer
+        self.created = time.monotonic()
+
+
+class SemanticAnswerCache:
+    """LRU/TTL cache of RAG answers, looked up by exact question text or query-embedding similarity.
+
+    Entries are only reused for the same lead state, and the whole cache is
+    dropped whenever the index it was filled from changes (see ``reset``).
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.logger = logging.getLogger("answer_cache")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.index_key = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_text = {}
+        self._next_key = 0
+        self._matrix = None
+        self._matrix_keys: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def reset(self, index_key: Optional[str] = None) -> None:
+        """Drop every entry; called when the underlying vector index is rebuilt or reloaded."""
+        with self._lock:
+            if self._entries:
+                self.logger.info(f"Invalidating {len(self._entries)} cached answers (index {self.index_key} -> {index_key})")
+            self.index_key = index_key
+            self._entries.clear()
+            self._by_text.clear()
+            self._matrix = None
+            self._matrix_keys = []
+
+    def _normalize_vector(self, vector: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return now - entry.created > self.ttl
+
+    def _hit(self, entry: _Entry) -> str:
+        self._entries.move_to_end(entry.key)
+        self.hits += 1
+        return entry.answer
+
+    def get_by_text(self, text: str, lead_state: str) -> Optional[str]:
+        """Exact (normalized) question match; needs no embedding call. Misses are not counted here."""
+        with self._lock:
+            entry = self._entries.get(self._by_text.get((normalize_question(text), lead_state)))
+            if entry is None:
+                return None
+            if self._expired(entry, time.monotonic()):
+                self._remove(entry.key)
+                return None
+            return self._hit(entry)
+
+    def get(self, vector: Sequence[float], lead_state: str) -> Optional[str]:
+        with self._lock:
+            if self._entries:
+                if self._matrix is None:
+                    self._matrix_keys = [k for k, e in self._entries.items() if e.vector is not None]
+                    if self._matrix_keys:
+                        self._matrix = np.stack([self._entries[k].vector for k in self._matrix_keys])
+                if self._matrix is not None:
+                    scores = self._matrix @ self._normalize_vector(vector)
+                    now = time.monotonic()
+                    for i in np.argsort(-scores):
+                        if scores[i] < self.threshold:
+                            break
+                        entry = self._entries[self._matrix_keys[i]]
+                        if entry.lead_state != lead_state:
+                            continue
+                        if self._expired(entry, now):
+                            self._remove(entry.key)
+                            break
+                        return self._hit(entry)
+            self.misses += 1
+            return None
+
+    def put(self, text: str, vector: Optional[Sequence[float]], lead_state: str, answer: str) -> None:
+        with self._lock:
+            if self.max_entries <= 0:
+                return
+            text_key = (normalize_question(text), lead_state)
+            if text_key in self._by_text:
+                self._remove(self._by_text[text_key])
+            key = self._next_key
+            self._next_key += 1
+            vec = self._normalize_vector(vector) if vector is not None else None
+            self._entries[key] = _Entry(key, text_key[0], lead_state, vec, answer)
+            self._by_text[text_key] = key
+            self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: int) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._by_text.pop((entry.text, entry.lead_state), None)
+        self._matrix = None
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "index_key": self.index_key,
+        }
@@ -1,11 +1,17 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 import uvicorn
-from sales_rag_bot import SalesRAGBot
+from app_factory import ServiceNotReady, create_app
 from fastapi.middleware.cors import CORSMiddleware
+from sse import stream_response
 
-app = FastAPI(
+# pdf_path = 'C:/Users/admin/Documents/Document/Bot/src/FSTC_Contact.pdf'
+pdf_path = '/home/ubuntu/WhatsappWithTwilio/Emaar_FAQ.pdf'
+# The chatbot loads in the background (APP_WARMUP); one conversation per session_id,
+# shared between workers when SESSION_STORE is sqlite or redis
+app = create_app(
+    pdf_path,
     title="Sales RAG Bot API",
     description="An API for interacting with the Sales RAG chatbot",
     version="1.0.0"
@@ -19,13 +25,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize the chatbot
-# pdf_path = 'C:/Users/admin/Documents/Document/Bot/src/FSTC_Contact.pdf'
-pdf_path = '/home/ubuntu/WhatsappWithTwilio/Emaar_FAQ.pdf'
-chatbot = SalesRAGBot(pdf_path)
-
 class ChatInput(BaseModel):
     message: str
+    # Omitted: every such request shares one conversation, as before sessions existed
+    session_id: str = "default"
 
 class ChatResponse(BaseModel):
     response: str
@@ -38,11 +41,23 @@ async def chat(chat_input: ChatInput):
     Process a chat message and return the bot's response
     """
     try:
-        result = chatbot.process_message(chat_input.message)
+        chatbot = await app.state.sessions.aget()
+        result = await chatbot.aprocess(chat_input.session_id, chat_input.message)
         return ChatResponse(
             response=result['response'],
             lead_info=result['lead_info'],
             lead_state=result['lead_state']
         )
+    except ServiceNotReady:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/chat/stream")
+async def chat_stream(chat_input: ChatInput):
+    """
+    Stream the bot's response as Server-Sent Events: 'token' events while the
+    answer is generated, then a 'final' event with response, lead_info and lead_state
+    """
+    chatbot = await app.state.sessions.aget()
+    return stream_response(chatbot.astream(chat_input.session_id, chat_input.message))
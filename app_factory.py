@@ -0,0 +1,203 @@
+import asyncio
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from metrics import CONTENT_TYPE, REGISTRY
+from session_store import create_session_store
+import logging
+
+if TYPE_CHECKING:
+    from sales_rag_bot import AgentResources
+    from session_manager import SessionManager
+
+# "background": start serving at once and load resources in a thread (readiness fails until done);
+# "lazy": load on the first request; "blocking": load before the server accepts connections.
+APP_WARMUP = os.getenv("APP_WARMUP", "background")
+WARMUP_MODES = ("background", "lazy", "blocking")
+# Question run through embedding + retrieval during warm-up, to open the OpenAI connection; empty skips it.
+APP_WARMUP_QUERY = os.getenv("APP_WARMUP_QUERY", "What projects does Emaar offer?")
+APP_WARMUP_SALESFORCE = os.getenv("APP_WARMUP_SALESFORCE", "true").lower() in ("1", "true", "yes")
+# Seconds between load attempts in background mode after a failure.
+APP_WARMUP_RETRY_INTERVAL = float(os.getenv("APP_WARMUP_RETRY_INTERVAL", "30"))
+# How long a request waits for resources that are still loading before getting a 503.
+APP_REQUEST_WAIT = float(os.getenv("APP_REQUEST_WAIT", "30"))
+
+
+class ServiceNotReady(Exception):
+    pass
+
+
+class LazySessions:
+    """The SessionManager and the AgentResources under it, built off the startup path.
+
+    Loading covers the PDF index, a warm-up retrieval and Salesforce
+    authentication. Only the index is required: warm-up failures are reported
+    by ``status`` but do not keep the service from becoming ready, so an
+    unreachable Salesforce never stops the process from serving answers.
+    """
+
+    def __init__(self, pdf_path: str, mode: str = APP_WARMUP,
+                 resources_factory: Optional[Callable[[str], "AgentResources"]] = None):
+        self.logger = logging.getLogger("app_factory")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        if mode not in WARMUP_MODES:
+            raise ValueError(f"Unknown APP_WARMUP {mode!r}, expected one of {WARMUP_MODES}")
+        self.pdf_path = pdf_path
+        self.mode = mode
+        self.resources_factory = resources_factory
+        self.sessions: Optional["SessionManager"] = None
+        self.state = "cold"
+        self.error: Optional[str] = None
+        self.warmup = {}
+        self._lock = threading.Lock()
+        # Set whenever no load attempt is running.
+        self._settled = threading.Event()
+        self._settled.set()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.mode == "blocking":
+            # Fail the boot, as before, if the index can't be built.
+            self._load()
+        elif self.mode == "background":
+            self._ensure_loading()
+
+    def _ensure_loading(self) -> None:
+        with self._lock:
+            if self.sessions is not None or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._settled.clear()
+            self.state = "loading"
+            self._thread = threading.Thread(target=self._load_until_ready, name="warm-up", daemon=True)
+            self._thread.start()
+
+    def _load_until_ready(self) -> None:
+        try:
+            while True:
+                try:
+                    self._load()
+                    return
+                except Exception as e:
+                    self.state, self.error = "failed", f"{type(e).__name__}: {e}"
+                    self.logger.error(f"Loading agent resources failed: {self.error}")
+                    if self.mode == "lazy":
+                        # The next request tries again.
+                        return
+                # Requests meanwhile get a 503 at once instead of waiting out the retry.
+                self._settled.set()
+                time.sleep(APP_WARMUP_RETRY_INTERVAL)
+                self._settled.clear()
+        finally:
+            self._settled.set()
+
+    def _load(self) -> None:
+        started = time.perf_counter()
+        self.state = "loading"
+        # Imported here: langchain and the OpenAI client alone take seconds to import.
+        from sales_rag_bot import AgentResources
+        from session_manager import SessionManager
+        resources = (self.resources_factory or AgentResources)(self.pdf_path)
+        warmup = {"index_seconds": round(time.perf_counter() - started, 3)}
+        if APP_WARMUP_QUERY:
+            warmup["retrieval"] = self._warm(lambda: resources.pdf_qa_tool.get_context(APP_WARMUP_QUERY))
+        if APP_WARMUP_SALESFORCE:
+            warmup["salesforce"] = self._warm(lambda: resources.salesforce.warm_up())
+        sessions = SessionManager(resources, store=create_session_store())
+        warmup["seconds"] = round(time.perf_counter() - started, 3)
+        self.warmup = warmup
+        self.sessions = sessions
+        self.state, self.error = "ready", None
+        self.logger.info(f"Agent resources ready: {warmup}")
+
+    def _warm(self, step: Callable[[], object]) -> str:
+        try:
+            step()
+            return "ok"
+        except Exception as e:
+            self.logger.warning(f"Warm-up step failed, continuing: {e}")
+            return f"failed: {type(e).__name__}: {e}"
+
+    def _not_ready(self) -> ServiceNotReady:
+        return ServiceNotReady(self.error or f"Agent resources are {self.state}")
+
+    def get(self, timeout: float = APP_REQUEST_WAIT) -> "SessionManager":
+        if self.sessions is not None:
+            return self.sessions
+        if self.mode == "lazy":
+            self._ensure_loading()
+        elif self.state == "failed":
+            raise self._not_ready()
+        self._settled.wait(timeout)
+        if self.sessions is None:
+            raise self._not_ready()
+        return self.sessions
+
+    async def aget(self, timeout: float = APP_REQUEST_WAIT) -> "SessionManager":
+        if self.sessions is not None:
+            return self.sessions
+        return await asyncio.to_thread(self.get, timeout)
+
+    def status(self) -> dict:
+        return {"status": self.state, "error": self.error, "warmup": self.warmup}
+
+    async def aclose(self) -> None:
+        sessions = self.sessions
+        if sessions is None:
+            return
+        sessions.resources.salesforce.close()
+        await sessions.resources.salesforce.aclose()
+        if sessions.store is not None:
+            sessions.store.close()
+
+
+def create_app(pdf_path: str, **fastapi_kwargs) -> FastAPI:
+    """FastAPI app shared by main.py, app.py and whatsapptwilio.py.
+
+    Starts in well under a second: the agent's resources load per APP_WARMUP and
+    are reached through ``app.state.sessions`` (a LazySessions). Provides
+    ``/healthz`` (liveness), ``/readyz`` (readiness, 503 until warm) and ``/metrics``.
+    """
+    app = FastAPI(**fastapi_kwargs)
+    sessions = LazySessions(pdf_path)
+    app.state.sessions = sessions
+
+    @app.on_event("startup")
+    async def start_loading():
+        if sessions.mode == "blocking":
+            await asyncio.to_thread(sessions.start)
+        else:
+            sessions.start()
+
+    @app.on_event("shutdown")
+    async def close_resources():
+        await sessions.aclose()
+
+    @app.exception_handler(ServiceNotReady)
+    async def not_ready_handler(request: Request, exc: ServiceNotReady):
+        return JSONResponse({"error": "Service is warming up, please retry shortly.", "detail": str(exc)},
+                            status_code=503, headers={"Retry-After": "5"})
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    async def readyz():
+        status = sessions.status()
+        # Lazy mode loads on the first request, so the worker takes traffic while cold by design.
+        ready = sessions.sessions is not None or (sessions.mode == "lazy" and sessions.state != "failed")
+        return JSONResponse(status, status_code=200 if ready else 503)
+
+    @app.get("/metrics")
+    async def metrics():
+        return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+    return app
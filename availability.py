@@ -0,0 +1,77 @@
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Dict, Iterable, List, Optional, Tuple
+import pytz
+
+Interval = Tuple[datetime, datetime]
+
+
+def parse_sf_datetime(value: str) -> datetime:
+    """Salesforce returns '2024-05-01T09:00:00.000+0000'; also accept plain ISO 8601."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+    except ValueError:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sort and merge overlapping or touching busy intervals."""
+    merged: List[Interval] = []
+    for start, end in sorted(i for i in intervals if i[1] > i[0]):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class BusyCalendar:
+    """Merged busy intervals with O(log n) overlap checks."""
+
+    def __init__(self, intervals: Iterable[Interval]):
+        self.intervals = merge_intervals(intervals)
+        self._starts = [start for start, _ in self.intervals]
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        # The only merged interval that can overlap [start, end) is the last one starting before `end`.
+        i = bisect_left(self._starts, end) - 1
+        return i < 0 or self.intervals[i][1] <= start
+
+
+def compute_availability(busy: Iterable[Interval], start_date: date, days: int = 1,
+                         work_start: time = time(8, 0), work_end: time = time(17, 0),
+                         slot_minutes: int = 30, tz: tzinfo = pytz.utc,
+                         not_before: Optional[datetime] = None) -> Dict[str, List[str]]:
+    """Free 'HH:MM' slots per ISO date between ``work_start`` and ``work_end`` in ``tz``.
+
+    A slot is free only if no busy interval overlaps any part of it, so events
+    that span several slots or start off the slot grid block every slot they touch.
+    """
+    calendar = BusyCalendar(busy)
+    step = timedelta(minutes=slot_minutes)
+    availability: Dict[str, List[str]] = {}
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        current = _localize(tz, datetime.combine(day, work_start))
+        day_end = _localize(tz, datetime.combine(day, work_end))
+        slots = []
+        while current + step <= day_end:
+            if (not_before is None or current >= not_before) and calendar.is_free(current, current + step):
+                slots.append(current.strftime("%H:%M"))
+            current += step
+        availability[day.isoformat()] = slots
+    return availability
+
+
+def _localize(tz: tzinfo, naive: datetime) -> datetime:
+    if hasattr(tz, "localize"):
+        return tz.localize(naive)
+    return naive.replace(tzinfo=tz)
+
+
+def day_bounds(tz: tzinfo, start_date: date, days: int) -> Interval:
+    """UTC [start, end) covering ``days`` whole days from ``start_date`` in ``tz``."""
+    start = _localize(tz, datetime.combine(start_date, time.min)).astimezone(pytz.utc)
+    end = _localize(tz, datetime.combine(start_date + timedelta(days=days), time.min)).astimezone(pytz.utc)
+    return start, end
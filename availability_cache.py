@@ -0,0 +1,136 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+import logging
+from metrics import CACHE_LOOKUPS
+
+SLOT_CACHE_TTL = float(os.getenv("SLOT_CACHE_TTL", "60"))
+
+SlotMap = Dict[str, List[str]]
+
+
+class AvailabilityCache:
+    """Process-wide cache of free meeting slots shared by every conversation.
+
+    Entries are per-day slot maps (ISO date -> ['HH:MM', ...]) keyed by the query
+    that produced them. Concurrent misses for the same key are collapsed into one
+    Salesforce query (one in flight per process for sync callers and one per
+    event loop for async callers), failed fetches (``None``) are never cached,
+    and ``remove_slot`` applies a booking immediately, including to fetches that
+    are still in flight.
+    """
+
+    def __init__(self, ttl: float = SLOT_CACHE_TTL):
+        self.logger = logging.getLogger("availability_cache")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.ttl = ttl
+        self.hits = 0
+        self.fetches = 0
+        self._entries: Dict[Hashable, Tuple[float, SlotMap]] = {}
+        self._booked_during_fetch: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._ainflight: Dict[Hashable, asyncio.Future] = {}
+
+    def _copy(self, slot_map: SlotMap) -> SlotMap:
+        return {day: list(slots) for day, slots in slot_map.items()}
+
+    def _fresh(self, key: Hashable) -> Optional[SlotMap]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self.hits += 1
+            CACHE_LOOKUPS.inc(cache="availability", result="hit")
+            return self._copy(entry[1])
+        return None
+
+    def _store(self, key: Hashable, slot_map: Optional[SlotMap]) -> Optional[SlotMap]:
+        with self._lock:
+            now = time.monotonic()
+            # Keys embed the start date, so old days simply age out here.
+            for stale in [k for k, (at, _) in self._entries.items() if now - at >= self.ttl]:
+                del self._entries[stale]
+            if slot_map is None:
+                return None
+            slot_map = {
+                day: [s for s in slots if (day, s) not in self._booked_during_fetch]
+                for day, slots in slot_map.items()
+            }
+            self._entries[key] = (now, slot_map)
+            return self._copy(slot_map)
+
+    def _fetch_done(self) -> None:
+        if not self._inflight and not self._ainflight:
+            self._booked_during_fetch.clear()
+
+    def get(self, key: Hashable, fetch: Callable[[], Optional[SlotMap]]) -> Optional[SlotMap]:
+        with self._lock:
+            cached = self._fresh(key)
+            if cached is not None:
+                return cached
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        CACHE_LOOKUPS.inc(cache="availability", result="miss" if leader else "coalesced")
+        if not leader:
+            event.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+                return self._copy(entry[1]) if entry is not None else None
+        try:
+            self.fetches += 1
+            return self._store(key, fetch())
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                self._fetch_done()
+            event.set()
+
+    async def aget(self, key: Hashable, fetch: Callable[[], Awaitable[Optional[SlotMap]]]) -> Optional[SlotMap]:
+        with self._lock:
+            cached = self._fresh(key)
+            if cached is not None:
+                return cached
+            future = self._ainflight.get(key)
+        if future is not None and not future.done():
+            CACHE_LOOKUPS.inc(cache="availability", result="coalesced")
+            result = await asyncio.shield(future)
+            return self._copy(result) if result is not None else None
+        CACHE_LOOKUPS.inc(cache="availability", result="miss")
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._ainflight[key] = future
+        try:
+            self.fetches += 1
+            slot_map = self._store(key, await fetch())
+            future.set_result(slot_map)
+            return self._copy(slot_map) if slot_map is not None else None
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting on the future; retrieve the exception so it is not logged as unhandled.
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                self._ainflight.pop(key, None)
+                self._fetch_done()
+
+    def remove_slot(self, day: str, slot: str) -> None:
+        with self._lock:
+            for _, slot_map in self._entries.values():
+                if slot in slot_map.get(day, ()):
+                    slot_map[day].remove(slot)
+            if self._inflight or self._ainflight:
+                self._booked_during_fetch.add((day, slot))
+        self.logger.info(f"Removed booked slot {day} {slot} from availability cache")
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,69 @@
+"""Per-turn latency of PDFQATool.answer in each answer mode, against a stub LLM.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_answer_modes --turns 20 --latency 0.2
+
+The questions repeat, so the answer cache is off unless --with-cache adds a
+second, cached row per mode; the FAQ fast path is off throughout.
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+from answer_cache import SemanticAnswerCache
+from benchmarks.fakes import FakeChatModel, fake_embeddings, fake_vector_store
+from faq_index import FAQIndex
+from pdf_qa_tool import PDFQATool, ANSWER_MODES
+
+QUESTIONS = [
+    "Where is Emaar Beachfront?",
+    "What payment plans do you have?",
+    "Do you have villas in Dubai Hills?",
+    "Is there a post-handover plan?",
+]
+
+
+def run_mode(mode: str, turns: int, latency: float, cached: bool = False) -> dict:
+    llm = FakeChatModel(latency=latency)
+    embeddings = fake_embeddings()
+    # max_entries 0: nothing is ever stored, so every turn reaches the LLM.
+    answer_cache = SemanticAnswerCache() if cached else SemanticAnswerCache(max_entries=0)
+    tool = PDFQATool(None, answer_mode=mode, llm=llm, embeddings=embeddings, vector_store=fake_vector_store(embeddings),
+                     answer_cache=answer_cache, faq_index=FAQIndex())
+    history = []
+    timings = []
+    for i in range(turns):
+        message = QUESTIONS[i % len(QUESTIONS)]
+        history.append(f"Human: {message}")
+        start = time.perf_counter()
+        reply = tool.answer(message, history, {}, "no_interest")
+        timings.append(time.perf_counter() - start)
+        history.append(f"Assistant: {reply}")
+    return {
+        "mode": mode,
+        "cache": "on" if cached else "off",
+        "p50_ms": statistics.median(timings) * 1000,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "llm_calls_per_turn": llm.calls / turns,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency per call, seconds")
+    parser.add_argument("--with-cache", action="store_true", help="also run each mode with the answer cache on")
+    args = parser.parse_args()
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    logging.disable(logging.INFO)
+    print(f"{'mode':<12} {'cache':>6} {'p50 ms':>10} {'mean ms':>10} {'llm calls/turn':>16}")
+    for mode in ANSWER_MODES:
+        for cached in ((False, True) if args.with_cache else (False,)):
+            r = run_mode(mode, args.turns, args.latency, cached)
+            print(f"{r['mode']:<12} {r['cache']:>6} {r['p50_ms']:>10.1f} {r['mean_ms']:>10.1f} {r['llm_calls_per_turn']:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
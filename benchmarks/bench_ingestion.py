@@ -0,0 +1,55 @@
+"""Ingestion throughput (pages/s, chunks/s) for the given PDFs with stub embeddings.
+
+Compares serial parsing and embedding with the parallel pipeline; page parsing
+only speeds up with more than one CPU. Run from the repository root:
+
+    python -m benchmarks.bench_ingestion Emaar_FAQ.pdf --workers 4 --embed-latency 0.2
+"""
+import argparse
+import logging
+import time
+from typing import List
+from benchmarks.fakes import fake_embeddings
+from langchain_core.embeddings import Embeddings
+from ingestion import INGEST_WORKERS, IngestionPipeline
+
+
+class SlowEmbeddings(Embeddings):
+    """Stub embeddings that sleep per batch, like a remote embedding API."""
+
+    def __init__(self, latency: float):
+        self.inner = fake_embeddings()
+        self.latency = latency
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+
+def run(paths: List[str], workers: int, concurrency: int, batch_size: int, latency: float) -> dict:
+    pipeline = IngestionPipeline(SlowEmbeddings(latency), workers=workers, batch_size=batch_size,
+                                 embed_concurrency=concurrency)
+    return pipeline.ingest(paths).stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="page parsing processes (default: min(4, CPUs))")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=128)
+    parser.add_argument("--embed-latency", type=float, default=0.2, help="stub embedding latency per batch, seconds")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'run':<10} {'pages':>6} {'chunks':>7} {'seconds':>8} {'pages/s':>8} {'chunks/s':>9}")
+    for name, workers, concurrency in (("serial", 1, 1), ("parallel", args.workers, args.concurrency)):
+        s = run(args.pdfs, workers, concurrency, args.batch_size, args.embed_latency)
+        print(f"{name:<10} {s['pages']:>6} {s['chunks']:>7} {s['seconds']:>8.2f} {s['pages_per_sec']:>8.1f} {s['chunks_per_sec']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Per-call latency of SalesforceAPI against a local fake, pooled vs. one connection per call.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_salesforce_client --calls 200
+"""
+import argparse
+import logging
+import statistics
+import time
+import requests
+from benchmarks.fake_salesforce import FakeSalesforce
+from salesforce_api import SalesforceAPI
+
+LEAD = {"Name": "Bench Lead", "Company": "Iquestbee Technology", "Email": "bench@example.com", "Phone": "+971500000000"}
+
+
+def bench_pooled(fake: FakeSalesforce, calls: int) -> list:
+    api = SalesforceAPI(auth_url=fake.auth_url)
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        ok, _ = api.create_lead(LEAD)
+        timings.append(time.perf_counter() - start)
+        assert ok
+    api.close()
+    return timings
+
+
+def bench_unpooled(fake: FakeSalesforce, calls: int) -> list:
+    token = requests.post(fake.auth_url, data={"grant_type": "client_credentials"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        response = requests.post(f"{fake.url}/services/data/v60.0/sobjects/Lead/", headers=headers, json=LEAD)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 201
+    return timings
+
+
+def check_recovery(fake: FakeSalesforce) -> None:
+    api = SalesforceAPI(auth_url=fake.auth_url, backoff_factor=0.01)
+    api.create_lead(LEAD)
+    fake.expire_tokens()
+    before = fake.token_requests
+    assert api.create_lead(LEAD)[0], "401 should trigger one refresh and a retry"
+    assert fake.token_requests == before + 1
+    fake.fail_next(503, 2)
+    assert api.create_lead(LEAD)[0], "503 should be retried with backoff"
+    api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    for name, bench in (("unpooled", bench_unpooled), ("pooled", bench_pooled)):
+        with FakeSalesforce() as fake:
+            timings = bench(fake, args.calls)
+            print(f"{name:<9} p50 {statistics.median(timings) * 1000:6.2f} ms  "
+                  f"mean {statistics.mean(timings) * 1000:6.2f} ms  connections {fake.connections}")
+    with FakeSalesforce() as fake:
+        check_recovery(fake)
+        print("401 refresh and 5xx retry: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Local stand-in for the Salesforce OAuth and REST endpoints used by SalesforceAPI."""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class FakeSalesforce:
+    """Serves /services/oauth2/token, sobjects/Lead, sobjects/Event and query on 127.0.0.1.
+
+    ``latency`` is added to every response. ``fail_next(status, n)`` makes the next
+    n API calls return ``status`` and ``expire_tokens()`` makes the current token
+    answer 401, to exercise retry and refresh paths.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.events = []
+        self.leads = {}
+        self.connections = 0
+        self.requests = 0
+        self.token_requests = 0
+        self.queries = 0
+        self._valid_tokens = set()
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    @property
+    def auth_url(self) -> str:
+        return f"{self.url}/services/oauth2/token"
+
+    def start(self) -> "FakeSalesforce":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def fail_next(self, status: int, count: int = 1) -> None:
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def expire_tokens(self) -> None:
+        with self._lock:
+            self._valid_tokens.clear()
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return self.rfile.read(length) if length else b""
+
+            def _authorized(self):
+                token = (self.headers.get("Authorization") or "").replace("Bearer ", "")
+                with fake._lock:
+                    return token in fake._valid_tokens
+
+            def _injected_failure(self):
+                with fake._lock:
+                    return fake._failures.pop(0) if fake._failures else None
+
+            def _api(self, method):
+                body = self._body()
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake._lock:
+                    fake.requests += 1
+                path = urlparse(self.path).path
+                if path == "/services/oauth2/token":
+                    token = uuid.uuid4().hex
+                    with fake._lock:
+                        fake.token_requests += 1
+                        fake._valid_tokens.add(token)
+                    return self._send(200, {"access_token": token, "instance_url": fake.url})
+                if not self._authorized():
+                    return self._send(401, [{"errorCode": "INVALID_SESSION_ID"}])
+                failure = self._injected_failure()
+                if failure:
+                    return self._send(failure, [{"errorCode": "SERVER_UNAVAILABLE"}])
+                if method == "POST" and path.endswith("/sobjects/Lead/"):
+                    lead_id = "00Q" + uuid.uuid4().hex[:15]
+                    with fake._lock:
+                        fake.leads[lead_id] = json.loads(body or b"{}")
+                    return self._send(201, {"id": lead_id, "success": True})
+                if method == "POST" and path.endswith("/sobjects/Event/"):
+                    event = json.loads(body or b"{}")
+                    with fake._lock:
+                        fake.events.append(event)
+                    return self._send(201, {"id": "00U" + uuid.uuid4().hex[:15], "success": True})
+                if method == "GET" and path.endswith("/query"):
+                    with fake._lock:
+                        fake.queries += 1
+                        records = [
+                            {"StartDateTime": fake._sf_datetime(e["StartDateTime"]), "EndDateTime": fake._sf_datetime(e["EndDateTime"])}
+                            for e in fake.events
+                        ]
+                    return self._send(200, {"totalSize": len(records), "done": True, "records": records})
+                return self._send(404, [{"errorCode": "NOT_FOUND"}])
+
+            def do_GET(self):
+                self._api("GET")
+
+            def do_POST(self):
+                self._api("POST")
+
+        return Handler
+
+    @staticmethod
+    def _sf_datetime(value: str) -> str:
+        """ISO 8601 as sent by the client -> Salesforce's '2024-01-01T09:00:00.000+0000' form."""
+        from datetime import datetime, timezone
+        dt = datetime.fromisoformat(value).astimezone(timezone.utc)
+        return dt.strftime("%Y-%m-%dT%H:%M:%S.000+0000")
@@ -0,0 +1,84 @@
+"""Deterministic stand-ins for OpenAI so benchmarks run offline and for free."""
+import asyncio
+import re
+import time
+from typing import AsyncIterator, Callable, Iterator, List, Optional
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_community.vectorstores import FAISS
+
+
+def default_responder(prompt: str) -> str:
+    if "Extract contact information" in prompt:
+        return '{"Name": null, "Company": null, "Email": null, "Phone": null}'
+    if "identify the main topic" in prompt:
+        return "Emaar projects"
+    if "Topic: " in prompt:
+        return "Topic: Emaar projects\nEmaar has several projects in Dubai."
+    return "Emaar has several projects in Dubai."
+
+
+class FakeChatModel:
+    """Drop-in for ChatOpenAI invoke/ainvoke/stream/astream with a fixed per-call latency.
+
+    Streaming calls wait ``latency`` before the first token and ``token_latency``
+    between the following ones.
+    """
+
+    def __init__(self, latency: float = 0.05, responder: Optional[Callable[[str], str]] = None,
+                 token_latency: float = 0.0):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.responder = responder or default_responder
+        self.calls = 0
+
+    def invoke(self, prompt: str) -> AIMessage:
+        self.calls += 1
+        time.sleep(self.latency)
+        return AIMessage(content=self.responder(prompt))
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.responder(prompt))
+
+    def _tokens(self, prompt: str) -> List[str]:
+        return re.findall(r"\S+\s*|\s+", self.responder(prompt))
+
+    def stream(self, prompt: str) -> Iterator[AIMessageChunk]:
+        self.calls += 1
+        time.sleep(self.latency)
+        for i, token in enumerate(self._tokens(prompt)):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            yield AIMessageChunk(content=token)
+
+    async def astream(self, prompt: str) -> AsyncIterator[AIMessageChunk]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(self._tokens(prompt)):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield AIMessageChunk(content=token)
+
+
+def fake_embeddings(size: int = 256) -> DeterministicFakeEmbedding:
+    return DeterministicFakeEmbedding(size=size)
+
+
+FAQ_TEXTS: List[str] = [
+    "Emaar Properties is a Dubai-based real estate developer behind Burj Khalifa and Dubai Mall.",
+    "Emaar Beachfront offers 1, 2 and 3 bedroom apartments with private beach access.",
+    "Dubai Hills Estate includes villas, townhouses and apartments around an 18-hole golf course.",
+    "Payment plans typically require 10% on booking and the balance spread over construction milestones.",
+    "Arabian Ranches is a villa community with schools, retail and equestrian facilities.",
+    "Off-plan buyers receive a Dubai Land Department registration certificate (Oqood).",
+    "Emaar offers post-handover payment plans on selected projects.",
+    "Creek Harbour is a waterfront development next to the Ras Al Khor wildlife sanctuary.",
+]
+
+
+def fake_vector_store(embeddings=None, texts: List[str] = FAQ_TEXTS) -> FAISS:
+    docs = [Document(page_content=t, metadata={"source": "fake_faq", "page": i}) for i, t in enumerate(texts)]
+    return FAISS.from_documents(docs, embedding=embeddings or fake_embeddings())
@@ -0,0 +1,212 @@
+import os
+import re
+import threading
+from typing import List, Optional, Sequence
+import numpy as np
+from langchain_core.documents import Document
+import logging
+
+# Approximate prompt tokens the retrieved context may use.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+# Chunks fetched from the index before deduplication and packing.
+CONTEXT_FETCH_K = int(os.getenv("CONTEXT_FETCH_K", "8"))
+# Chunks at least this similar (cosine) to a better-scoring one are dropped.
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.97"))
+# Diversity-aware (MMR) ordering of the candidates; lambda 1.0 is pure relevance.
+CONTEXT_MMR = os.getenv("CONTEXT_MMR", "false").lower() in ("1", "true", "yes")
+CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+# Shortest shared prefix/suffix treated as splitter overlap between two chunks.
+MIN_MERGE_OVERLAP = 20
+TOKENIZER_ENCODING = "o200k_base"
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in ``text`` with tiktoken, or ~4 characters per token when its encoding can't be loaded."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception:
+                    # tiktoken downloads its encodings on first use; offline we estimate.
+                    _encoder = False
+    if _encoder is False:
+        return (len(text) + 3) // 4
+    return len(_encoder.encode(text, disallowed_special=()))
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of ``a`` that is also a prefix of ``b``."""
+    if len(b) < MIN_MERGE_OVERLAP:
+        return 0
+    start = max(1, len(a) - len(b) + 1)
+    head = b[:MIN_MERGE_OVERLAP]
+    while True:
+        # Earliest match is the longest overlap.
+        p = a.find(head, start)
+        if p < 0:
+            return 0
+        if b.startswith(a[p:]):
+            return len(a) - p
+        start = p + 1
+
+
+class Candidate:
+    __slots__ = ("doc", "score", "vector")
+
+    def __init__(self, doc: Document, score: float, vector: Optional[np.ndarray]):
+        self.doc = doc
+        self.score = score
+        self.vector = vector
+
+
+class ContextAssembler:
+    """Turns retrieved chunks into a compact context: duplicates dropped, overlapping
+    neighbours merged, best content packed into a token budget.
+
+    Everything after the index search runs locally on the already-retrieved
+    vectors; no extra embedding calls are made.
+    """
+
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, fetch_k: int = CONTEXT_FETCH_K,
+                 dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD, mmr: bool = CONTEXT_MMR,
+                 mmr_lambda: float = CONTEXT_MMR_LAMBDA):
+        self.logger = logging.getLogger("context_assembler")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.token_budget = token_budget
+        self.fetch_k = fetch_k
+        self.dedup_threshold = dedup_threshold
+        self.mmr = mmr
+        self.mmr_lambda = mmr_lambda
+
+    def retrieve(self, store, vector: Sequence[float]) -> List[Candidate]:
+        """Top ``fetch_k`` chunks with their cosine similarity to the query and their stored vectors."""
+        raw = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        query = raw[0] / (np.linalg.norm(raw) or 1)
+        # Search the way the store itself would, so ranking matches similarity_search.
+        _, positions = store.index.search(query.reshape(1, -1) if getattr(store, "_normalize_L2", False) else raw, self.fetch_k)
+        candidates = []
+        for position in positions[0]:
+            if position < 0:
+                continue
+            doc = store.docstore.search(store.index_to_docstore_id[int(position)])
+            if not isinstance(doc, Document):
+                continue
+            try:
+                v = store.index.reconstruct(int(position))
+                v = v / (np.linalg.norm(v) or 1)
+                candidates.append(Candidate(doc, float(v @ query), v))
+            except RuntimeError:
+                # Index type without stored vectors: rank only, no similarity-based steps.
+                candidates.append(Candidate(doc, 1.0 - len(candidates) / self.fetch_k, None))
+        return candidates
+
+    def assemble(self, candidates: List[Candidate]) -> List[Document]:
+        kept = self._dedupe(sorted(candidates, key=lambda c: -c.score))
+        merged = self._merge_overlaps(kept)
+        ordered = self._mmr_order(merged) if self.mmr else merged
+        packed = self._pack(ordered)
+        self.logger.info(
+            f"[RAG] Context: {len(candidates)} retrieved, {len(candidates) - len(kept)} duplicates dropped, "
+            f"{len(kept) - len(merged)} merged, {len(packed)} chunks sent"
+        )
+        return packed
+
+    def _dedupe(self, candidates: List[Candidate]) -> List[Candidate]:
+        kept: List[Candidate] = []
+        for c in candidates:
+            text = _normalize(c.doc.page_content)
+            duplicate = False
+            for k in kept:
+                if text in _normalize(k.doc.page_content):
+                    duplicate = True
+                elif c.vector is not None and k.vector is not None and float(c.vector @ k.vector) >= self.dedup_threshold:
+                    duplicate = True
+                if duplicate:
+                    break
+            if not duplicate:
+                kept.append(c)
+        return kept
+
+    def _merge_overlaps(self, candidates: List[Candidate]) -> List[Candidate]:
+        """Join chunks of the same page whose text overlaps (the splitter's chunk_overlap)."""
+        merged = list(candidates)
+        changed = True
+        # Chunks arrive in score order, not text order, so repeat until no pair joins.
+        while changed:
+            changed = False
+            for i in range(len(merged)):
+                for j in range(i + 1, len(merged)):
+                    joined = self._join(merged[i], merged[j])
+                    if joined is not None:
+                        merged[i] = joined
+                        del merged[j]
+                        changed = True
+                        break
+                if changed:
+                    break
+        return merged
+
+    def _join(self, first: Candidate, second: Candidate) -> Optional[Candidate]:
+        meta = first.doc.metadata
+        if (meta.get("source"), meta.get("page")) != (second.doc.metadata.get("source"), second.doc.metadata.get("page")):
+            return None
+        a, b = first.doc.page_content, second.doc.page_content
+        if not _overlap(a, b):
+            a, b = b, a
+        n = _overlap(a, b)
+        if not n:
+            return None
+        return Candidate(Document(page_content=a + b[n:], metadata=dict(meta)),
+                         max(first.score, second.score), self._mean(first.vector, second.vector))
+
+    def _mean(self, a: Optional[np.ndarray], b: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if a is None or b is None:
+            return a if b is None else b
+        v = a + b
+        return v / (np.linalg.norm(v) or 1)
+
+    def _mmr_order(self, candidates: List[Candidate]) -> List[Candidate]:
+        """Order by maximal marginal relevance: relevance minus similarity to what is already chosen."""
+        if any(c.vector is None for c in candidates):
+            return candidates
+        remaining = list(candidates)
+        ordered: List[Candidate] = []
+        while remaining:
+            def mmr_score(c: Candidate) -> float:
+                redundancy = max((float(c.vector @ o.vector) for o in ordered), default=0.0)
+                return self.mmr_lambda * c.score - (1 - self.mmr_lambda) * redundancy
+            best = max(remaining, key=mmr_score)
+            remaining.remove(best)
+            ordered.append(best)
+        return ordered
+
+    def _pack(self, candidates: List[Candidate]) -> List[Document]:
+        """Greedily take chunks in order while they fit; the first one is truncated rather than dropped."""
+        packed: List[Document] = []
+        used = 0
+        for c in candidates:
+            tokens = count_tokens(c.doc.page_content)
+            if used + tokens <= self.token_budget:
+                packed.append(c.doc)
+                used += tokens
+            elif not packed:
+                # Roughly cut to the budget; the best chunk is never left out entirely.
+                text = c.doc.page_content[:len(c.doc.page_content) * self.token_budget // tokens]
+                packed.append(Document(page_content=text, metadata=dict(c.doc.metadata)))
+                used = self.token_budget
+        return packed
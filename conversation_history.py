@@ -0,0 +1,161 @@
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Iterator, List, Optional, Sequence, Union
+from metrics import STAGE_SECONDS, record_llm_call
+from llm_scheduler import LLM_SCHEDULER, Priority
+import logging
+
+# Messages (Human and Assistant lines) kept verbatim; older ones are folded into the summary.
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "10"))
+HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "1200"))
+HISTORY_SUMMARY_WORKERS = int(os.getenv("HISTORY_SUMMARY_WORKERS", "2"))
+SUMMARY_PREFIX = "Summary of earlier conversation: "
+
+# Shared by every conversation; summaries are written here, never on the request path.
+_summary_pool: Optional[ThreadPoolExecutor] = None
+_summary_pool_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _summary_pool
+    with _summary_pool_lock:
+        if _summary_pool is None:
+            _summary_pool = ThreadPoolExecutor(HISTORY_SUMMARY_WORKERS, thread_name_prefix="history-summary")
+        return _summary_pool
+
+
+class ConversationHistory:
+    """The last ``window`` messages verbatim plus a rolling summary of everything older.
+
+    Behaves like the list it replaces for appending, ``len``, iteration and
+    slicing (all over the verbatim window). Prompts should use ``prompt_view``,
+    which stays the same size however long the conversation runs. Messages
+    pushed out of the window are summarized by the LLM in a background thread;
+    until that finishes they are simply not in the view.
+    """
+
+    def __init__(self, llm=None, window: int = HISTORY_WINDOW, summary_max_chars: int = HISTORY_SUMMARY_MAX_CHARS):
+        self.logger = logging.getLogger("conversation_history")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.llm = llm
+        self.window = max(1, window)
+        self.summary_max_chars = summary_max_chars
+        self.summary = ""
+        self.total = 0
+        self._recent: Deque[str] = deque()
+        # Pushed out of the window, not yet in the summary.
+        self._pending: List[str] = []
+        self._summarizing = False
+        # Bumped by load_record so a summary of replaced messages is thrown away.
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._recent)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._recent))
+
+    def __getitem__(self, index: Union[int, slice]):
+        return list(self._recent)[index]
+
+    def append(self, message: str) -> None:
+        with self._lock:
+            self._recent.append(message)
+            self.total += 1
+            while len(self._recent) > self.window:
+                self._pending.append(self._recent.popleft())
+            if self.llm is None:
+                self._pending.clear()
+            elif len(self._pending) > 4 * self.window:
+                # Summaries keep failing; stay bounded rather than queue forever.
+                del self._pending[:len(self._pending) - 4 * self.window]
+            schedule = bool(self._pending) and not self._summarizing
+            if schedule:
+                self._summarizing = True
+        if schedule:
+            _pool().submit(self._summarize_in_background)
+
+    def prompt_view(self, k: int) -> List[str]:
+        """The summary line (once there is one) followed by the last ``k`` messages."""
+        with self._lock:
+            recent = list(self._recent)[-k:] if k > 0 else []
+            return ([SUMMARY_PREFIX + self.summary] if self.summary else []) + recent
+
+    def to_record(self) -> dict:
+        with self._lock:
+            return {"summary": self.summary, "recent": list(self._recent), "pending": list(self._pending), "total": self.total}
+
+    def load_record(self, record: Optional[dict]) -> None:
+        """Replace the contents with a ``to_record`` snapshot; pending messages are summarized on the next append."""
+        record = record or {}
+        with self._lock:
+            self.summary = record.get("summary", "")
+            self._recent = deque(record.get("recent", []))
+            self._pending = list(record.get("pending", []))
+            self.total = record.get("total", len(self._recent))
+            self._generation += 1
+
+    def _summary_prompt(self, summary: str, messages: List[str]) -> str:
+        return f"""Update the running summary of a sales conversation between an Emaar assistant and a customer.
+Keep the customer's name and contact details if given, the projects and properties discussed, prices or plans mentioned, and any open questions or requests. Drop greetings and small talk.
+Use at most {self.summary_max_chars // 6} words.
+
+Current summary:
+{summary or 'None'}
+
+New messages:
+{chr(10).join(messages)}
+
+Return ONLY the updated summary."""
+
+    def summarize_pending(self) -> None:
+        """Fold the messages that left the window into the summary (one LLM call)."""
+        with self._lock:
+            messages, summary, generation = list(self._pending), self.summary, self._generation
+        if not messages or self.llm is None:
+            return
+        # Lowest priority; if shed, the messages stay pending until the next append.
+        with LLM_SCHEDULER.slot(Priority.BACKGROUND), STAGE_SECONDS.time(stage="summary"):
+            record_llm_call("summary")
+            response = self.llm.invoke(self._summary_prompt(summary, messages))
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.summary = response.content.strip()[:self.summary_max_chars]
+            # Only drop what was summarized; more may have arrived meanwhile.
+            del self._pending[:len(messages)]
+
+    def _summarize_in_background(self) -> None:
+        while True:
+            try:
+                self.summarize_pending()
+            except Exception as e:
+                self.logger.warning(f"Failed to summarize conversation history: {e}")
+                with self._lock:
+                    self._summarizing = False
+                return
+            with self._lock:
+                if not self._pending:
+                    self._summarizing = False
+                    return
+
+    def approx_bytes(self) -> int:
+        with self._lock:
+            messages = list(self._recent) + self._pending
+        return sum(sys.getsizeof(m) for m in messages) + sys.getsizeof(self.summary)
+
+
+def prompt_view(history: Union[ConversationHistory, Sequence[str]], k: int) -> List[str]:
+    """``history.prompt_view(k)``, or the last ``k`` entries of a plain list."""
+    if isinstance(history, ConversationHistory):
+        return history.prompt_view(k)
+    return list(history[-k:]) if k > 0 else []
@@ -0,0 +1,163 @@
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# Cosine similarity a message needs to an indexed FAQ question for its answer to be returned as is.
+# A wrong canned answer is worse than an LLM call, so keep it above near misses (~0.9 for related questions).
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.93"))
+FAQ_FAST_PATH = os.getenv("FAQ_FAST_PATH", "true").lower() in ("1", "true", "yes")
+# Longer "answers" are usually a whole section after a heading that ends in '?'; leave those to RAG.
+FAQ_MAX_ANSWER_CHARS = int(os.getenv("FAQ_MAX_ANSWER_CHARS", "1200"))
+# A document needs at least this many pairs to be treated as an FAQ.
+FAQ_MIN_PAIRS = int(os.getenv("FAQ_MIN_PAIRS", "2"))
+# Bumped whenever extraction changes, so cached indexes are rebuilt.
+FAQ_INDEX_VERSION = 1
+FAQ_FILE = "faq.json"
+FAQ_VECTORS_FILE = "faq.npy"
+
+_QUESTION_MARKER = re.compile(r"^(?:Q(?:uestion)?\s*\d*\s*[:.)\-]|\d{1,3}\s*[.)]|[•\-*]\s*)\s*", re.IGNORECASE)
+_ANSWER_MARKER = re.compile(r"^A(?:nswer)?\s*\d*\s*[:.)\-]\s*", re.IGNORECASE)
+_EXPLICIT_QUESTION = re.compile(r"^Q(?:uestion)?\s*\d*\s*[:.)\-]", re.IGNORECASE)
+_PAGE_NUMBER = re.compile(r"^(?:page\s*)?\d+(?:\s*(?:of|/)\s*\d+)?$", re.IGNORECASE)
+_LIST_ITEM = re.compile(r"^(?:[•\-*–]|\d{1,3}[.)])\s")
+
+
+def _is_question_start(line: str) -> bool:
+    return bool(_EXPLICIT_QUESTION.match(line)) or line.endswith("?")
+
+
+def extract_qa_pairs(text: str) -> List[Tuple[str, str]]:
+    """Question/answer pairs from FAQ-style text ('Q:'/'A:' markers, numbered or plain lines ending in '?').
+
+    Returns [] unless at least FAQ_MIN_PAIRS pairs are found, so brochures with
+    the odd rhetorical question are not mistaken for an FAQ.
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    lines = [line for line in lines if line and not _PAGE_NUMBER.match(line)]
+    pairs = []
+    i = 0
+    while i < len(lines):
+        if not _is_question_start(lines[i]):
+            i += 1
+            continue
+        question = [lines[i]]
+        i += 1
+        # 'Q:' questions may wrap over a couple of lines before their '?'.
+        while not question[-1].endswith("?") and i < len(lines) and len(question) < 3 and not _ANSWER_MARKER.match(lines[i]):
+            question.append(lines[i])
+            i += 1
+        answer: List[str] = []
+        while i < len(lines) and not _is_question_start(lines[i]):
+            line = _ANSWER_MARKER.sub("", lines[i]) if not answer else lines[i]
+            if answer and not _LIST_ITEM.match(line):
+                answer[-1] = f"{answer[-1]} {line}"
+            elif line:
+                answer.append(line)
+            i += 1
+        q = _QUESTION_MARKER.sub("", " ".join(question)).strip()
+        a = "\n".join(answer).strip()
+        if q and a and len(a) <= FAQ_MAX_ANSWER_CHARS:
+            pairs.append((q, a))
+    return pairs if len(pairs) >= FAQ_MIN_PAIRS else []
+
+
+class FAQCollector:
+    """``on_page`` hook for IngestionPipeline.ingest that keeps each file's text for Q/A extraction.
+
+    Pairs are extracted from the whole file, so questions whose answer runs onto
+    the next page are kept intact.
+    """
+
+    def __init__(self):
+        self._pages: Dict[str, List[str]] = defaultdict(list)
+
+    def on_page(self, path: str, page: int, text: str) -> None:
+        self._pages[path].append(text)
+
+    def pairs(self, path: str) -> List[Tuple[str, str]]:
+        return extract_qa_pairs("\n".join(self._pages.get(path, [])))
+
+
+class FAQEntry:
+    __slots__ = ("question", "answer", "source")
+
+    def __init__(self, question: str, answer: str, source: str):
+        self.question = question
+        self.answer = answer
+        self.source = source
+
+
+class FAQIndex:
+    """Question embeddings of the FAQ pairs found at ingest, for answering without the LLM.
+
+    Not modified while being searched: KnowledgeBase updates a ``copy`` and swaps it in.
+    """
+
+    def __init__(self, threshold: float = FAQ_MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.entries: List[FAQEntry] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def copy(self) -> "FAQIndex":
+        other = FAQIndex(self.threshold)
+        other.entries = list(self.entries)
+        other._matrix = self._matrix
+        return other
+
+    def _normalize(self, vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        m = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(m, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return m / norms
+
+    def add(self, source: str, pairs: List[Tuple[str, str]], embeddings) -> int:
+        """Embed the questions of ``pairs`` (one batch) and index them under ``source``."""
+        if not pairs:
+            return 0
+        vectors = self._normalize(embeddings.embed_documents([q for q, _ in pairs]))
+        self.entries.extend(FAQEntry(q, a, source) for q, a in pairs)
+        self._matrix = vectors if self._matrix is None else np.vstack([self._matrix, vectors])
+        return len(pairs)
+
+    def remove(self, source: str) -> None:
+        keep = [i for i, e in enumerate(self.entries) if e.source != source]
+        if len(keep) == len(self.entries):
+            return
+        self.entries = [self.entries[i] for i in keep]
+        self._matrix = self._matrix[keep] if keep else None
+
+    def match(self, vector: Sequence[float]) -> Optional[Tuple[FAQEntry, float]]:
+        """Best matching entry and its similarity, if it clears the threshold."""
+        matrix = self._matrix
+        if matrix is None:
+            return None
+        scores = matrix @ self._normalize([vector])[0]
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return self.entries[best], float(scores[best])
+
+    def save(self, directory: str) -> None:
+        with open(os.path.join(directory, FAQ_FILE), "w", encoding="utf-8") as f:
+            json.dump([{"question": e.question, "answer": e.answer, "source": e.source} for e in self.entries], f)
+        if self._matrix is not None:
+            np.save(os.path.join(directory, FAQ_VECTORS_FILE), self._matrix)
+
+    @classmethod
+    def load(cls, directory: str, threshold: float = FAQ_MATCH_THRESHOLD) -> "FAQIndex":
+        """The index saved in ``directory``; empty if there is none."""
+        index = cls(threshold)
+        path = os.path.join(directory, FAQ_FILE)
+        if not os.path.exists(path):
+            return index
+        with open(path, "r", encoding="utf-8") as f:
+            index.entries = [FAQEntry(d["question"], d["answer"], d["source"]) for d in json.load(f)]
+        if index.entries:
+            index._matrix = np.load(os.path.join(directory, FAQ_VECTORS_FILE))
+        return index
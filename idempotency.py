@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import logging
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "900"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+
+class IdempotencyStore:
+    """Bounded TTL map from a request key (Twilio MessageSid) to the outcome of its turn.
+
+    A repeat of a key that is still running awaits the original computation; a
+    repeat after it finished gets the stored result. Failed turns are forgotten
+    so a retry can run them again.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.logger = logging.getLogger("idempotency")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.replays = 0
+        self.attached = 0
+        self._entries: "OrderedDict[str, Tuple[float, asyncio.Future]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _prune(self) -> None:
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, future) = next(iter(self._entries.items()))
+            if expires_at > now and len(self._entries) < self.max_entries:
+                break
+            del self._entries[key]
+
+    def _get(self, key: str) -> Optional[asyncio.Future]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def claim(self, key: str) -> bool:
+        """Mark ``key`` as in flight. False if it is already running or already done."""
+        if self._get(key) is not None:
+            self.logger.info(f"Duplicate delivery of {key}, skipping")
+            self.replays += 1
+            return False
+        self._prune()
+        self._entries[key] = (time.monotonic() + self.ttl, asyncio.get_running_loop().create_future())
+        return True
+
+    def complete(self, key: str, result: Any) -> None:
+        future = self._get(key)
+        if future is not None and not future.done():
+            future.set_result(result)
+            self._entries[key] = (time.monotonic() + self.ttl, future)
+            self._entries.move_to_end(key)
+
+    def fail(self, key: str, error: BaseException) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and not entry[1].done():
+            entry[1].set_exception(error)
+            # Mark the exception as retrieved in case no duplicate is waiting on it.
+            entry[1].exception()
+
+    async def run(self, key: Optional[str], compute: Callable[[], Awaitable[Any]]) -> Any:
+        if not key:
+            return await compute()
+        future = self._get(key)
+        if future is not None:
+            if future.done():
+                self.logger.info(f"Duplicate delivery of {key}, returning stored result")
+                self.replays += 1
+            else:
+                self.logger.info(f"Duplicate delivery of {key}, attaching to in-flight turn")
+                self.attached += 1
+            return await asyncio.shield(future)
+        self.claim(key)
+        try:
+            result = await compute()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.complete(key, result)
+        return result
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "replays": self.replays, "attached": self.attached}
@@ -0,0 +1,223 @@
+import multiprocessing
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+# Page parsing processes; 0 or 1 parses in the calling process.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_PAGES_PER_TASK = int(os.getenv("INGEST_PAGES_PER_TASK", "8"))
+# Below this many pages the process pool costs more to start than it saves.
+INGEST_MIN_POOL_PAGES = int(os.getenv("INGEST_MIN_POOL_PAGES", "32"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF = float(os.getenv("EMBED_BACKOFF", "1.0"))
+
+# (path, page number, text); text is None and error set when the range failed to parse.
+PageResult = Tuple[str, int, Optional[str], Optional[str]]
+
+
+def count_pages(path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def parse_page_range(path: str, start: int, stop: int) -> List[PageResult]:
+    """Extract text for pages [start, stop); runs in a worker process, so only pypdf is imported."""
+    from pypdf import PdfReader
+    try:
+        reader = PdfReader(path)
+        return [(path, i, reader.pages[i].extract_text() or "", None) for i in range(start, min(stop, len(reader.pages)))]
+    except Exception as e:
+        return [(path, start, None, f"{type(e).__name__}: {e}")]
+
+
+class IngestResult:
+    __slots__ = ("store", "ids", "failed", "stats")
+
+    def __init__(self, store, ids: Dict[str, List[str]], failed: Dict[str, str], stats: dict):
+        self.store = store
+        self.ids = ids
+        self.failed = failed
+        self.stats = stats
+
+
+class IngestionPipeline:
+    """Streams PDFs into a FAISS store: parallel page parsing, chunking as pages
+    arrive, concurrent batched embedding with backoff and incremental adds.
+
+    At most ``embed_concurrency`` batches are embedding at once and a couple of
+    page ranges per worker are parsed ahead, so memory stays bounded by the
+    batch size rather than the size of the document set.
+    """
+
+    def __init__(self, embeddings, chunk_size: int = 600, chunk_overlap: int = 100,
+                 workers: int = INGEST_WORKERS, pages_per_task: int = INGEST_PAGES_PER_TASK,
+                 batch_size: int = EMBED_BATCH_SIZE, embed_concurrency: int = EMBED_CONCURRENCY,
+                 max_retries: int = EMBED_MAX_RETRIES, backoff: float = EMBED_BACKOFF):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        self.logger = logging.getLogger("ingestion")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.embeddings = embeddings
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len)
+        self.workers = workers
+        self.pages_per_task = max(1, pages_per_task)
+        self.batch_size = max(1, batch_size)
+        self.embed_concurrency = max(1, embed_concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def _tasks(self, paths: Sequence[str], failed: Dict[str, str]) -> List[Tuple[str, int, int]]:
+        tasks = []
+        for path in paths:
+            try:
+                pages = count_pages(path)
+            except Exception as e:
+                failed[path] = f"{type(e).__name__}: {e}"
+                continue
+            tasks.extend((path, start, start + self.pages_per_task) for start in range(0, pages, self.pages_per_task))
+        return tasks
+
+    def iter_pages(self, paths: Sequence[str], failed: Dict[str, str]) -> Iterator[PageResult]:
+        """Pages in document order; parsing runs up to two ranges per worker ahead of the consumer."""
+        tasks = self._tasks(paths, failed)
+        total_pages = sum(stop - start for _, start, stop in tasks)
+        if self.workers <= 1 or total_pages < INGEST_MIN_POOL_PAGES:
+            for task in tasks:
+                yield from parse_page_range(*task)
+            return
+        done = 0
+        try:
+            # spawn: the server process has threads, which fork does not copy safely.
+            with ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                pending: Deque[Future] = deque()
+                for task in tasks[:self.workers * 2]:
+                    pending.append(pool.submit(parse_page_range, *task))
+                while pending:
+                    results = pending.popleft().result()
+                    next_index = done + len(pending) + 1
+                    if next_index < len(tasks):
+                        pending.append(pool.submit(parse_page_range, *tasks[next_index]))
+                    done += 1
+                    yield from results
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            self.logger.warning(f"Page parsing pool failed ({e!r}), parsing the remaining pages in-process")
+            for task in tasks[done:]:
+                yield from parse_page_range(*task)
+
+    def _embed_batch(self, texts: List[str]) -> Tuple[List[List[float]], int]:
+        attempt = 0
+        while True:
+            try:
+                return self.embeddings.embed_documents(texts), attempt
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random())
+                self.logger.warning(f"Embedding batch of {len(texts)} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def ingest(self, paths: Sequence[str], store=None, sources: Optional[Dict[str, str]] = None,
+               id_prefixes: Optional[Dict[str, str]] = None,
+               on_page: Optional[Callable[[str, int, str], None]] = None) -> IngestResult:
+        """Add every chunk of ``paths`` to ``store`` (created on the first batch if None).
+
+        ``sources`` maps a path to the ``source`` metadata stored with its chunks and
+        ``id_prefixes`` to the prefix of its vector ids ('<prefix>-<n>'). Files that
+        fail to parse or embed are reported in ``failed`` with none of their
+        vectors left in the store. ``on_page(path, page, text)`` sees every
+        parsed page, in document order.
+        """
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+        sources = sources or {}
+        id_prefixes = id_prefixes or {}
+        started = time.perf_counter()
+        failed: Dict[str, str] = {}
+        ids: Dict[str, List[str]] = {path: [] for path in paths}
+        counters: Dict[str, int] = {path: 0 for path in paths}
+        stats = {"files": len(paths), "pages": 0, "chunks": 0, "embed_batches": 0, "embed_retries": 0}
+        buffer: List[Document] = []
+        inflight: Deque[Tuple[Future, List[Document]]] = deque()
+
+        def add(future: Future, docs: List[Document]) -> None:
+            nonlocal store
+            try:
+                vectors, retries = future.result()
+            except Exception as e:
+                for doc in docs:
+                    failed.setdefault(doc.metadata["_path"], f"embedding failed: {e}")
+                return
+            stats["embed_batches"] += 1
+            stats["embed_retries"] += retries
+            batch_ids = []
+            for doc in docs:
+                path = doc.metadata.pop("_path")
+                prefix = id_prefixes.get(path)
+                doc_id = f"{prefix}-{counters[path]}" if prefix else f"{os.urandom(8).hex()}-{counters[path]}"
+                counters[path] += 1
+                ids[path].append(doc_id)
+                batch_ids.append(doc_id)
+            pairs = list(zip([d.page_content for d in docs], vectors))
+            metadatas = [d.metadata for d in docs]
+            if store is None:
+                store = FAISS.from_embeddings(pairs, self.embeddings, metadatas=metadatas, ids=batch_ids)
+            else:
+                store.add_embeddings(pairs, metadatas=metadatas, ids=batch_ids)
+
+        def submit(pool: ThreadPoolExecutor, docs: List[Document]) -> None:
+            # Oldest batch first, so vectors land in the store in document order.
+            if len(inflight) >= self.embed_concurrency:
+                add(*inflight.popleft())
+            inflight.append((pool.submit(self._embed_batch, [d.page_content for d in docs]), docs))
+
+        with ThreadPoolExecutor(self.embed_concurrency, thread_name_prefix="embed") as pool:
+            for path, page, text, error in self.iter_pages(paths, failed):
+                if error is not None:
+                    failed.setdefault(path, error)
+                    continue
+                if path in failed:
+                    continue
+                stats["pages"] += 1
+                if on_page is not None:
+                    on_page(path, page, text)
+                page_doc = Document(page_content=text, metadata={"source": sources.get(path, path), "page": page, "_path": path})
+                chunks = self.splitter.split_documents([page_doc])
+                stats["chunks"] += len(chunks)
+                buffer.extend(chunks)
+                while len(buffer) >= self.batch_size:
+                    submit(pool, buffer[:self.batch_size])
+                    buffer = buffer[self.batch_size:]
+            if buffer:
+                submit(pool, buffer)
+            while inflight:
+                add(*inflight.popleft())
+
+        for path in failed:
+            if store is not None and ids.get(path):
+                store.delete(ids[path])
+            ids[path] = []
+        elapsed = time.perf_counter() - started
+        stats.update({
+            "failed": len(failed),
+            "seconds": elapsed,
+            "pages_per_sec": stats["pages"] / elapsed if elapsed else 0.0,
+            "chunks_per_sec": stats["chunks"] / elapsed if elapsed else 0.0,
+        })
+        self.logger.info(
+            f"Ingested {stats['pages']} pages / {stats['chunks']} chunks from {len(paths)} file(s) in {elapsed:.2f}s "
+            f"({stats['pages_per_sec']:.1f} pages/s, {stats['chunks_per_sec']:.1f} chunks/s, "
+            f"{stats['embed_batches']} embedding batches, {stats['embed_retries']} retries, {len(failed)} failed)"
+        )
+        return IngestResult(store, ids, failed, stats)
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+import faiss
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from faq_index import FAQ_INDEX_VERSION, FAQCollector, FAQIndex
+from ingestion import IngestionPipeline
+import logging
+
+KB_INDEX_DIR = os.getenv("KB_INDEX_DIR", ".kb_index")
+# Seconds between background directory scans; 0 disables the watcher.
+KB_RELOAD_INTERVAL = float(os.getenv("KB_RELOAD_INTERVAL", "0"))
+MANIFEST_FILE = "manifest.json"
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def vector_id_prefix(rel_path: str, sha: str) -> str:
+    """Prefix of a file's vector ids: unique per path (identical copies of a file don't collide)
+    and per content (a changed file's new vectors never reuse the ids about to be deleted)."""
+    path_hash = hashlib.sha256(rel_path.replace(os.sep, "/").encode("utf-8")).hexdigest()[:8]
+    return f"{path_hash}-{sha[:16]}"
+
+
+class KnowledgeBase:
+    """One FAISS index over every PDF under ``directory``, kept up to date file by file.
+
+    A manifest records each file's size, mtime, content hash and the vector ids
+    of its chunks. ``sync`` re-embeds only added or changed files and deletes the
+    vectors of removed ones. Changes are applied to a copy of the index that is
+    then swapped in, so searches running meanwhile keep using a consistent index.
+    Q/A pairs found in FAQ-style files go to ``faq_index`` the same way.
+    """
+
+    def __init__(self, directory: str, embeddings, embedding_model: str, chunk_size: int = 600,
+                 chunk_overlap: int = 100, index_dir: Optional[str] = KB_INDEX_DIR,
+                 on_change: Optional[Callable[[str], None]] = None):
+        self.logger = logging.getLogger("knowledge_base")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.directory = directory
+        self.embeddings = embeddings
+        self.index_dir = index_dir
+        self.on_change = on_change
+        self.params = {"embedding_model": embedding_model, "chunk_size": chunk_size, "chunk_overlap": chunk_overlap,
+                       "faq_index": FAQ_INDEX_VERSION}
+        self.pipeline = IngestionPipeline(embeddings, chunk_size, chunk_overlap)
+        self.vector_store: Optional[FAISS] = None
+        self.faq_index = FAQIndex()
+        self.manifest: Dict[str, dict] = {}
+        self.index_key: Optional[str] = None
+        self._sync_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._load()
+
+    @property
+    def files(self) -> List[str]:
+        return sorted(self.manifest)
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        found = {}
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.lower().endswith(".pdf"):
+                    path = os.path.join(root, name)
+                    found[os.path.relpath(path, self.directory)] = os.stat(path)
+        return found
+
+    def _compute_index_key(self) -> str:
+        key_data = json.dumps({"params": self.params, "files": {f: e["sha256"] for f, e in self.manifest.items()}}, sort_keys=True)
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()[:32]
+
+    def _load(self) -> None:
+        path = os.path.join(self.index_dir, "current") if self.index_dir else None
+        if path and os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            try:
+                with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                if saved.get("params") == self.params:
+                    if saved["files"]:
+                        self.vector_store = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+                    self.faq_index = FAQIndex.load(path)
+                    self.manifest = saved["files"]
+                    self.logger.info(f"Loaded knowledge base index ({len(self.manifest)} files, {len(self.faq_index)} FAQ pairs) from {path}")
+                else:
+                    self.logger.info("Knowledge base parameters changed, rebuilding index.")
+            except Exception as e:
+                self.logger.warning(f"Failed to load knowledge base index from {path}, rebuilding: {e}")
+                self.vector_store, self.faq_index, self.manifest = None, FAQIndex(), {}
+        self.index_key = self._compute_index_key()
+        self.sync()
+
+    def _copy_store(self) -> Optional[FAISS]:
+        store = self.vector_store
+        if store is None:
+            return None
+        return FAISS(
+            embedding_function=self.embeddings,
+            index=faiss.clone_index(store.index),
+            docstore=InMemoryDocstore(dict(store.docstore._dict)),
+            index_to_docstore_id=dict(store.index_to_docstore_id),
+            distance_strategy=store.distance_strategy,
+        )
+
+    def sync(self) -> Dict[str, List[str]]:
+        """Bring the index in line with the directory; returns the added, changed and removed files."""
+        with self._sync_lock:
+            started = time.perf_counter()
+            found = self._scan()
+            manifest = dict(self.manifest)
+            changes = {"added": [], "changed": [], "removed": []}
+            pending = []
+            for rel_path, stat in sorted(found.items()):
+                entry = manifest.get(rel_path)
+                if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                    continue
+                sha = file_sha256(os.path.join(self.directory, rel_path))
+                if entry and entry["sha256"] == sha:
+                    # Touched but not modified: just remember the new mtime.
+                    manifest[rel_path] = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                    continue
+                changes["changed" if entry else "added"].append(rel_path)
+                pending.append((rel_path, stat, sha))
+            changes["removed"] = sorted(set(manifest) - set(found))
+            if not pending and not changes["removed"]:
+                self.manifest = manifest
+                return changes
+
+            # Parse and embed into a copy of the index; readers only ever see the swap.
+            store = self._copy_store()
+            faq_index = self.faq_index.copy()
+            collector = FAQCollector()
+            paths = {os.path.join(self.directory, rel_path): (rel_path, stat, sha) for rel_path, stat, sha in pending}
+            result = self.pipeline.ingest(
+                list(paths), store,
+                sources={path: rel_path for path, (rel_path, _, _) in paths.items()},
+                id_prefixes={path: vector_id_prefix(rel_path, sha) for path, (rel_path, _, sha) in paths.items()},
+                on_page=collector.on_page,
+            )
+            store = result.store
+            for path, (rel_path, stat, sha) in paths.items():
+                if path in result.failed:
+                    self.logger.error(f"Failed to index {rel_path}, keeping its previous version: {result.failed[path]}")
+                    changes["changed" if rel_path in manifest else "added"].remove(rel_path)
+                    continue
+                manifest[rel_path] = {"sha256": sha, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "ids": result.ids[path]}
+
+            stale_ids = [i for f in changes["removed"] + changes["changed"] for i in self.manifest[f]["ids"]]
+            for rel_path in changes["removed"]:
+                del manifest[rel_path]
+            if stale_ids and store is not None:
+                store.delete(stale_ids)
+            for rel_path in changes["removed"] + changes["changed"]:
+                faq_index.remove(rel_path)
+            for path, (rel_path, _, _) in paths.items():
+                if path not in result.failed:
+                    try:
+                        faq_index.add(rel_path, collector.pairs(path), self.embeddings)
+                    except Exception as e:
+                        self.logger.warning(f"Failed to index FAQ pairs of {rel_path}: {e}")
+            if store is not None and store.index.ntotal == 0:
+                store = None
+
+            self.vector_store = store
+            self.faq_index = faq_index
+            self.manifest = manifest
+            self.index_key = self._compute_index_key()
+            self._save()
+            self.logger.info(
+                f"Knowledge base synced in {time.perf_counter() - started:.2f}s: "
+                f"{len(changes['added'])} added, {len(changes['changed'])} changed, {len(changes['removed'])} removed"
+            )
+        if self.on_change is not None:
+            self.on_change(self.index_key)
+        return changes
+
+    def _save(self) -> None:
+        if not self.index_dir:
+            return
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp_path = tempfile.mkdtemp(prefix=".sync-", dir=self.index_dir)
+            if self.vector_store is not None:
+                self.vector_store.save_local(tmp_path)
+            self.faq_index.save(tmp_path)
+            with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump({"params": self.params, "files": self.manifest}, f)
+            current = os.path.join(self.index_dir, "current")
+            old = None
+            if os.path.exists(current):
+                old = tempfile.mkdtemp(prefix=".old-", dir=self.index_dir)
+                os.replace(current, os.path.join(old, "index"))
+            # A crash between these renames only costs a re-sync on the next start.
+            os.replace(tmp_path, current)
+            if old:
+                shutil.rmtree(old, ignore_errors=True)
+        except Exception as e:
+            self.logger.warning(f"Failed to save knowledge base index: {e}")
+
+    def start_watching(self, interval: float = KB_RELOAD_INTERVAL) -> None:
+        """Re-sync every ``interval`` seconds in a daemon thread (hot reload while serving)."""
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def watch():
+            while not self._stop.wait(interval):
+                try:
+                    self.sync()
+                except Exception as e:
+                    self.logger.error(f"Knowledge base sync failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="knowledge-base-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
@@ -0,0 +1,130 @@
+import re
+from typing import Dict, List
+
+# Compiled once at import; these run on every lead-capture turn.
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+# International numbers: optional +, digits with spaces, dots, dashes or brackets in between.
+PHONE_RE = re.compile(r"(?<![\w+(])\+?\(?\d[\d\s().-]{6,}\d(?!\w)")
+STRONG_NAME_RE = re.compile(r"\b(?:my name is|my name's|name is)\s+(.+)", re.IGNORECASE)
+# "Call me tomorrow", "call me at 5": only a capitalised, name-like word after it is a name.
+CALL_ME_RE = re.compile(r"\bcall me\s+(.+)", re.IGNORECASE)
+# "I'm Sara" / "this is John" but also "I'm Dubai based" / "this is Downtown Dubai pricing?":
+# never extracted locally, only sent to the LLM.
+WEAK_NAME_RE = re.compile(r"\b(?:i am|i'm|im|this is)\s+(.+)", re.IGNORECASE)
+NAME_WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*")
+NAME_END_RE = re.compile(r"[,.;:!?()\n\d@]")
+STRAY_AT_RE = re.compile(r"\S@\S")
+LONG_DIGITS_RE = re.compile(r"\d[\d\s().-]{7,}\d")
+# "budget 2500000-3000000": a range of amounts, not a phone number.
+DIGIT_RANGE_RE = re.compile(r"\d{4,}\s*-\s*\d{4,}")
+
+MIN_PHONE_DIGITS = 10
+MAX_PHONE_DIGITS = 15
+MAX_NAME_WORDS = 3
+
+# Words that end a name, or show that "I'm ..." / "this is ..." is not an introduction.
+NOT_NAME_WORDS = {
+    "a", "an", "the", "and", "or", "but", "my", "me", "your", "email", "mail", "phone", "number", "mobile",
+    "contact", "from", "in", "at", "on", "for", "to", "with", "of", "here", "there", "this", "that", "it",
+    "interested", "looking", "planning", "searching", "trying", "thinking", "wondering", "asking", "calling",
+    "writing", "going", "just", "also", "not", "still", "currently", "really", "very", "so", "good", "fine",
+    "ok", "okay", "great", "sure", "available", "free", "busy", "ready", "happy", "glad", "curious", "keen",
+    "new", "back", "done", "sorry", "hi", "hello", "is", "am", "are", "was", "will", "can",
+    # Times ("call me tomorrow").
+    "now", "today", "tonight", "tomorrow", "later", "soon", "asap", "anytime", "after", "before", "when",
+    "morning", "afternoon", "evening", "night", "weekend", "monday", "tuesday", "wednesday", "thursday",
+    "friday", "saturday", "sunday", "next", "once", "whenever",
+}
+
+
+def _phone_digits(candidate: str) -> str:
+    return re.sub(r"\D", "", candidate)
+
+
+def find_email(message: str) -> str:
+    match = EMAIL_RE.search(message)
+    return match.group(0) if match else ""
+
+
+def _looks_like_phone(candidate: str) -> bool:
+    if not MIN_PHONE_DIGITS <= len(_phone_digits(candidate)) <= MAX_PHONE_DIGITS:
+        return False
+    if DIGIT_RANGE_RE.fullmatch(candidate):
+        return False
+    # A bare run of digits is as likely a price or reference; phones are written with +, a leading 0 or separators.
+    return not (candidate.isdigit() and not candidate.startswith("0"))
+
+
+def find_phone(message: str) -> str:
+    for match in PHONE_RE.finditer(message):
+        candidate = match.group(0).strip(" .-")
+        if _looks_like_phone(candidate):
+            return candidate
+    return ""
+
+
+def _name_words(text: str, capitalized_only: bool) -> List[str]:
+    words = []
+    # A name ends at the first punctuation mark or digit ("I'm Sara, 0501234567").
+    head = NAME_END_RE.split(text, 1)[0]
+    for word in head.split():
+        if not NAME_WORD_RE.fullmatch(word) or word.lower() in NOT_NAME_WORDS:
+            break
+        if capitalized_only and not word[0].isupper():
+            break
+        words.append(word)
+        if len(words) == MAX_NAME_WORDS:
+            break
+    return words
+
+
+def find_name(message: str) -> str:
+    """Name after "my name is" or "call me", or "" if there is none (or it is unclear)."""
+    match = STRONG_NAME_RE.search(message)
+    if match:
+        words = _name_words(match.group(1), capitalized_only=False)
+    else:
+        match = CALL_ME_RE.search(message)
+        words = _name_words(match.group(1), capitalized_only=True) if match else []
+    name = " ".join(words)
+    return name.title() if name.islower() else name
+
+
+def _possible_name_after(pattern: re.Pattern, text: str) -> bool:
+    """True if ``pattern`` matches and the next word could start a name."""
+    match = pattern.search(text)
+    if not match:
+        return False
+    first = NAME_WORD_RE.match(match.group(1).lstrip())
+    return bool(first) and first.group(0).lower() not in NOT_NAME_WORDS
+
+
+def extract_fields(message: str) -> Dict[str, str]:
+    fields = {}
+    email = find_email(message)
+    if email:
+        fields["Email"] = email
+    phone = find_phone(message)
+    if phone:
+        fields["Phone"] = phone
+    name = find_name(message)
+    if name:
+        fields["Name"] = name
+    return fields
+
+
+def is_ambiguous(message: str, fields: Dict[str, str]) -> bool:
+    """True when the message looks like it carries contact data the regexes could not pin down."""
+    rest = message
+    for value in fields.values():
+        rest = rest.replace(value, " ")
+    if STRAY_AT_RE.search(rest):
+        return True
+    if any(not DIGIT_RANGE_RE.fullmatch(m.group(0)) for m in LONG_DIGITS_RE.finditer(rest)):
+        return True
+    if "Name" not in fields:
+        if STRONG_NAME_RE.search(rest):
+            return True
+        return _possible_name_after(CALL_ME_RE, rest) or _possible_name_after(WEAK_NAME_RE, rest)
+    return False
+
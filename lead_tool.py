@@ -1,11 +1,14 @@
 import json
 from typing import Dict, Any, Optional, List
 from lead_state import LeadState
+from lead_extractor import extract_fields, is_ambiguous
 from salesforce_api import SalesforceAPI
+from metrics import STAGE_SECONDS, record_llm_call
+from llm_scheduler import LLM_SCHEDULER, Priority
 import logging
 
 class LeadTool:
-    def __init__(self):
+    def __init__(self, salesforce: Optional[SalesforceAPI] = None):
         self.logger = logging.getLogger("lead_tool")
         handler = logging.StreamHandler()
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
@@ -13,14 +16,15 @@ class LeadTool:
         if not self.logger.hasHandlers():
             self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
-        self.salesforce = SalesforceAPI()
+        self.salesforce = salesforce or SalesforceAPI()
         self.partial_lead_info = {}
         self.state = LeadState.NO_INTEREST
         self.current_lead_id = None
+        # Name/Email/Phone found in the latest message, locally or by the LLM.
+        self.received_fields: List[str] = []
 
-    def extract_lead_info(self, message: str, llm) -> Optional[Dict[str, str]]:
-        self.logger.info(f"Extracting lead info from message: {message}")
-        prompt = (
+    def _extraction_prompt(self, message: str) -> str:
+        return (
             "Extract contact information from the following message. "
             "Return ONLY a minified JSON object (no markdown, no code block, no comments) with these exact fields (always include all keys, even if missing): "
             "Name, Company, Email, Phone. If a field is not found, return its value as null. "
@@ -28,12 +32,12 @@ class LeadTool:
             f"Message: {message}\n"
             "Return ONLY the JSON object, nothing else."
         )
-        self.logger.info(f"Prompt sent to LLM: {prompt}")
-        response = llm.invoke(prompt)
-        self.logger.info(f"LLM raw response: {response.content}")
+
+    def _parse_lead_info(self, content: str) -> Optional[Dict[str, str]]:
+        self.logger.info(f"LLM raw response: {content}")
         try:
             # Remove code block markers if present
-            content = response.content.strip()
+            content = content.strip()
             if content.startswith('```'):
                 content = content.strip('`')
                 if content.startswith('json'):
@@ -49,6 +53,8 @@ class LeadTool:
                 self.logger.info(f"Field {k}: {v}")
                 if v is not None and v != "N/A" and v != "":
                     normalized[k] = v.strip() if isinstance(v, str) else v
+                    if k != 'Company':
+                        self.received_fields.append(k)
             normalized['Company'] = 'Iquestbee Technology' 
             self.logger.info(f"Extracted/merged lead info: {normalized}")
             return normalized
@@ -56,7 +62,39 @@ class LeadTool:
             self.logger.error(f"Failed to extract lead info: {e}")
         return None
 
-    def update_state(self, message: str, llm) -> None:
+    def extract_lead_info_locally(self, message: str) -> Optional[Dict[str, str]]:
+        """Regex extraction of Name/Email/Phone; None means the message needs the LLM."""
+        fields = extract_fields(message)
+        if is_ambiguous(message, fields):
+            self.logger.info(f"Local extraction ambiguous for message, falling back to LLM: {message}")
+            return None
+        normalized = dict(self.partial_lead_info)
+        normalized.update(fields)
+        self.received_fields = list(fields)
+        normalized['Company'] = 'Iquestbee Technology'
+        self.logger.info(f"Locally extracted/merged lead info: {normalized}")
+        return normalized
+
+    def extract_lead_info(self, message: str, llm) -> Optional[Dict[str, str]]:
+        self.logger.info(f"Extracting lead info from message: {message}")
+        prompt = self._extraction_prompt(message)
+        self.logger.info(f"Prompt sent to LLM: {prompt}")
+        # Lead capture goes ahead of FAQ answers when LLM capacity is short.
+        with LLM_SCHEDULER.slot(Priority.LEAD):
+            response = llm.invoke(prompt)
+        record_llm_call("lead_extraction", response)
+        return self._parse_lead_info(response.content)
+
+    async def aextract_lead_info(self, message: str, llm) -> Optional[Dict[str, str]]:
+        self.logger.info(f"Extracting lead info from message: {message}")
+        prompt = self._extraction_prompt(message)
+        self.logger.info(f"Prompt sent to LLM: {prompt}")
+        async with LLM_SCHEDULER.aslot(Priority.LEAD):
+            response = await llm.ainvoke(prompt)
+        record_llm_call("lead_extraction", response)
+        return self._parse_lead_info(response.content)
+
+    def _detect_interest(self, message: str) -> None:
         self.logger.info(f"Updating lead state. Current state: {self.state}, message: {message}")
         self.logger.info(f"Current partial_lead_info before update: {self.partial_lead_info}")
         interest_indicators = ["schedule", "meeting", "interested", "pricing", "cost", "interest", "sign up", "enroll", "register", "buy", "purchase", "want", "desire"]
@@ -64,30 +102,62 @@ class LeadTool:
             if any(ind in message.lower() for ind in interest_indicators):
                 self.logger.info("Interest detected in message.")
                 self.state = LeadState.INTEREST_DETECTED
-        if self.state in [LeadState.INTEREST_DETECTED, LeadState.COLLECTING_INFO]:
-            lead_info = self.extract_lead_info(message, llm)
-            self.logger.info(f"Lead info returned from extract_lead_info: {lead_info}")
-            if lead_info:
-                self.partial_lead_info.update(lead_info)
-                self.logger.info(f"Updated partial_lead_info: {self.partial_lead_info}")
-                self.state = LeadState.COLLECTING_INFO
-                if all(
-                    k in self.partial_lead_info and self.partial_lead_info[k] not in [None, "N/A", ""]
-                    for k in ['Name', 'Email', 'Phone']
-                ):
-                    self.state = LeadState.INFO_COMPLETE
-                    self.logger.info("Lead info complete.")
+
+    def _needs_lead_info(self) -> bool:
+        return self.state in [LeadState.INTEREST_DETECTED, LeadState.COLLECTING_INFO]
+
+    def _apply_lead_info(self, lead_info: Optional[Dict[str, str]]) -> None:
+        self.logger.info(f"Lead info returned from extract_lead_info: {lead_info}")
+        if lead_info:
+            self.partial_lead_info.update(lead_info)
+            self.logger.info(f"Updated partial_lead_info: {self.partial_lead_info}")
+            self.state = LeadState.COLLECTING_INFO
+            if all(
+                k in self.partial_lead_info and self.partial_lead_info[k] not in [None, "N/A", ""]
+                for k in ['Name', 'Email', 'Phone']
+            ):
+                self.state = LeadState.INFO_COMPLETE
+                self.logger.info("Lead info complete.")
+
+    def _log_state(self) -> None:
         self.logger.info(f"Current partial_lead_info after update: {self.partial_lead_info}")
         self.logger.info(f"Current state after update: {self.state}")
 
+    @property
+    def received_contact_info(self) -> bool:
+        """Whether the message given to the latest update_state carried a name, email or phone."""
+        return bool(self.received_fields)
+
+    def update_state(self, message: str, llm) -> None:
+        self.received_fields = []
+        with STAGE_SECONDS.time(stage="interest_detection"):
+            self._detect_interest(message)
+        if self._needs_lead_info():
+            with STAGE_SECONDS.time(stage="lead_extraction"):
+                lead_info = self.extract_lead_info_locally(message)
+                if lead_info is None:
+                    lead_info = self.extract_lead_info(message, llm)
+            self._apply_lead_info(lead_info)
+        self._log_state()
+
+    async def aupdate_state(self, message: str, llm) -> None:
+        self.received_fields = []
+        with STAGE_SECONDS.time(stage="interest_detection"):
+            self._detect_interest(message)
+        if self._needs_lead_info():
+            with STAGE_SECONDS.time(stage="lead_extraction"):
+                lead_info = self.extract_lead_info_locally(message)
+                if lead_info is None:
+                    lead_info = await self.aextract_lead_info(message, llm)
+            self._apply_lead_info(lead_info)
+        self._log_state()
+
     def get_missing_fields(self) -> List[str]:
         missing = [f for f in ['Name', 'Email', 'Phone'] if f not in self.partial_lead_info or self.partial_lead_info[f] == "N/A"]
         self.logger.info(f"Missing lead fields: {missing}")
         return missing
 
-    def create_lead(self) -> Optional[str]:
-        self.logger.info(f"Creating lead in Salesforce with info: {self.partial_lead_info}")
-        lead_created, lead_id = self.salesforce.create_lead(self.partial_lead_info)
+    def _lead_created(self, lead_created: bool, lead_id: Optional[str]) -> Optional[str]:
         if lead_created:
             self.current_lead_id = lead_id
             self.state = LeadState.AWAITING_MEETING_CONFIRMATION
@@ -95,3 +165,11 @@ class LeadTool:
             return lead_id
         self.logger.error("Failed to create lead in Salesforce.")
         return None
+
+    def create_lead(self) -> Optional[str]:
+        self.logger.info(f"Creating lead in Salesforce with info: {self.partial_lead_info}")
+        return self._lead_created(*self.salesforce.create_lead(self.partial_lead_info))
+
+    async def acreate_lead(self) -> Optional[str]:
+        self.logger.info(f"Creating lead in Salesforce with info: {self.partial_lead_info}")
+        return self._lead_created(*(await self.salesforce.acreate_lead(self.partial_lead_info)))
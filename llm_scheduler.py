@@ -0,0 +1,263 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from metrics import LLM_QUEUE_SECONDS, LLM_SHED, REGISTRY
+import logging
+
+# LLM calls in flight at once, across every conversation in the process.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Token bucket: sustained LLM calls per second and the burst allowed above it; a rate of 0 turns it off.
+# Off by default. When on, size it from the provider quota: requests per minute / 60 / worker processes.
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "0"))
+LLM_RATE_BURST = float(os.getenv("LLM_RATE_BURST", "16"))
+# Calls waiting for a slot; past this the lowest-priority waiter (or the newcomer) is turned away.
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+# A call that has waited this long for a slot gives up.
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+
+
+class Priority(IntEnum):
+    """Lower values go first."""
+    LEAD = 0
+    FAQ = 1
+    BACKGROUND = 2
+
+
+class LLMBusyError(Exception):
+    pass
+
+
+_priority: contextvars.ContextVar[Priority] = contextvars.ContextVar("llm_priority", default=Priority.FAQ)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+def set_llm_priority(priority: Priority) -> contextvars.Token:
+    """Priority of the LLM calls made from now on in the current context; pass the token to reset_llm_priority."""
+    return _priority.set(priority)
+
+
+def reset_llm_priority(token: contextvars.Token) -> None:
+    """Restore the priority from before ``token``'s set_llm_priority, undoing any set since."""
+    try:
+        _priority.reset(token)
+    except ValueError:
+        # Set in a context that has since been thrown away (e.g. a generator stepped from copied contexts).
+        pass
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "state", "wake", "loop")
+
+    def __init__(self, priority: Priority, seq: int, loop: Optional[asyncio.AbstractEventLoop]):
+        self.priority = priority
+        self.seq = seq
+        # waiting -> admitted | shed | gone
+        self.state = "waiting"
+        self.loop = loop
+        self.wake = asyncio.Event() if loop is not None else threading.Event()
+
+    def notify(self) -> None:
+        if self.loop is None:
+            self.wake.set()
+        else:
+            self.loop.call_soon_threadsafe(self.wake.set)
+
+
+class LLMScheduler:
+    """Admission control for LLM calls: a concurrency cap, a token-bucket rate limit and a priority queue.
+
+    Calls from threads and from event loops share the same limits. Waiting
+    calls are admitted in priority order, oldest first within a priority. When
+    the queue is full a newcomer displaces the newest waiter of a lower
+    priority, or is refused if there is none; refused and timed-out calls
+    raise LLMBusyError straight away, so the caller can answer "busy" instead
+    of adding to the backlog.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, rate: float = LLM_RATE_LIMIT,
+                 burst: float = LLM_RATE_BURST, max_queue: int = LLM_MAX_QUEUE,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT):
+        self.logger = logging.getLogger("llm_scheduler")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.admitted = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+        self._queue: List[Tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._waiting = 0
+        self._in_flight = 0
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+
+    # All underscore methods below are called with self._lock held.
+
+    def _head(self) -> Optional[_Waiter]:
+        while self._queue and self._queue[0][2].state != "waiting":
+            heapq.heappop(self._queue)
+        return self._queue[0][2] if self._queue else None
+
+    def _notify_head(self) -> None:
+        head = self._head()
+        if head is not None:
+            head.notify()
+
+    def _refuse(self, priority: Priority, reason: str) -> LLMBusyError:
+        self.shed += 1
+        LLM_SHED.inc(priority=priority.name.lower(), reason=reason)
+        self.logger.warning(f"Shed a {priority.name} LLM call ({reason}): {self._in_flight} in flight, {self._waiting} waiting")
+        return LLMBusyError(f"LLM capacity exhausted ({reason})")
+
+    def _enqueue(self, priority: Priority, loop: Optional[asyncio.AbstractEventLoop]) -> _Waiter:
+        # A call that could start right away is never refused, even with max_queue 0.
+        if self._waiting >= self.max_queue and (self._waiting or self._in_flight >= self.max_concurrency):
+            victims = [w for _, _, w in self._queue if w.state == "waiting" and w.priority > priority]
+            if not victims:
+                raise self._refuse(priority, "queue_full")
+            victim = max(victims, key=lambda w: (w.priority, w.seq))
+            victim.state = "shed"
+            self._waiting -= 1
+            victim.notify()
+        waiter = _Waiter(priority, next(self._seq), loop)
+        heapq.heappush(self._queue, (priority, waiter.seq, waiter))
+        self._waiting += 1
+        return waiter
+
+    def _try_admit(self, waiter: _Waiter) -> Optional[float]:
+        """Admit ``waiter`` if it is first in line and both a slot and a rate token are free.
+
+        Returns None once admitted, else how long to wait before trying again
+        (infinite: until woken by a release).
+        """
+        if self._head() is not waiter or self._in_flight >= self.max_concurrency:
+            return math.inf
+        if self.rate > 0:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+        heapq.heappop(self._queue)
+        waiter.state = "admitted"
+        self._waiting -= 1
+        self._in_flight += 1
+        self.admitted += 1
+        # The next in line may fit as well.
+        self._notify_head()
+        return None
+
+    def _step(self, waiter: _Waiter, deadline: float) -> Optional[float]:
+        if waiter.state == "shed":
+            raise self._refuse(waiter.priority, "displaced")
+        wait = self._try_admit(waiter)
+        if wait is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self._abandon(waiter)
+            raise self._refuse(waiter.priority, "timeout")
+        waiter.wake.clear()
+        return min(wait, remaining)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if waiter.state == "waiting":
+            waiter.state = "gone"
+            self._waiting -= 1
+            self._notify_head()
+
+    def acquire(self, priority: Optional[Priority] = None) -> None:
+        """Block until the call may run; raises LLMBusyError if it is shed."""
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        with self._lock:
+            waiter = self._enqueue(priority, None)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._step(waiter, deadline)
+                if wait is None:
+                    LLM_QUEUE_SECONDS.observe(time.monotonic() - started, priority=priority.name.lower())
+                    return
+                waiter.wake.wait(wait)
+        except BaseException:
+            with self._lock:
+                self._abandon(waiter)
+            raise
+
+    async def aacquire(self, priority: Optional[Priority] = None) -> None:
+        priority = current_priority() if priority is None else priority
+        started = time.monotonic()
+        deadline = started + self.queue_timeout
+        with self._lock:
+            waiter = self._enqueue(priority, asyncio.get_running_loop())
+        try:
+            while True:
+                with self._lock:
+                    wait = self._step(waiter, deadline)
+                if wait is None:
+                    LLM_QUEUE_SECONDS.observe(time.monotonic() - started, priority=priority.name.lower())
+                    return
+                try:
+                    await asyncio.wait_for(waiter.wake.wait(), None if math.isinf(wait) else wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            with self._lock:
+                self._abandon(waiter)
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._notify_head()
+
+    @contextmanager
+    def slot(self, priority: Optional[Priority] = None) -> Iterator[None]:
+        """Hold an LLM slot for the body (a whole streamed response included)."""
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: Optional[Priority] = None) -> AsyncIterator[None]:
+        await self.aacquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": self._in_flight, "waiting": self._waiting,
+                    "admitted": self.admitted, "shed": self.shed}
+
+
+# Shared by every LLM call in the process.
+LLM_SCHEDULER = LLMScheduler()
+
+REGISTRY.gauge("chatbot_llm_in_flight", "LLM calls currently running.", lambda: LLM_SCHEDULER.stats()["in_flight"])
+REGISTRY.gauge("chatbot_llm_waiting", "LLM calls waiting for a slot.", lambda: LLM_SCHEDULER.stats()["waiting"])
@@ -1,10 +1,12 @@
 import os
-from sales_rag_bot import SalesRAGAgent
-from fastapi import FastAPI, Request
+from app_factory import create_app
+from fastapi import Request
 from fastapi.responses import JSONResponse
+from sse import stream_response
 import uvicorn
 
 def main():
+    from sales_rag_bot import SalesRAGAgent
     pdf_path = 'Emaar_FAQ.pdf'  # Update as needed
     agent = SalesRAGAgent(pdf_path)
     
@@ -22,13 +24,10 @@ def main():
         # Removed lead info and state printout for cleaner output
 
 # --- FastAPI endpoint ---
-app = FastAPI()
-agent_instance = None
-
-@app.on_event("startup")
-def startup_event():
-    global agent_instance
-    agent_instance = SalesRAGAgent(pdf_path='/home/ubuntu/WhatsappWithTwilio/Emaar_FAQ.pdf')
+# Resources load in the background after startup; /readyz reports when they are warm.
+app = create_app('/home/ubuntu/WhatsappWithTwilio/Emaar_FAQ.pdf')
+# Requests without a session_id share one conversation, as before sessions existed.
+DEFAULT_SESSION_ID = "default"
 
 @app.post("/chat")
 async def chat_endpoint(request: Request):
@@ -36,9 +35,19 @@ async def chat_endpoint(request: Request):
     message = data.get("message", "")
     if not message:
         return JSONResponse({"error": "No message provided."}, status_code=400)
-    result = agent_instance.process(message)
+    sessions = await app.state.sessions.aget()
+    result = await sessions.aprocess(data.get("session_id") or DEFAULT_SESSION_ID, message)
     return JSONResponse(result)
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: Request):
+    data = await request.json()
+    message = data.get("message", "")
+    if not message:
+        return JSONResponse({"error": "No message provided."}, status_code=400)
+    sessions = await app.state.sessions.aget()
+    return stream_response(sessions.astream(data.get("session_id") or DEFAULT_SESSION_ID, message))
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1 and sys.argv[1] == "api":
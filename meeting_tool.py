@@ -1,4 +1,5 @@
-from typing import List
+from datetime import date
+from typing import Dict, List, Optional, Union
 from salesforce_api import SalesforceAPI
 import logging
 
@@ -13,26 +14,56 @@ class MeetingTool:
         self.logger.setLevel(logging.INFO)
         self.salesforce = salesforce_api
         self.available_slots = []
+        # The day available_slots are on: today, or the next day with a free slot.
+        self.slot_day: Optional[date] = None
 
     def get_slots(self) -> List[str]:
         self.logger.info("Fetching available meeting slots from Salesforce...")
-        self.available_slots = self.salesforce.show_availableMeeting() or []
-        self.logger.info(f"Available slots: {self.available_slots}")
+        self.slot_day, self.available_slots = self.salesforce.next_available_slots()
+        self.logger.info(f"Available slots on {self.slot_day}: {self.available_slots}")
         return self.available_slots
 
-    def schedule(self, lead_id: str, slot: str) -> bool:
-        self.logger.info(f"Scheduling meeting for lead_id={lead_id} at slot={slot}")
-        result = self.salesforce.create_meeting(lead_id, slot)
+    async def aget_slots(self) -> List[str]:
+        self.logger.info("Fetching available meeting slots from Salesforce...")
+        self.slot_day, self.available_slots = await self.salesforce.anext_available_slots()
+        self.logger.info(f"Available slots on {self.slot_day}: {self.available_slots}")
+        return self.available_slots
+
+    def slot_day_label(self) -> str:
+        """"today", "tomorrow" or "on Mon 19 Oct", for the day of available_slots."""
+        if self.slot_day is None:
+            return "today"
+        offset = (self.slot_day - self.salesforce.today()).days
+        if offset <= 0:
+            return "today"
+        if offset == 1:
+            return "tomorrow"
+        return f"on {self.slot_day:%a %d %b}"
+
+    def get_availability(self, start_date: Optional[date] = None, days: int = 1) -> Dict[str, List[str]]:
+        self.logger.info(f"Fetching {days} day(s) of meeting availability from Salesforce...")
+        return self.salesforce.get_availability(start_date, days)
+
+    async def aget_availability(self, start_date: Optional[date] = None, days: int = 1) -> Dict[str, List[str]]:
+        self.logger.info(f"Fetching {days} day(s) of meeting availability from Salesforce...")
+        return await self.salesforce.aget_availability(start_date, days)
+
+    def _log_schedule_result(self, result: bool) -> bool:
         if result:
             self.logger.info("Meeting scheduled successfully.")
         else:
             self.logger.error("Failed to schedule meeting.")
         return result
 
-    def format_slots(self, slots: List[str], columns: int = 3) -> str:
-        self.logger.info(f"Formatting slots for display: {slots}")
-        if not slots:
-            return "No available time slots."
+    def schedule(self, lead_id: str, slot: str) -> bool:
+        self.logger.info(f"Scheduling meeting for lead_id={lead_id} at slot={slot}")
+        return self._log_schedule_result(self.salesforce.create_meeting(lead_id, slot, self.slot_day))
+
+    async def aschedule(self, lead_id: str, slot: str) -> bool:
+        self.logger.info(f"Scheduling meeting for lead_id={lead_id} at slot={slot}")
+        return self._log_schedule_result(await self.salesforce.acreate_meeting(lead_id, slot, self.slot_day))
+
+    def _slot_rows(self, slots: List[str], columns: int) -> List[str]:
         max_length = max(len(slot) for slot in slots)
         col_width = max_length + 5
         rows = []
@@ -43,6 +74,22 @@ class MeetingTool:
                 if idx < len(slots):
                     row.append(f"{slots[idx]:>{col_width}}")
             rows.append("".join(row))
+        return rows
+
+    def format_slots(self, slots: Union[List[str], Dict[str, List[str]]], columns: int = 3) -> str:
+        """Render a list of slots for one day, or a per-day map from get_availability."""
+        self.logger.info(f"Formatting slots for display: {slots}")
+        if isinstance(slots, dict):
+            sections = [
+                f"{date.fromisoformat(day):%a %d %b}:\n" + "\n".join(self._slot_rows(day_slots, columns))
+                for day, day_slots in sorted(slots.items()) if day_slots
+            ]
+            if not sections:
+                return "No available time slots."
+            return "Available meeting times:\n\n" + "\n\n".join(sections) + "\n\nPlease pick one."
+        if not slots:
+            return "No available time slots."
+        rows = self._slot_rows(slots, columns)
         return (
              "Available meeting times:\n\n" +
             "\n".join(rows) +  # only 1 newline between rows
@@ -0,0 +1,160 @@
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from metrics import MESSAGES_PER_TURN
+import logging
+
+# A sender's messages less than this many seconds apart are answered as one turn; 0 turns coalescing off.
+# Every turn then starts at least this long after its message arrives. Unset, coalescing is on
+# (FAST_ACK_COALESCE_GAP) only with fast-ack replies, where the webhook is answered at once anyway,
+# and off for inline replies, where the delay would hold up every webhook response.
+COALESCE_GAP = os.getenv("WHATSAPP_COALESCE_GAP")
+FAST_ACK_COALESCE_GAP = 1.5
+# A burst is cut off this long after its first message, however it continues.
+COALESCE_MAX_WAIT = float(os.getenv("WHATSAPP_COALESCE_MAX_WAIT", "4.0"))
+COALESCE_MAX_MESSAGES = int(os.getenv("WHATSAPP_COALESCE_MAX_MESSAGES", "10"))
+
+
+class InboundMessage:
+    __slots__ = ("body", "message_sid", "to", "received_at", "reply")
+
+    def __init__(self, body: str, message_sid: Optional[str], to: str, reply: asyncio.Future):
+        self.body = body
+        self.message_sid = message_sid
+        self.to = to
+        self.received_at = time.monotonic()
+        # The batch's reply for the newest message in it, None for the ones it superseded.
+        self.reply = reply
+
+
+def coalesce_gap(fast_ack: bool) -> float:
+    if COALESCE_GAP is not None:
+        return float(COALESCE_GAP)
+    return FAST_ACK_COALESCE_GAP if fast_ack else 0.0
+
+
+def merge_bodies(messages: List[InboundMessage]) -> str:
+    """The messages of a burst as one user message, one line each."""
+    return "\n".join(m.body.strip() for m in messages if m.body and m.body.strip())
+
+
+class _Batch:
+    __slots__ = ("messages", "first_at", "last_at", "flushed")
+
+    def __init__(self):
+        self.messages: List[InboundMessage] = []
+        self.first_at = time.monotonic()
+        self.last_at = self.first_at
+        self.flushed = asyncio.Event()
+
+
+class MessageCoalescer:
+    """Per-sender debounce window: a burst of messages becomes a single turn.
+
+    The window closes ``gap`` seconds after the sender's latest message, or
+    ``max_wait`` seconds after the first, or at ``max_messages``, whichever
+    comes first. ``process_batch(sender, messages)`` then runs once for the
+    burst. Only the newest message waits for the reply; each earlier one
+    resolves to None as soon as a later message joins, so at most one webhook
+    request per sender is held open. A message arriving while its burst's turn
+    runs opens the next burst; the session lock keeps the turns in order.
+    Bursts are collected per worker process.
+    """
+
+    def __init__(self, process_batch: Callable[[str, List[InboundMessage]], Awaitable[Optional[str]]],
+                 gap: Optional[float] = None, max_wait: float = COALESCE_MAX_WAIT,
+                 max_messages: int = COALESCE_MAX_MESSAGES):
+        self.logger = logging.getLogger("message_coalescer")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.process_batch = process_batch
+        # Default: as for inline replies (off unless WHATSAPP_COALESCE_GAP is set).
+        self.gap = coalesce_gap(fast_ack=False) if gap is None else gap
+        self.max_wait = max(max_wait, self.gap)
+        self.max_messages = max(1, max_messages)
+        self.messages = 0
+        self.turns = 0
+        self.failed = 0
+        self._open: Dict[str, _Batch] = {}
+        self._tasks = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.gap > 0
+
+    def add(self, sender: str, body: str, message_sid: Optional[str] = None, to: str = "") -> asyncio.Future:
+        """Put a message in the sender's open burst; the future resolves as described on the class."""
+        message = InboundMessage(body, message_sid, to, asyncio.get_running_loop().create_future())
+        self.messages += 1
+        batch = self._open.get(sender)
+        if batch is None or batch.flushed.is_set():
+            batch = self._open[sender] = _Batch()
+            task = asyncio.create_task(self._collect(sender, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        elif batch.messages:
+            superseded = batch.messages[-1].reply
+            if not superseded.done():
+                superseded.set_result(None)
+        batch.messages.append(message)
+        batch.last_at = message.received_at
+        if len(batch.messages) >= self.max_messages:
+            batch.flushed.set()
+        return message.reply
+
+    async def submit(self, sender: str, body: str, message_sid: Optional[str] = None, to: str = "") -> Optional[str]:
+        return await self.add(sender, body, message_sid, to)
+
+    async def _collect(self, sender: str, batch: _Batch) -> None:
+        while not batch.flushed.is_set():
+            deadline = min(batch.last_at + self.gap, batch.first_at + self.max_wait)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            try:
+                await asyncio.wait_for(batch.flushed.wait(), delay)
+            except asyncio.TimeoutError:
+                # Loop: a message that arrived meanwhile moved the deadline.
+                pass
+        if self._open.get(sender) is batch:
+            del self._open[sender]
+        messages = batch.messages
+        last = messages[-1]
+        self.turns += 1
+        MESSAGES_PER_TURN.observe(len(messages))
+        if len(messages) > 1:
+            self.logger.info(f"Coalesced {len(messages)} messages from {sender} into one turn")
+        try:
+            reply = await self.process_batch(sender, messages)
+        except asyncio.CancelledError:
+            last.reply.cancel()
+            raise
+        except Exception as e:
+            self.failed += 1
+            self.logger.error(f"Turn for {len(messages)} coalesced messages from {sender} failed: {e}")
+            if not last.reply.done():
+                last.reply.set_exception(e)
+                # Marked retrieved in case nobody is waiting (async replies).
+                last.reply.exception()
+            return
+        if not last.reply.done():
+            last.reply.set_result(reply)
+
+    async def stop(self) -> None:
+        """Close every open burst now and wait for their turns."""
+        for batch in list(self._open.values()):
+            batch.flushed.set()
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "coalesce_open_bursts": len(self._open),
+            "coalesce_messages": self.messages,
+            "coalesce_turns": self.turns,
+            "coalesce_failed_turns": self.failed,
+        }
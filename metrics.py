@@ -0,0 +1,245 @@
+import contextvars
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds; covers sub-millisecond cache hits up to slow LLM and Salesforce calls.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Read at scrape time from ``func`` (e.g. active sessions or queue depth)."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.func = func
+
+    def render(self) -> List[str]:
+        return self._header() + [f"{self.name} {_format_value(self.func())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum, count.
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self._header()
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as a {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, func: Callable[[], float]) -> Gauge:
+        """Register (or re-point) a gauge read from ``func`` at scrape time."""
+        with self._lock:
+            gauge = Gauge(name, documentation, func)
+            self._metrics[name] = gauge
+            return gauge
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+TURNS = REGISTRY.counter("chatbot_turns_total", "Conversation turns, by the lead state whose branch handled them.", ["lead_state"])
+TURN_SECONDS = REGISTRY.histogram("chatbot_turn_seconds", "Wall time of a whole turn.")
+TIME_TO_FIRST_TOKEN = REGISTRY.histogram("chatbot_time_to_first_token_seconds", "Time from the start of a turn to its first reply token.")
+STAGE_SECONDS = REGISTRY.histogram(
+    "chatbot_stage_seconds",
+    "Time spent per turn stage (interest_detection, lead_extraction, query_embedding, retrieval, topic, answer, greeting, summary).",
+    ["stage"],
+)
+LLM_CALLS = REGISTRY.counter("chatbot_llm_calls_total", "LLM calls, by purpose.", ["purpose"])
+LLM_TOKENS = REGISTRY.counter("chatbot_llm_tokens_total", "LLM tokens reported by the API, by purpose and direction (input/output).", ["purpose", "direction"])
+LLM_QUEUE_SECONDS = REGISTRY.histogram("chatbot_llm_queue_seconds", "Time an LLM call waited for admission, by priority.", ["priority"])
+LLM_SHED = REGISTRY.counter("chatbot_llm_shed_total", "LLM calls refused under load, by priority and reason (queue_full/displaced/timeout).", ["priority", "reason"])
+LLM_CALLS_PER_TURN = REGISTRY.histogram("chatbot_llm_calls_per_turn", "LLM calls made while handling one turn.", buckets=COUNT_BUCKETS)
+MESSAGES_PER_TURN = REGISTRY.histogram("chatbot_messages_per_turn", "Inbound WhatsApp messages coalesced into one turn.", buckets=COUNT_BUCKETS)
+CACHE_LOOKUPS = REGISTRY.counter("chatbot_cache_lookups_total", "Cache lookups, by cache (answer/faq/availability) and result (hit/miss/coalesced).", ["cache", "result"])
+SALESFORCE_CALLS = REGISTRY.counter("chatbot_salesforce_calls_total", "Salesforce operations, by operation and outcome (success/failure/error).", ["operation", "outcome"])
+SALESFORCE_SECONDS = REGISTRY.histogram("chatbot_salesforce_seconds", "Salesforce operation latency including retries.", ["operation"])
+SALESFORCE_RETRIES = REGISTRY.counter("chatbot_salesforce_retries_total", "Salesforce HTTP requests retried, by reason.", ["reason"])
+
+
+class TurnStats:
+    __slots__ = ("llm_calls", "lead_state")
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.lead_state = ""
+
+
+_current_turn: contextvars.ContextVar[Optional[TurnStats]] = contextvars.ContextVar("current_turn", default=None)
+
+
+def start_turn() -> TurnStats:
+    """Start counting LLM calls for the turn running in the current context."""
+    stats = TurnStats()
+    _current_turn.set(stats)
+    return stats
+
+
+def set_turn_state(lead_state: str) -> None:
+    """Record which lead state's branch is handling the current turn."""
+    stats = _current_turn.get()
+    if stats is not None:
+        stats.lead_state = lead_state
+
+
+def end_turn(stats: TurnStats, started: float) -> None:
+    _current_turn.set(None)
+    TURNS.inc(lead_state=stats.lead_state)
+    TURN_SECONDS.observe(time.perf_counter() - started)
+    LLM_CALLS_PER_TURN.observe(stats.llm_calls)
+
+
+def record_llm_call(purpose: str, message=None) -> None:
+    """Count one LLM call and, when the response carries ``usage_metadata``, its tokens."""
+    LLM_CALLS.inc(purpose=purpose)
+    stats = _current_turn.get()
+    if stats is not None:
+        stats.llm_calls += 1
+    if message is not None:
+        record_llm_usage(purpose, message)
+
+
+def record_llm_usage(purpose: str, message) -> None:
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), purpose=purpose, direction="input")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), purpose=purpose, direction="output")
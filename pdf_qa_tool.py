@@ -1,12 +1,93 @@
-from typing import List, Dict
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Tuple
+from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+from answer_cache import SemanticAnswerCache, ANSWER_CACHE_SIZE, is_standalone_question
+from context_assembler import ContextAssembler
+from conversation_history import prompt_view
+from faq_index import FAQ_FAST_PATH, FAQ_INDEX_VERSION, FAQCollector, FAQIndex
+from knowledge_base import KnowledgeBase, KB_RELOAD_INTERVAL
+from ingestion import IngestionPipeline
+from metrics import CACHE_LOOKUPS, STAGE_SECONDS, record_llm_call, record_llm_usage
+from llm_scheduler import LLM_SCHEDULER
 import logging
 
+INDEX_CACHE_DIR = os.getenv("PDF_INDEX_CACHE_DIR", ".index_cache")
+EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-ada-002")
+# "two_call": separate topic-detection call, then the answer (legacy).
+# "single_call": topic and answer come back from one LLM call.
+# "auto": single_call, but skip topic tracking entirely while the conversation is still short.
+ANSWER_MODE = os.getenv("PDF_QA_ANSWER_MODE", "auto")
+ANSWER_MODES = ("two_call", "single_call", "auto")
+TOPIC_MIN_HISTORY = int(os.getenv("PDF_QA_TOPIC_MIN_HISTORY", "3"))
+# Answers that mention these lead fields are personal and never shared through the answer cache.
+PERSONAL_LEAD_FIELDS = ('Name', 'Email', 'Phone')
+# How an FAQ fast-path answer is sent; may use {answer}, {question} and {name} (the lead's name, if known).
+FAQ_REPLY_TEMPLATE = os.getenv("FAQ_REPLY_TEMPLATE", "{answer}")
+NO_CONTEXT_REPLY = "Sorry, I can only answer questions related to Emaar Proeprties, meetings, or our services. Please ask something related."
+# Start of the canned off-topic reply (and of NO_CONTEXT_REPLY); a RAG answer containing it is never cached.
+REFUSAL_MARKER = "Sorry, I can only answer questions"
+
+class TopicLineFilter:
+    """Strips the leading 'Topic: ...' line from a streamed single-call answer.
+
+    Text is held back only until it is clear whether the output starts with a
+    topic line; everything after that line passes straight through.
+    """
+
+    PREFIX = "topic:"
+
+    def __init__(self, enabled: bool = True):
+        self.done = not enabled
+        self.topic: Optional[str] = None
+        self._buffer = ""
+
+    def feed(self, text: str) -> str:
+        if self.done:
+            return text
+        self._buffer += text
+        head = self._buffer.lstrip()
+        if len(head) < len(self.PREFIX) and self.PREFIX.startswith(head.lower()):
+            return ""
+        if not head.lower().startswith(self.PREFIX):
+            return self._release()
+        if "\n" not in head:
+            return ""
+        first_line, _, rest = head.partition("\n")
+        if not rest.strip():
+            # Nothing after the topic line yet; it might still turn out to be the whole answer.
+            return ""
+        self.topic = first_line[len(self.PREFIX):].strip()
+        self._buffer = rest.lstrip()
+        return self._release()
+
+    def flush(self) -> str:
+        """Whatever is still held back once the stream ends (a lone topic line is kept as the answer)."""
+        return "" if self.done else self._release()
+
+    def _release(self) -> str:
+        self.done = True
+        text, self._buffer = self._buffer, ""
+        return text
+
 class PDFQATool:
-    def __init__(self, pdf_path: str, model_name: str = "gpt-4o-mini"):
+    """RAG answers over one PDF, or over every PDF in a directory when ``pdf_path`` is a directory.
+
+    Messages that closely match a question from an FAQ-style PDF get its stored
+    answer back without any LLM call.
+    """
+
+    def __init__(self, pdf_path: str, model_name: str = "gpt-4o-mini", embedding_model: str = EMBEDDING_MODEL,
+                 chunk_size: int = 600, chunk_overlap: int = 100, cache_dir: Optional[str] = INDEX_CACHE_DIR,
+                 answer_mode: str = ANSWER_MODE, llm=None, embeddings=None, vector_store=None,
+                 answer_cache: Optional[SemanticAnswerCache] = None, faq_index: Optional[FAQIndex] = None,
+                 context_assembler: Optional[ContextAssembler] = None):
         self.logger = logging.getLogger("pdf_qa_tool")
         handler = logging.StreamHandler()
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
@@ -14,46 +95,176 @@ class PDFQATool:
         if not self.logger.hasHandlers():
             self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
+        if answer_mode not in ANSWER_MODES:
+            raise ValueError(f"Unknown answer_mode {answer_mode!r}, expected one of {ANSWER_MODES}")
+        self.answer_mode = answer_mode
         self.pdf_path = pdf_path
-        self.llm = ChatOpenAI(model=model_name)
-        self._load_pdf()
-        self._setup_vector_store()
-
-    def _load_pdf(self):
-        self.logger.info(f"Loading PDF from {self.pdf_path}")
-        loader = PyPDFLoader(self.pdf_path)
-        raw_docs = loader.load()
-        splitter = RecursiveCharacterTextSplitter(chunk_size=600, chunk_overlap=100, length_function=len)
-        self.docs = splitter.split_documents(raw_docs)
-        self.logger.info(f"Loaded and split PDF into {len(self.docs)} chunks.")
-
-    def _setup_vector_store(self):
-        self.logger.info("Setting up vector store for PDF Q&A...")
-        embeddings = OpenAIEmbeddings()
-        self.vector_store = FAISS.from_documents(self.docs, embedding=embeddings)
-        self.logger.info("Vector store setup complete.")
-
-    def get_context(self, query: str) -> str:
-        self.logger.info(f"[RAG] Retrieving context for query: {query}")
-        docs = self.vector_store.similarity_search(query, k=5)
+        self.llm = llm or ChatOpenAI(model=model_name, stream_usage=True)
+        self.embedding_model = embedding_model
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.cache_dir = cache_dir
+        self.embeddings = embeddings or OpenAIEmbeddings(model=embedding_model)
+        if answer_cache is None and ANSWER_CACHE_SIZE > 0:
+            answer_cache = SemanticAnswerCache()
+        self.answer_cache = answer_cache
+        self.context_assembler = context_assembler or ContextAssembler()
+        self.knowledge_base = None
+        if vector_store is None and pdf_path and os.path.isdir(pdf_path):
+            # Several brochures/FAQs: per-file incremental index, reloaded in the background.
+            self.knowledge_base = KnowledgeBase(pdf_path, self.embeddings, embedding_model, chunk_size, chunk_overlap,
+                                                on_change=self._index_changed)
+            self.docs = []
+            self.index_key = self.knowledge_base.index_key
+            self.knowledge_base.start_watching(KB_RELOAD_INTERVAL)
+        elif vector_store is not None:
+            # Pre-built index (tests, benchmarks, shared stores): nothing to load or cache.
+            self.vector_store = vector_store
+            self.faq_index = faq_index or FAQIndex()
+            self.docs = []
+            self.index_key = None
+        else:
+            self.index_key = self._index_key()
+            self._load_index()
+        if self.answer_cache is not None:
+            self.answer_cache.reset(self.index_key)
+
+    @property
+    def vector_store(self):
+        if self.knowledge_base is not None:
+            return self.knowledge_base.vector_store
+        return self._vector_store
+
+    @vector_store.setter
+    def vector_store(self, store) -> None:
+        self._vector_store = store
+
+    @property
+    def faq_index(self) -> FAQIndex:
+        if self.knowledge_base is not None:
+            return self.knowledge_base.faq_index
+        return self._faq_index
+
+    @faq_index.setter
+    def faq_index(self, index: FAQIndex) -> None:
+        self._faq_index = index
+
+    def _index_changed(self, index_key: str) -> None:
+        self.index_key = index_key
+        if self.answer_cache is not None:
+            self.answer_cache.reset(index_key)
+
+    def reload(self) -> None:
+        """Pick up added, changed or removed PDFs now instead of waiting for the watcher."""
+        if self.knowledge_base is not None:
+            self.knowledge_base.sync()
+
+    def _load_index(self):
+        if not self._load_cached_index():
+            self._build_index()
+            self._save_cached_index()
+
+    def _index_key(self) -> str:
+        """Cache key: PDF content hash + chunking parameters + embedding model."""
+        pdf_hash = hashlib.sha256()
+        with open(self.pdf_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                pdf_hash.update(block)
+        key_data = json.dumps({
+            "pdf_sha256": pdf_hash.hexdigest(),
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "embedding_model": self.embedding_model,
+            "faq_index": FAQ_INDEX_VERSION,
+        }, sort_keys=True)
+        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()[:32]
+
+    def _cache_path(self) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, self.index_key)
+
+    def _load_cached_index(self) -> bool:
+        path = self._cache_path()
+        if not path or not os.path.exists(os.path.join(path, "index.faiss")):
+            return False
+        try:
+            self.vector_store = FAISS.load_local(path, self.embeddings, allow_dangerous_deserialization=True)
+            with open(os.path.join(path, "docs.json"), "r", encoding="utf-8") as f:
+                self.docs = [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in json.load(f)]
+            self.faq_index = FAQIndex.load(path)
+            self.logger.info(f"Loaded cached vector store {self.index_key} ({len(self.docs)} chunks, {len(self.faq_index)} FAQ pairs) from {path}")
+            return True
+        except Exception as e:
+            self.logger.warning(f"Failed to load cached vector store from {path}, rebuilding: {e}")
+            return False
+
+    def _save_cached_index(self) -> None:
+        path = self._cache_path()
+        if not path:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temp dir and rename so concurrent workers never see a partial index.
+            tmp_path = tempfile.mkdtemp(prefix=f".{self.index_key}-", dir=self.cache_dir)
+            self.vector_store.save_local(tmp_path)
+            with open(os.path.join(tmp_path, "docs.json"), "w", encoding="utf-8") as f:
+                json.dump([{"page_content": d.page_content, "metadata": d.metadata} for d in self.docs], f)
+            self.faq_index.save(tmp_path)
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                # Another worker already published this key.
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            self.logger.info(f"Saved vector store {self.index_key} to {path}")
+        except Exception as e:
+            self.logger.warning(f"Failed to save vector store cache: {e}")
+
+    def _build_index(self):
+        self.logger.info(f"Indexing PDF {self.pdf_path}")
+        collector = FAQCollector()
+        result = IngestionPipeline(self.embeddings, self.chunk_size, self.chunk_overlap).ingest([self.pdf_path], on_page=collector.on_page)
+        if result.failed:
+            raise RuntimeError(f"Failed to index {self.pdf_path}: {result.failed[self.pdf_path]}")
+        self.vector_store = result.store
+        self.docs = [result.store.docstore.search(i) for i in result.ids[self.pdf_path]] if result.store else []
+        self.faq_index = FAQIndex()
+        self.faq_index.add(os.path.basename(self.pdf_path), collector.pairs(self.pdf_path), self.embeddings)
+        self.logger.info(f"Vector store ready with {len(self.docs)} chunks, {len(self.faq_index)} FAQ pairs.")
+
+    def _join_context(self, docs) -> str:
         for i, doc in enumerate(docs):
             self.logger.info(f"[RAG] Context chunk {i+1}: {doc.page_content[:200]}...")
         context = "\n".join(doc.page_content for doc in docs)
         self.logger.info(f"[RAG] Combined context: {context[:500]}...")
         return context
 
-    def answer(self, message: str, conversation_history: List[str], lead_info: Dict[str, str], lead_state: str) -> str:
-        self.logger.info(f"[RAG] Answering message: {message}")
-        context = self.get_context(message)
-        self.logger.info(f"[RAG] Context used for answer: {context[:500]}...")
-        if not context.strip():
-            self.logger.warning("[RAG] No relevant context found for query.")
-            return "Sorry, I can only answer questions related to Emaar Proeprties, meetings, or our services. Please ask something related."
-        recent = conversation_history[-4:] if len(conversation_history) > 4 else conversation_history
+    def _search(self, query: str, vector: Optional[List[float]] = None):
+        # Read once: a knowledge-base reload may swap the store mid-turn.
+        store = self.vector_store
+        if store is None:
+            return []
+        with STAGE_SECONDS.time(stage="retrieval"):
+            if vector is None:
+                vector = self.embeddings.embed_query(query)
+            return self.context_assembler.assemble(self.context_assembler.retrieve(store, vector))
+
+    def get_context(self, query: str, vector: Optional[List[float]] = None) -> str:
+        self.logger.info(f"[RAG] Retrieving context for query: {query}")
+        return self._join_context(self._search(query, vector))
+
+    async def aget_context(self, query: str, vector: Optional[List[float]] = None) -> str:
+        self.logger.info(f"[RAG] Retrieving context for query: {query}")
+        # Query embedding and FAISS search are blocking; keep them off the event loop.
+        docs = await asyncio.to_thread(self._search, query, vector)
+        return self._join_context(docs)
+
+    def _topic_prompt(self, conversation_history: List[str]) -> str:
+        recent = prompt_view(conversation_history, 4)
         self.logger.info(f"[RAG] Recent conversation history: {recent}")
-        topics_prompt = f"Given these conversation messages, identify the main topic being discussed:\n{chr(10).join(recent)}\nReturn ONLY the topic being discussed, nothing else."
-        topic_response = self.llm.invoke(topics_prompt)
-        current_topic = topic_response.content
+        return f"Given these conversation messages, identify the main topic being discussed:\n{chr(10).join(recent)}\nReturn ONLY the topic being discussed, nothing else."
+
+    def _answer_prompt(self, message: str, context: str, current_topic: str, lead_info: Dict[str, str], lead_state: str) -> str:
         self.logger.info(f"[RAG] LLM topic detected: {current_topic}")
         system_context = f"Current topic: {current_topic}\nProduct info: {context}\nLead info: {lead_info if lead_info else 'None'}\nLead state: {lead_state}"
         prompt = f"""
@@ -68,6 +279,178 @@ Human: {message}
 Assistant: Be direct and natural, maintain the conversation flow about {current_topic} if relevant.
 """
         self.logger.info(f"[RAG] LLM prompt: {prompt[:500]}...")
-        response = self.llm.invoke(prompt)
-        self.logger.info(f"[RAG] LLM response: {response.content[:500]}...")
-        return response.content
+        return prompt
+
+    def _single_call_prompt(self, message: str, context: str, conversation_history: List[str], lead_info: Dict[str, str], lead_state: str) -> str:
+        if self.answer_mode == "auto" and len(conversation_history) < TOPIC_MIN_HISTORY:
+            # Too little history for a topic to exist; answer the message on its own.
+            return self._answer_prompt(message, context, "the user's question", lead_info, lead_state)
+        recent = prompt_view(conversation_history, 4)
+        self.logger.info(f"[RAG] Recent conversation history: {recent}")
+        system_context = f"Recent conversation:\n{chr(10).join(recent)}\nProduct info: {context}\nLead info: {lead_info if lead_info else 'None'}\nLead state: {lead_state}"
+        prompt = f"""
+You are a friendly sales assistant for Emaar.
+You must only answer questions related to Emaar Properties, meetings, or our services.
+If the user's question is not related, politely respond: 'Sorry, I can only answer questions related to Emaar Property, meetings, or our services,location. Please ask something related.'
+Never answer general knowledge or unrelated questions.
+
+System Context:
+{system_context}
+Human: {message}
+Assistant: On the first line write 'Topic: ' followed by the main topic of the recent conversation.
+Then, from the next line, give your reply. Be direct and natural, maintain the conversation flow about that topic if relevant.
+"""
+        self.logger.info(f"[RAG] LLM prompt: {prompt[:500]}...")
+        return prompt
+
+    def _uses_cache(self, message: str, lead_info: Dict[str, str]) -> bool:
+        """Whether the answer may come from (and go to) the answer cache.
+
+        The cache is keyed on the question alone, so follow-ups whose meaning
+        depends on the conversation ("how much is it?") never use it; any other
+        question does, on any turn and in every answer mode.
+        """
+        if self.answer_cache is None or any((lead_info or {}).get(k) for k in PERSONAL_LEAD_FIELDS):
+            return False
+        return is_standalone_question(message)
+
+    def _fast_answer(self, message: str, lead_info: Dict[str, str], lead_state: str, use_cache: bool) -> Tuple[Optional[str], Optional[List[float]]]:
+        """Answer without the LLM when possible: exact cache hit, FAQ match, then semantic cache hit.
+
+        Returns (answer, query vector); on a miss the vector is reused for retrieval.
+        """
+        if use_cache:
+            cached = self.answer_cache.get_by_text(message, lead_state)
+            if cached is not None:
+                CACHE_LOOKUPS.inc(cache="answer", result="hit")
+                self.logger.info(f"[RAG] Answer cache hit: {cached[:200]}...")
+                return cached, None
+        # Read once: a knowledge-base reload may swap the index mid-turn.
+        faq_index = self.faq_index
+        use_faq = FAQ_FAST_PATH and len(faq_index) > 0
+        if not use_cache and not use_faq:
+            return None, None
+        with STAGE_SECONDS.time(stage="query_embedding"):
+            vector = self.embeddings.embed_query(message)
+        if use_faq:
+            match = faq_index.match(vector)
+            CACHE_LOOKUPS.inc(cache="faq", result="miss" if match is None else "hit")
+            if match is not None:
+                entry, score = match
+                self.logger.info(f"[RAG] FAQ match ({score:.3f}) on '{entry.question}' from {entry.source}")
+                return self._faq_reply(entry, lead_info), vector
+        if not use_cache:
+            return None, vector
+        cached = self.answer_cache.get(vector, lead_state)
+        CACHE_LOOKUPS.inc(cache="answer", result="miss" if cached is None else "hit")
+        if cached is not None:
+            self.logger.info(f"[RAG] Answer cache hit: {cached[:200]}...")
+        return cached, vector
+
+    def _faq_reply(self, entry, lead_info: Dict[str, str]) -> str:
+        try:
+            return FAQ_REPLY_TEMPLATE.format(answer=entry.answer, question=entry.question,
+                                             name=(lead_info or {}).get("Name") or "").strip()
+        except (KeyError, IndexError, ValueError) as e:
+            self.logger.warning(f"Invalid FAQ_REPLY_TEMPLATE, sending the answer verbatim: {e}")
+            return entry.answer
+
+    def _cache_store(self, message: str, vector: Optional[List[float]], lead_state: str, answer: str) -> None:
+        # Refusals are not cached: the greeting fallback answers those, and a wrong one would stick.
+        if answer and REFUSAL_MARKER not in answer:
+            self.answer_cache.put(message, vector, lead_state, answer)
+
+    def _answer_prompt_for(self, message: str, context: str, conversation_history: List[str], lead_info: Dict[str, str], lead_state: str) -> Tuple[str, bool]:
+        """Prompt for the final answer and whether its output starts with a 'Topic:' line."""
+        if self.answer_mode != "two_call":
+            prompt = self._single_call_prompt(message, context, conversation_history, lead_info, lead_state)
+            return prompt, not (self.answer_mode == "auto" and len(conversation_history) < TOPIC_MIN_HISTORY)
+        with LLM_SCHEDULER.slot(), STAGE_SECONDS.time(stage="topic"):
+            topic_response = self.llm.invoke(self._topic_prompt(conversation_history))
+        record_llm_call("topic", topic_response)
+        return self._answer_prompt(message, context, topic_response.content, lead_info, lead_state), False
+
+    async def _aanswer_prompt_for(self, message: str, context: str, conversation_history: List[str], lead_info: Dict[str, str], lead_state: str) -> Tuple[str, bool]:
+        if self.answer_mode != "two_call":
+            return self._answer_prompt_for(message, context, conversation_history, lead_info, lead_state)
+        async with LLM_SCHEDULER.aslot():
+            with STAGE_SECONDS.time(stage="topic"):
+                topic_response = await self.llm.ainvoke(self._topic_prompt(conversation_history))
+        record_llm_call("topic", topic_response)
+        return self._answer_prompt(message, context, topic_response.content, lead_info, lead_state), False
+
+    def _finish_answer(self, message: str, vector: Optional[List[float]], lead_state: str, use_cache: bool,
+                       answer: str, topic: Optional[str]) -> None:
+        if topic is not None:
+            self.logger.info(f"[RAG] LLM topic detected: {topic}")
+        self.logger.info(f"[RAG] LLM response: {answer[:500]}...")
+        if use_cache:
+            self._cache_store(message, vector, lead_state, answer)
+
+    def stream_answer(self, message: str, conversation_history: List[str], lead_info: Dict[str, str], lead_state: str) -> Iterator[str]:
+        """Yield the answer as it is generated; any leading 'Topic:' line is never yielded."""
+        self.logger.info(f"[RAG] Answering message: {message}")
+        use_cache = self._uses_cache(message, lead_info)
+        fast, vector = self._fast_answer(message, lead_info, lead_state, use_cache)
+        if fast is not None:
+            yield fast
+            return
+        context = self.get_context(message, vector)
+        self.logger.info(f"[RAG] Context used for answer: {context[:500]}...")
+        if not context.strip():
+            self.logger.warning("[RAG] No relevant context found for query.")
+            yield NO_CONTEXT_REPLY
+            return
+        prompt, has_topic = self._answer_prompt_for(message, context, conversation_history, lead_info, lead_state)
+        topic_filter = TopicLineFilter(enabled=has_topic)
+        parts = []
+        with LLM_SCHEDULER.slot(), STAGE_SECONDS.time(stage="answer"):
+            record_llm_call("answer")
+            for chunk in self.llm.stream(prompt):
+                record_llm_usage("answer", chunk)
+                text = topic_filter.feed(chunk.content)
+                if text:
+                    parts.append(text)
+                    yield text
+        text = topic_filter.flush()
+        if text:
+            parts.append(text)
+            yield text
+        self._finish_answer(message, vector, lead_state, use_cache, "".join(parts).strip(), topic_filter.topic)
+
+    async def astream_answer(self, message: str, conversation_history: List[str], lead_info: Dict[str, str], lead_state: str) -> AsyncIterator[str]:
+        self.logger.info(f"[RAG] Answering message: {message}")
+        use_cache = self._uses_cache(message, lead_info)
+        fast, vector = await asyncio.to_thread(self._fast_answer, message, lead_info, lead_state, use_cache)
+        if fast is not None:
+            yield fast
+            return
+        context = await self.aget_context(message, vector)
+        self.logger.info(f"[RAG] Context used for answer: {context[:500]}...")
+        if not context.strip():
+            self.logger.warning("[RAG] No relevant context found for query.")
+            yield NO_CONTEXT_REPLY
+            return
+        prompt, has_topic = await self._aanswer_prompt_for(message, context, conversation_history, lead_info, lead_state)
+        topic_filter = TopicLineFilter(enabled=has_topic)
+        parts = []
+        async with LLM_SCHEDULER.aslot():
+            record_llm_call("answer")
+            with STAGE_SECONDS.time(stage="answer"):
+                async for chunk in self.llm.astream(prompt):
+                    record_llm_usage("answer", chunk)
+                    text = topic_filter.feed(chunk.content)
+                    if text:
+                        parts.append(text)
+                        yield text
+        text = topic_filter.flush()
+        if text:
+            parts.append(text)
+            yield text
+        self._finish_answer(message, vector, lead_state, use_cache, "".join(parts).strip(), topic_filter.topic)
+
+    def answer(self, message: str, conversation_history: List[str], lead_info: Dict[str, str], lead_state: str) -> str:
+        return "".join(self.stream_answer(message, conversation_history, lead_info, lead_state)).strip()
+
+    async def aanswer(self, message: str, conversation_history: List[str], lead_info: Dict[str, str], lead_state: str) -> str:
+        return "".join([t async for t in self.astream_answer(message, conversation_history, lead_info, lead_state)]).strip()
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, List, Optional, Tuple
+import logging
+
+REPLY_WORKERS = int(os.getenv("REPLY_WORKERS", "8"))
+REPLY_QUEUE_SIZE = int(os.getenv("REPLY_QUEUE_SIZE", "1000"))
+# Sent instead of the reply when a queued turn fails: the webhook was already acknowledged, so Twilio never retries it.
+REPLY_FAILURE_MESSAGE = os.getenv("REPLY_FAILURE_MESSAGE", "Sorry, something went wrong on our side. Please send your message again.")
+# Number of recent turns kept for latency percentiles.
+LATENCY_WINDOW = 1000
+
+
+class ReplySender:
+    """Delivers a reply out of band, outside the webhook request."""
+
+    async def send(self, to: str, from_: str, body: str) -> None:
+        raise NotImplementedError
+
+
+class TwilioReplySender(ReplySender):
+    def __init__(self, account_sid: Optional[str] = None, auth_token: Optional[str] = None):
+        from twilio.rest import Client
+        self.client = Client(account_sid or os.getenv("TWILIO_ACCOUNT_SID"), auth_token or os.getenv("TWILIO_AUTH_TOKEN"))
+
+    async def send(self, to: str, from_: str, body: str) -> None:
+        # The Twilio SDK is synchronous; keep it off the event loop.
+        await asyncio.to_thread(self.client.messages.create, to=to, from_=from_, body=body)
+
+
+class RecordingReplySender(ReplySender):
+    """Keeps replies in memory instead of sending them; for local runs and tests."""
+
+    def __init__(self):
+        self.sent: List[Tuple[str, str, str]] = []
+
+    async def send(self, to: str, from_: str, body: str) -> None:
+        self.sent.append((to, from_, body))
+
+
+class TurnJob:
+    __slots__ = ("sender", "to", "body", "message_sid", "received_at")
+
+    def __init__(self, sender: str, to: str, body: str, message_sid: Optional[str] = None):
+        self.sender = sender
+        self.to = to
+        self.body = body
+        self.message_sid = message_sid
+        self.received_at = time.monotonic()
+
+
+class ReplyWorkerPool:
+    """Bounded queue of inbound turns drained by a fixed number of asyncio workers.
+
+    ``process_turn(job)`` produces the reply text, which is then delivered
+    through ``reply_sender`` to the original sender. If the turn raises, the
+    sender gets ``failure_message`` instead of silence.
+    """
+
+    def __init__(self, process_turn: Callable[["TurnJob"], Awaitable[str]], reply_sender: ReplySender,
+                 workers: int = REPLY_WORKERS, max_queue: int = REPLY_QUEUE_SIZE,
+                 failure_message: str = REPLY_FAILURE_MESSAGE):
+        self.logger = logging.getLogger("reply_dispatcher")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.process_turn = process_turn
+        self.reply_sender = reply_sender
+        self.workers = workers
+        self.max_queue = max_queue
+        self.failure_message = failure_message
+        self.queue: Optional[asyncio.Queue] = None
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self.logger.info(f"Started {self.workers} reply workers (queue size {self.max_queue})")
+
+    async def stop(self, drain: bool = True) -> None:
+        if drain and self.queue is not None:
+            await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, job: TurnJob) -> bool:
+        """Queue a turn; False if the pool is not running or the queue is full."""
+        if self.queue is None or not self._tasks:
+            return False
+        try:
+            self.queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            self.logger.warning(f"Reply queue full ({self.max_queue}), rejecting turn from {job.sender}")
+            return False
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            job = await self.queue.get()
+            try:
+                reply = await self.process_turn(job)
+                if reply:
+                    await self.reply_sender.send(job.sender, job.to, reply)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                self.logger.error(f"Reply worker {index} failed for {job.sender}: {e}")
+                await self.send_failure_notice(job.sender, job.to)
+            finally:
+                self._latencies.append(time.monotonic() - job.received_at)
+                self.queue.task_done()
+
+    async def send_failure_notice(self, to: str, from_: str) -> None:
+        """Tell the sender their message was not answered, so they can send it again."""
+        if not self.failure_message:
+            return
+        try:
+            await self.reply_sender.send(to, from_, self.failure_message)
+        except Exception as e:
+            self.logger.error(f"Failed to send the failure notice to {to}: {e}")
+
+    def _percentile(self, values: List[float], q: float) -> float:
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "workers": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "turn_latency_p50_s": self._percentile(latencies, 0.50),
+            "turn_latency_p95_s": self._percentile(latencies, 0.95),
+            "turn_latency_max_s": latencies[-1] if latencies else 0.0,
+        }
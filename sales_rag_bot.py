@@ -1,124 +1,381 @@
+import copy
 import os
-from typing import Dict, Any
+import time
+from datetime import date
+from typing import AsyncIterator, Dict, Any, Iterator, List, Optional
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
+from conversation_history import ConversationHistory
 from lead_state import LeadState
 from lead_tool import LeadTool
 from meeting_tool import MeetingTool
-from pdf_qa_tool import PDFQATool
+from pdf_qa_tool import PDFQATool, REFUSAL_MARKER
+from salesforce_api import SalesforceAPI
+from metrics import STAGE_SECONDS, TIME_TO_FIRST_TOKEN, end_turn, record_llm_call, record_llm_usage, set_turn_state, start_turn
+from llm_scheduler import LLM_SCHEDULER, LLMBusyError, Priority, current_priority, reset_llm_priority, set_llm_priority
 
-class SalesRAGAgent:
+# Sent instead of an answer when the LLM scheduler sheds the turn's call under load.
+BUSY_REPLY = os.getenv("LLM_BUSY_REPLY", "⏳ We're handling a lot of messages right now. Please try again in a minute.")
+
+def turn_priority(state: LeadState) -> Priority:
+    """LLM priority for a turn: anything past plain Q&A is lead capture or meeting booking."""
+    return Priority.FAQ if state == LeadState.NO_INTEREST else Priority.LEAD
+
+class AgentResources:
+    """Heavy resources shared by every conversation: LLM client, PDF index and Salesforce client."""
     def __init__(self, pdf_path: str):
         load_dotenv()
         if not os.getenv('OPENAI_API_KEY'):
             raise ValueError("OPENAI_API_KEY not found in environment variables")
         os.environ["OPENAI_API_KEY"] = os.getenv('OPENAI_API_KEY')
-        self.llm = ChatOpenAI(model="gpt-4o-mini")
-        self.lead_tool = LeadTool()
-        self.meeting_tool = MeetingTool(self.lead_tool.salesforce)
-        self.pdf_qa_tool = PDFQATool(pdf_path)
-        self.conversation_history = []
+        # stream_usage: report token counts on streamed answers too (see metrics.LLM_TOKENS).
+        self.llm = ChatOpenAI(model="gpt-4o-mini", stream_usage=True)
+        self.salesforce = SalesforceAPI()
+        # KNOWLEDGE_BASE_DIR points at a directory of brochures/FAQs indexed incrementally (see knowledge_base.py).
+        self.pdf_qa_tool = PDFQATool(os.getenv("KNOWLEDGE_BASE_DIR") or pdf_path)
 
-    def process(self, message: str) -> Dict[str, Any]:
-        self.lead_tool.update_state(message, self.llm)
-        self.conversation_history.append(f"Human: {message}")
-        state = self.lead_tool.state
-        response = ""
-        def is_contact_info(msg):
-            import re
-            phone_pattern = r"\\b\\d{10,}\\b"
-            email_pattern = r"[\\w\\.-]+@[\\w\\.-]+"
-            name_keywords = ["name is", "i am", "i'm", "this is"]
-            msg_lower = msg.lower()
-            if re.search(phone_pattern, msg) or re.search(email_pattern, msg):
-                return True
-            if any(kw in msg_lower for kw in name_keywords):
-                return True
-            return False
-        if state == LeadState.NO_INTEREST:
-            rag_response = self.pdf_qa_tool.answer(message, self.conversation_history, self.lead_tool.partial_lead_info, state.value)
-            if "Sorry, I can only answer questions" not in rag_response:
-                response = rag_response
-            else:
-                # fallback to LLM intent/greeting detection
-                system_prompt = (
-                    "You are a friendly, conversational sales assistant for Emaar. "
-                    "If the user greets you or starts with small talk (like 'hi', 'hello', 'how are you', etc.), "
-                    "respond warmly and conversationally, and guide them to ask about Emaar Group,location,,working culture,Working style,project Type,Property, meetings, or services. "
-                    "If the user's question is not related to Emaar, politely respond: 'Sorry, I can only answer questions related to Emaar Property, meetings, or our services. Please ask something related.' "
-                    "Never answer general knowledge or unrelated questions."
-                )
-                prompt = f"""
+class RefusalGate:
+    """Holds back a streamed RAG answer only while it could still be the off-topic refusal.
+
+    Once the text diverges from ``REFUSAL_MARKER`` it is released and the rest
+    passes through; if it turns out to be the refusal, nothing is released and
+    the caller falls back to the greeting prompt instead.
+    """
+
+    def __init__(self):
+        self.refused = False
+        self._open = False
+        self._buffer = ""
+
+    def feed(self, text: str) -> str:
+        if self._open:
+            return text
+        if self.refused:
+            return ""
+        self._buffer += text
+        head = self._buffer.lstrip()
+        if REFUSAL_MARKER in head:
+            self.refused = True
+            return ""
+        if REFUSAL_MARKER.startswith(head):
+            return ""
+        return self.flush()
+
+    def flush(self) -> str:
+        if self.refused:
+            return ""
+        self._open = True
+        text, self._buffer = self._buffer, ""
+        return text
+
+class SalesRAGAgent:
+    def __init__(self, pdf_path: Optional[str] = None, resources: Optional[AgentResources] = None):
+        if resources is None:
+            resources = AgentResources(pdf_path)
+        self.resources = resources
+        self.llm = resources.llm
+        self.lead_tool = LeadTool(resources.salesforce)
+        self.meeting_tool = MeetingTool(resources.salesforce)
+        self.pdf_qa_tool = resources.pdf_qa_tool
+        self.conversation_history = ConversationHistory(resources.llm)
+        # Bumped on every save to a session store; tells a worker whether its copy is current.
+        self.record_version = 0
+
+    def to_record(self) -> Dict[str, Any]:
+        """Everything needed to continue this conversation in another process (see session_store.py)."""
+        return {
+            "version": self.record_version,
+            "lead_state": self.lead_tool.state.value,
+            "lead_info": self.lead_tool.partial_lead_info,
+            "lead_id": self.lead_tool.current_lead_id,
+            "slots": self.meeting_tool.available_slots,
+            "slot_day": self.meeting_tool.slot_day.isoformat() if self.meeting_tool.slot_day else None,
+            "history": self.conversation_history.to_record(),
+        }
+
+    def load_record(self, record: Optional[Dict[str, Any]]) -> None:
+        """Restore state saved by ``to_record``; None starts the conversation afresh."""
+        record = record or {}
+        self.record_version = record.get("version", 0)
+        self.lead_tool.state = LeadState(record.get("lead_state", LeadState.NO_INTEREST.value))
+        self.lead_tool.partial_lead_info = dict(record.get("lead_info") or {})
+        self.lead_tool.current_lead_id = record.get("lead_id")
+        self.meeting_tool.available_slots = list(record.get("slots") or [])
+        self.meeting_tool.slot_day = date.fromisoformat(record["slot_day"]) if record.get("slot_day") else None
+        self.conversation_history.load_record(record.get("history"))
+
+    def _greeting_prompt(self, message: str) -> str:
+        # fallback to LLM intent/greeting detection
+        system_prompt = (
+            "You are a friendly, conversational sales assistant for Emaar. "
+            "If the user greets you or starts with small talk (like 'hi', 'hello', 'how are you', etc.), "
+            "respond warmly and conversationally, and guide them to ask about Emaar Group,location,,working culture,Working style,project Type,Property, meetings, or services. "
+            "If the user's question is not related to Emaar, politely respond: 'Sorry, I can only answer questions related to Emaar Property, meetings, or our services. Please ask something related.' "
+            "Never answer general knowledge or unrelated questions."
+        )
+        return f"""
 {system_prompt}
 
 Conversation so far:
-{chr(10).join(self.conversation_history[-6:])}
+{chr(10).join(self.conversation_history.prompt_view(6))}
 Human: {message}
 Assistant:"
 """
-                response = self.llm.invoke(prompt).content
-        elif state == LeadState.INTEREST_DETECTED:
-            missing = self.lead_tool.get_missing_fields()
-            if is_contact_info(message):
-                if missing:
-                    if len(missing) == 1:
-                        response = f"Just need your {missing[0]} to get started."
-                    else:
-                        response = f"Just need your {', '.join(missing)} to get started."
-                else:
-                    response = "Thanks!"
+
+    def _contact_reply(self, missing) -> str:
+        if missing:
+            if len(missing) == 1:
+                return f"Just need your {missing[0]} to get started."
+            return f"Just need your {', '.join(missing)} to get started."
+        return "Thanks!"
+
+    def _missing_fields_suffix(self, state: LeadState, missing) -> str:
+        if not missing:
+            return ""
+        if state == LeadState.INTEREST_DETECTED:
+            return f"\n\nCould you share your {', '.join(missing)}?"
+        return f"\n\nJust need your {', '.join(missing)} to get started."
+
+    def _lead_saved_reply(self, lead_id: Optional[str]) -> str:
+        if lead_id:
+            return "Great! I've saved your information.\nDo you want to schedule a meeting with our team? (Yes/No)"
+        return "Sorry, I had trouble saving your information. Would you mind trying again?"
+
+    def _wants_meeting(self, message: str) -> bool:
+        return message.strip().lower() in ["yes", "yeah", "y", "sure", "please","schedule","schedule meeting"]
+
+    def _slots_reply(self, slots) -> str:
+        if slots:
+            self.lead_tool.state = LeadState.WAITING_MEETING_SLOT_SELECTION
+            return f"Here are the available meeting slots {self.meeting_tool.slot_day_label()}:\n{self.meeting_tool.format_slots(slots)}\n"
+        self.lead_tool.state = LeadState.NO_INTEREST
+        return "Sorry, I couldn’t fetch available meeting slots right now."
+
+    def _decline_meeting_reply(self) -> str:
+        self.lead_tool.state = LeadState.NO_INTEREST
+        return "No problem! Let me know if you have any other questions."
+
+    def _is_offered_slot(self, slot: str) -> bool:
+        return slot in self.meeting_tool.available_slots and bool(self.lead_tool.current_lead_id)
+
+    def _scheduled_reply(self, slot: str, success: bool) -> str:
+        day = self.meeting_tool.slot_day_label()
+        self.lead_tool.state = LeadState.NO_INTEREST
+        self.meeting_tool.available_slots = []
+        self.meeting_tool.slot_day = None
+        self.lead_tool.current_lead_id = None
+        if success:
+            return f"✅ Your meeting has been scheduled {day} at {slot}. Our team will contact you soon!"
+        return f"❌ Something went wrong while scheduling your meeting at {slot}. Please try again."
+
+    def _invalid_slot_reply(self, message: str) -> str:
+        return f"⚠️ '{message}' is not a valid time. Please choose from: {', '.join(self.meeting_tool.available_slots)}"
+
+    def _finish_turn(self, response: str) -> Dict[str, Any]:
+        self.conversation_history.append(f"Assistant: {response}")
+        return {"response": response, "lead_info": self.lead_tool.partial_lead_info if self.lead_tool.partial_lead_info else None, "lead_state": self.lead_tool.state.value}
+
+    def _busy_events(self, before: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """The reply to a turn whose LLM call was shed; the conversation goes back to ``before`` (a to_record snapshot)."""
+        # The customer is asked to send the message again; it must find the conversation as it left it.
+        self.load_record(before)
+        return [self._token(BUSY_REPLY), {"type": "final", "response": BUSY_REPLY,
+                "lead_info": self.lead_tool.partial_lead_info or None, "lead_state": self.lead_tool.state.value}]
+
+    def _token(self, text: str) -> Dict[str, Any]:
+        return {"type": "token", "content": text}
+
+    def _final(self, response: str) -> Dict[str, Any]:
+        return {"type": "final", **self._finish_turn(response)}
+
+    def stream(self, message: str) -> Iterator[Dict[str, Any]]:
+        """Run one turn, yielding ``token`` events as the reply is generated and then one ``final`` event.
+
+        Only RAG answers and the greeting fallback are generated token by token;
+        every other reply arrives as a single token. The ``final`` event carries
+        the same fields as ``process`` returns.
+        """
+        started = time.perf_counter()
+        stats = start_turn()
+        first_token = True
+        finished = False
+        # Copied: the turn updates lead info in place.
+        before = copy.deepcopy(self.to_record())
+        # The turn raises its own priority once the lead state is known; it must not outlive the turn.
+        priority = set_llm_priority(current_priority())
+        try:
+            for event in self._stream_turn(message):
+                if first_token and event["type"] == "token":
+                    TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started)
+                    first_token = False
+                # Set before yielding: a consumer may stop as soon as it has the final event.
+                finished = event["type"] == "final"
+                yield event
+        except LLMBusyError:
+            for event in self._busy_events(before):
+                yield event
+        except BaseException:
+            # Failed, or abandoned by the consumer: never leave half a turn behind.
+            if not finished:
+                self.load_record(before)
+            raise
+        finally:
+            reset_llm_priority(priority)
+            end_turn(stats, started)
+
+    async def astream(self, message: str) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of ``stream``."""
+        started = time.perf_counter()
+        stats = start_turn()
+        first_token = True
+        finished = False
+        # Copied: the turn updates lead info in place.
+        before = copy.deepcopy(self.to_record())
+        # The turn raises its own priority once the lead state is known; it must not outlive the turn.
+        priority = set_llm_priority(current_priority())
+        try:
+            async for event in self._astream_turn(message):
+                if first_token and event["type"] == "token":
+                    TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - started)
+                    first_token = False
+                # Set before yielding: a consumer may stop as soon as it has the final event.
+                finished = event["type"] == "final"
+                yield event
+        except LLMBusyError:
+            for event in self._busy_events(before):
+                yield event
+        except BaseException:
+            # Failed, or abandoned by the consumer: never leave half a turn behind.
+            if not finished:
+                self.load_record(before)
+            raise
+        finally:
+            reset_llm_priority(priority)
+            end_turn(stats, started)
+
+    def _stream_turn(self, message: str) -> Iterator[Dict[str, Any]]:
+        self.lead_tool.update_state(message, self.llm)
+        self.conversation_history.append(f"Human: {message}")
+        state = self.lead_tool.state
+        set_turn_state(state.value)
+        set_llm_priority(turn_priority(state))
+        parts = []
+        if state == LeadState.NO_INTEREST:
+            gate = RefusalGate()
+            for token in self.pdf_qa_tool.stream_answer(message, self.conversation_history, self.lead_tool.partial_lead_info, state.value):
+                text = gate.feed(token)
+                if text:
+                    parts.append(text)
+                    yield self._token(text)
+            if gate.refused:
+                with LLM_SCHEDULER.slot(), STAGE_SECONDS.time(stage="greeting"):
+                    record_llm_call("greeting")
+                    for chunk in self.llm.stream(self._greeting_prompt(message)):
+                        record_llm_usage("greeting", chunk)
+                        if chunk.content:
+                            parts.append(chunk.content)
+                            yield self._token(chunk.content)
             else:
-                response = self.pdf_qa_tool.answer(message, self.conversation_history, self.lead_tool.partial_lead_info, state.value)
-                if missing:
-                    response += f"\n\nCould you share your {', '.join(missing)}?"
-        elif state == LeadState.COLLECTING_INFO:
+                parts.append(gate.flush())
+            yield self._final("".join(parts).strip())
+            return
+        if state in [LeadState.INTEREST_DETECTED, LeadState.COLLECTING_INFO] and not self.lead_tool.received_contact_info:
             missing = self.lead_tool.get_missing_fields()
-            if is_contact_info(message):
-                if missing:
-                    if len(missing) == 1:
-                        response = f"Just need your {missing[0]} to get started."
-                    else:
-                        response = f"Just need your {', '.join(missing)} to get started."
-                else:
-                    response = "Thanks!"
-            else:
-                response = self.pdf_qa_tool.answer(message, self.conversation_history, self.lead_tool.partial_lead_info, state.value)
-                if missing:
-                    response += f"\n\nJust need your {', '.join(missing)} to get started."
+            for token in self.pdf_qa_tool.stream_answer(message, self.conversation_history, self.lead_tool.partial_lead_info, state.value):
+                parts.append(token)
+                yield self._token(token)
+            suffix = self._missing_fields_suffix(state, missing)
+            if suffix:
+                yield self._token(suffix)
+            yield self._final("".join(parts).strip() + suffix)
+            return
+        response = ""
+        if state in [LeadState.INTEREST_DETECTED, LeadState.COLLECTING_INFO]:
+            response = self._contact_reply(self.lead_tool.get_missing_fields())
         elif state == LeadState.INFO_COMPLETE:
-            lead_id = self.lead_tool.create_lead()
-            if lead_id:
-                response = "Great! I've saved your information.\nDo you want to schedule a meeting with our team? (Yes/No)"
+            response = self._lead_saved_reply(self.lead_tool.create_lead())
+        elif state == LeadState.AWAITING_MEETING_CONFIRMATION:
+            if self._wants_meeting(message):
+                response = self._slots_reply(self.meeting_tool.get_slots())
             else:
-                response = "Sorry, I had trouble saving your information. Would you mind trying again?"
+                response = self._decline_meeting_reply()
+        elif state == LeadState.WAITING_MEETING_SLOT_SELECTION:
+            slot = self._normalize_time(message)
+            if self._is_offered_slot(slot):
+                response = self._scheduled_reply(slot, self.meeting_tool.schedule(self.lead_tool.current_lead_id, slot))
+            else:
+                response = self._invalid_slot_reply(message)
+        if response:
+            yield self._token(response)
+        yield self._final(response)
+
+    async def _astream_turn(self, message: str) -> AsyncIterator[Dict[str, Any]]:
+        await self.lead_tool.aupdate_state(message, self.llm)
+        self.conversation_history.append(f"Human: {message}")
+        state = self.lead_tool.state
+        set_turn_state(state.value)
+        set_llm_priority(turn_priority(state))
+        parts = []
+        if state == LeadState.NO_INTEREST:
+            gate = RefusalGate()
+            async for token in self.pdf_qa_tool.astream_answer(message, self.conversation_history, self.lead_tool.partial_lead_info, state.value):
+                text = gate.feed(token)
+                if text:
+                    parts.append(text)
+                    yield self._token(text)
+            if gate.refused:
+                async with LLM_SCHEDULER.aslot():
+                    record_llm_call("greeting")
+                    with STAGE_SECONDS.time(stage="greeting"):
+                        async for chunk in self.llm.astream(self._greeting_prompt(message)):
+                            record_llm_usage("greeting", chunk)
+                            if chunk.content:
+                                parts.append(chunk.content)
+                                yield self._token(chunk.content)
+            else:
+                parts.append(gate.flush())
+            yield self._final("".join(parts).strip())
+            return
+        if state in [LeadState.INTEREST_DETECTED, LeadState.COLLECTING_INFO] and not self.lead_tool.received_contact_info:
+            missing = self.lead_tool.get_missing_fields()
+            async for token in self.pdf_qa_tool.astream_answer(message, self.conversation_history, self.lead_tool.partial_lead_info, state.value):
+                parts.append(token)
+                yield self._token(token)
+            suffix = self._missing_fields_suffix(state, missing)
+            if suffix:
+                yield self._token(suffix)
+            yield self._final("".join(parts).strip() + suffix)
+            return
+        response = ""
+        if state in [LeadState.INTEREST_DETECTED, LeadState.COLLECTING_INFO]:
+            response = self._contact_reply(self.lead_tool.get_missing_fields())
+        elif state == LeadState.INFO_COMPLETE:
+            response = self._lead_saved_reply(await self.lead_tool.acreate_lead())
         elif state == LeadState.AWAITING_MEETING_CONFIRMATION:
-            if message.strip().lower() in ["yes", "yeah", "y", "sure", "please","schedule","schedule meeting"]:
-                slots = self.meeting_tool.get_slots()
-                if slots:
-                    response = f"Here are the available meeting slots for today:\n{self.meeting_tool.format_slots(slots)}\n"
-                    self.lead_tool.state = LeadState.WAITING_MEETING_SLOT_SELECTION
-                else:
-                    response = "Sorry, I couldn’t fetch available meeting slots right now."
-                    self.lead_tool.state = LeadState.NO_INTEREST
+            if self._wants_meeting(message):
+                response = self._slots_reply(await self.meeting_tool.aget_slots())
             else:
-                response = "No problem! Let me know if you have any other questions."
-                self.lead_tool.state = LeadState.NO_INTEREST
+                response = self._decline_meeting_reply()
         elif state == LeadState.WAITING_MEETING_SLOT_SELECTION:
             slot = self._normalize_time(message)
-            if slot in self.meeting_tool.available_slots and self.lead_tool.current_lead_id:
-                success = self.meeting_tool.schedule(self.lead_tool.current_lead_id, slot)
-                if success:
-                    response = f"✅ Your meeting has been scheduled at {slot}. Our team will contact you soon!"
-                else:
-                    response = f"❌ Something went wrong while scheduling your meeting at {slot}. Please try again."
-                self.lead_tool.state = LeadState.NO_INTEREST
-                self.meeting_tool.available_slots = []
-                self.lead_tool.current_lead_id = None
+            if self._is_offered_slot(slot):
+                response = self._scheduled_reply(slot, await self.meeting_tool.aschedule(self.lead_tool.current_lead_id, slot))
             else:
-                response = f"⚠️ '{message}' is not a valid time. Please choose from: {', '.join(self.meeting_tool.available_slots)}"
-        self.conversation_history.append(f"Assistant: {response}")
-        self.conversation_history = self.conversation_history[-30:]
-        return {"response": response, "lead_info": self.lead_tool.partial_lead_info if self.lead_tool.partial_lead_info else None, "lead_state": self.lead_tool.state.value}
+                response = self._invalid_slot_reply(message)
+        if response:
+            yield self._token(response)
+        yield self._final(response)
+
+    def process(self, message: str) -> Dict[str, Any]:
+        for event in self.stream(message):
+            pass
+        return {k: v for k, v in event.items() if k != "type"}
+
+    async def aprocess(self, message: str) -> Dict[str, Any]:
+        """Async counterpart of ``process``: LLM, retrieval and Salesforce calls never block the event loop."""
+        async for event in self.astream(message):
+            pass
+        return {k: v for k, v in event.items() if k != "type"}
 
     def _normalize_time(self, message: str) -> str:
         parsed_time = message.strip().lower().replace("\"", "").replace("'", "").replace(" ", "").replace(".", "")
@@ -1,9 +1,9 @@
 import streamlit as st
 import uuid
 from datetime import datetime
-import json
 import os
-from main import SalesRAGAgent
+from sales_rag_bot import SalesRAGAgent, AgentResources
+from transcript_writer import TRANSCRIPT_DIR, TranscriptWriter, message_record
 import logging
 
 logging.basicConfig(
@@ -22,36 +22,42 @@ if 'messages' not in st.session_state:
 if 'chat_file' not in st.session_state:
     st.session_state.chat_file = None
 
+@st.cache_resource(show_spinner="Loading knowledge base...")
+def get_resources() -> AgentResources:
+    """LLM client, PDF index and Salesforce client, built once per process and shared by every visitor."""
+    logger.info("Building shared agent resources")
+    return AgentResources('Emaar_FAQ.pdf')
+
 def initialize_chatbot():
-    """Initialize the chatbot for the current session."""
+    """Initialize the chatbot for the current session (only lightweight conversation state per visitor)."""
     if st.session_state.chatbot is None:
         try:
-            st.session_state.chatbot = SalesRAGAgent('Emaar_FAQ.pdf') 
+            st.session_state.chatbot = SalesRAGAgent(resources=get_resources())
             logger.info(f"Chatbot initialized for session {st.session_state.session_id}")
         except Exception as e:
             logger.error(f"Error initializing chatbot: {str(e)}")
             st.error("Failed to initialize chatbot. Please try again later.")
 
-def save_chat_history():
-    """Save chat history to a file."""
+def stream_reply(chatbot, prompt, response):
+    """Yield reply tokens for st.write_stream; the trailing final event is copied into `response`."""
+    for event in chatbot.stream(prompt):
+        if event["type"] == "token":
+            yield event["content"]
+        else:
+            response.update({k: v for k, v in event.items() if k != "type"})
+
+@st.cache_resource
+def get_transcript_writer() -> TranscriptWriter:
+    """One background transcript writer per process, shared by every visitor."""
+    return TranscriptWriter()
+
+def save_chat_message(role, content):
+    """Queue one message for the session's JSONL transcript; written in the background."""
     try:
-        # Create chat_history directory if it doesn't exist
-        os.makedirs("chat_history", exist_ok=True)
-        
         if st.session_state.chat_file is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            st.session_state.chat_file = f"chat_history/chat_{st.session_state.session_id}_{timestamp}.json"
-        
-        chat_data = {
-            "session_id": st.session_state.session_id,
-            "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "messages": st.session_state.messages
-        }
-        
-        with open(st.session_state.chat_file, "w") as f:
-            json.dump(chat_data, f, indent=2)
-            
-        logger.info(f"Chat history updated for session {st.session_state.session_id}")
+            st.session_state.chat_file = os.path.join(TRANSCRIPT_DIR, f"chat_{st.session_state.session_id}_{timestamp}.jsonl")
+        get_transcript_writer().append(st.session_state.chat_file, message_record(st.session_state.session_id, role, content))
     except Exception as e:
         logger.error(f"Error saving chat history: {str(e)}")
 
@@ -127,21 +133,20 @@ def main():
     if prompt := st.chat_input("Type your message here..."):
         # Add user message immediately and display
         st.session_state.messages.append({"role": "user", "content": prompt})
+        save_chat_message("user", prompt)
         with chat_container:
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-        # Show spinner while processing response
+        # Render the reply token by token as it is generated
         if st.session_state.chatbot:
-            with st.spinner("🤖 Bot is thinking..."):
-                response = st.session_state.chatbot.process(prompt)
-
-            st.session_state.messages.append({"role": "assistant", "content": response['response']})
+            response = {}
             with chat_container:
                 with st.chat_message("assistant"):
-                    st.markdown(response['response'])
+                    st.write_stream(stream_reply(st.session_state.chatbot, prompt, response))
 
-            save_chat_history()
+            st.session_state.messages.append({"role": "assistant", "content": response['response']})
+            save_chat_message("assistant", response['response'])
 
             # Rerun to update the UI
             # st.rerun()
@@ -1,11 +1,40 @@
 import os
+import asyncio
+import random
+import threading
+import time
 import logging
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 import pytz
+from availability import compute_availability, day_bounds, parse_sf_datetime
+from availability_cache import AvailabilityCache
+from metrics import SALESFORCE_CALLS, SALESFORCE_RETRIES, SALESFORCE_SECONDS
+
+SF_AUTH_URL = os.getenv("SF_AUTH_URL", "https://iqb4-dev-ed.develop.my.salesforce.com/services/oauth2/token")
+SF_API_PATH = "/services/data/v60.0"
+SF_CONNECT_TIMEOUT = float(os.getenv("SF_CONNECT_TIMEOUT", "5"))
+SF_READ_TIMEOUT = float(os.getenv("SF_READ_TIMEOUT", "20"))
+SF_MAX_RETRIES = int(os.getenv("SF_MAX_RETRIES", "3"))
+SF_BACKOFF_FACTOR = float(os.getenv("SF_BACKOFF_FACTOR", "0.5"))
+SF_POOL_SIZE = int(os.getenv("SF_POOL_SIZE", "20"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MEETING_TIMEZONE = os.getenv("MEETING_TIMEZONE", "UTC")
+MEETING_WORK_START = os.getenv("MEETING_WORK_START", "08:00")
+MEETING_WORK_END = os.getenv("MEETING_WORK_END", "17:00")
+MEETING_SLOT_MINUTES = int(os.getenv("MEETING_SLOT_MINUTES", "30"))
+# When today has no free slot left, the first day with one within this many days is offered instead.
+MEETING_LOOKAHEAD_DAYS = int(os.getenv("MEETING_LOOKAHEAD_DAYS", "7"))
+EVENTS_SOQL = "SELECT StartDateTime, EndDateTime FROM Event WHERE StartDateTime < {end} AND EndDateTime > {start}"
 
 class SalesforceAPI:
-    def __init__(self):
+    def __init__(self, auth_url: str = SF_AUTH_URL, connect_timeout: float = SF_CONNECT_TIMEOUT,
+                 read_timeout: float = SF_READ_TIMEOUT, max_retries: int = SF_MAX_RETRIES,
+                 backoff_factor: float = SF_BACKOFF_FACTOR, pool_size: int = SF_POOL_SIZE,
+                 meeting_timezone: str = MEETING_TIMEZONE, work_start: str = MEETING_WORK_START,
+                 work_end: str = MEETING_WORK_END, slot_minutes: int = MEETING_SLOT_MINUTES):
         self.logger = logging.getLogger("salesforce_api")
         handler = logging.StreamHandler()
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
@@ -13,126 +42,366 @@ class SalesforceAPI:
         if not self.logger.hasHandlers():
             self.logger.addHandler(handler)
         self.logger.setLevel(logging.INFO)
-        self.auth_url = "https://iqb4-dev-ed.develop.my.salesforce.com/services/oauth2/token"
+        self.auth_url = auth_url
         self.client_id = os.getenv("SF_CLIENT_ID")
         self.client_secret = os.getenv("SF_CLIENT_SECRET")
         self.access_token = None
         self.instance_url = None
-        self._authenticate()
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        # One keep-alive pool per process; authentication happens lazily on the first call.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._async_client = None
+        self._token_lock = threading.Lock()
+        self._async_token_lock = None
+        # Slot labels are wall-clock times in meeting_tz; UTC matches the labels create_meeting has always written.
+        self.meeting_tz = pytz.timezone(meeting_timezone)
+        self.work_start = datetime.strptime(work_start, "%H:%M").time()
+        self.work_end = datetime.strptime(work_end, "%H:%M").time()
+        self.slot_minutes = slot_minutes
+        self.availability_cache = AvailabilityCache()
+
+    def _auth_data(self):
+        return {"grant_type": "client_credentials", "client_id": self.client_id, "client_secret": self.client_secret}
+
+    def _store_token(self, data):
+        self.access_token = data.get("access_token")
+        self.instance_url = data.get("instance_url")
+        self.logger.info("Salesforce authentication successful.")
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.access_token}", "Content-Type": "application/json"}
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_factor * (2 ** attempt) * (0.5 + random.random() / 2)
 
     def _authenticate(self):
         self.logger.info("Authenticating with Salesforce...")
         try:
-            auth_data = {"grant_type": "client_credentials", "client_id": self.client_id, "client_secret": self.client_secret}
-            response = requests.post(self.auth_url, data=auth_data)
+            response = self.session.post(self.auth_url, data=self._auth_data(), timeout=self.timeout)
             response.raise_for_status()
-            data = response.json()
-            self.access_token = data.get("access_token")
-            self.instance_url = data.get("instance_url")
-            self.logger.info("Salesforce authentication successful.")
+            self._store_token(response.json())
         except Exception as e:
             self.logger.error(f"Salesforce authentication failed: {str(e)}")
             raise
 
+    def _refresh_token(self, stale_token=None):
+        # Concurrent callers that saw the same expired token trigger a single refresh.
+        with self._token_lock:
+            if self.access_token is None or self.access_token == stale_token:
+                self._authenticate()
+
+    def _request(self, method, path, **kwargs):
+        if not self.access_token or not self.instance_url:
+            self._refresh_token()
+        refreshed = False
+        attempt = 0
+        while True:
+            token = self.access_token
+            try:
+                response = self.session.request(method, f"{self.instance_url}{SF_API_PATH}{path}", headers=self._headers(), timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A read timeout on a POST may already have created the record, so only GETs retry it.
+                retryable = isinstance(e, requests.ConnectionError) or method == "GET"
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                SALESFORCE_RETRIES.inc(reason=type(e).__name__)
+                self.logger.warning(f"Salesforce {method} {path} failed ({e}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code == 401 and not refreshed:
+                    self.logger.info("Salesforce token rejected, refreshing.")
+                    refreshed = True
+                    SALESFORCE_RETRIES.inc(reason="401")
+                    self._refresh_token(token)
+                    continue
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                SALESFORCE_RETRIES.inc(reason=str(response.status_code))
+                self.logger.warning(f"Salesforce {method} {path} returned {response.status_code}, retrying in {delay:.2f}s")
+            attempt += 1
+            time.sleep(delay)
+
+    def warm_up(self):
+        """Authenticate now (and open a pooled connection) instead of on the first lead or meeting."""
+        self._refresh_token()
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+        return self._async_client
+
+    def close(self):
+        self.session.close()
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+    async def _aauthenticate(self):
+        self.logger.info("Authenticating with Salesforce...")
+        try:
+            response = await self._get_async_client().post(self.auth_url, data=self._auth_data())
+            response.raise_for_status()
+            self._store_token(response.json())
+        except Exception as e:
+            self.logger.error(f"Salesforce authentication failed: {str(e)}")
+            raise
+
+    async def _arefresh_token(self, stale_token=None):
+        if self._async_token_lock is None:
+            self._async_token_lock = asyncio.Lock()
+        async with self._async_token_lock:
+            if self.access_token is None or self.access_token == stale_token:
+                await self._aauthenticate()
+
+    async def _arequest(self, method, path, **kwargs):
+        if not self.access_token or not self.instance_url:
+            await self._arefresh_token()
+        refreshed = False
+        attempt = 0
+        while True:
+            token = self.access_token
+            try:
+                response = await self._get_async_client().request(method, f"{self.instance_url}{SF_API_PATH}{path}", headers=self._headers(), **kwargs)
+            except (httpx.ConnectError, httpx.TimeoutException) as e:
+                retryable = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout)) or method == "GET"
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                SALESFORCE_RETRIES.inc(reason=type(e).__name__)
+                self.logger.warning(f"Salesforce {method} {path} failed ({e!r}), retrying in {delay:.2f}s")
+            else:
+                if response.status_code == 401 and not refreshed:
+                    self.logger.info("Salesforce token rejected, refreshing.")
+                    refreshed = True
+                    SALESFORCE_RETRIES.inc(reason="401")
+                    await self._arefresh_token(token)
+                    continue
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                SALESFORCE_RETRIES.inc(reason=str(response.status_code))
+                self.logger.warning(f"Salesforce {method} {path} returned {response.status_code}, retrying in {delay:.2f}s")
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def _record(self, operation, started, outcome):
+        SALESFORCE_SECONDS.observe(time.perf_counter() - started, operation=operation)
+        SALESFORCE_CALLS.inc(operation=operation, outcome=outcome)
+
+    def _lead_payload(self, lead_info):
+        return {
+            "LastName": lead_info["Name"],
+            "Company": lead_info["Company"],
+            "Email": lead_info["Email"],
+            "Phone": lead_info["Phone"]
+        }
+
+    def _lead_result(self, response):
+        if response.status_code == 201:
+            self.logger.info("Lead created successfully.")
+            return True, response.json().get("id")
+        elif response.status_code == 400 and "DUPLICATES_DETECTED" in response.text:
+            error_data = response.json()
+            match_records = (error_data[0].get("duplicateResult", {}).get("matchResults", [])[0].get("matchRecords", []))
+            if match_records:
+                self.logger.info("Duplicate lead detected, returning existing lead ID.")
+                return True, match_records[0]["record"]["Id"]
+        self.logger.error(f"Failed to create lead: {response.text}")
+        return False, None
+
     def create_lead(self, lead_info):
         self.logger.info(f"Creating lead with info: {lead_info}")
+        started = time.perf_counter()
         try:
-            if not self.access_token or not self.instance_url:
-                self._authenticate()
             if any(value == "N/A" for value in lead_info.values()):
                 self.logger.warning("Lead info contains 'N/A', aborting lead creation.")
                 return False, None
-            lead_url = f"{self.instance_url}/services/data/v60.0/sobjects/Lead/"
-            headers = {"Authorization": f"Bearer {self.access_token}", "Content-Type": "application/json"}
-            sf_lead_payload = {
-                "LastName": lead_info["Name"],
-                "Company": lead_info["Company"],
-                "Email": lead_info["Email"],
-                "Phone": lead_info["Phone"]
-            }
-            response = requests.post(lead_url, headers=headers, json=sf_lead_payload)
-            if response.status_code == 201:
-                self.logger.info("Lead created successfully.")
-                return True, response.json().get("id")
-            elif response.status_code == 400 and "DUPLICATES_DETECTED" in response.text:
-                error_data = response.json()
-                match_records = (error_data[0].get("duplicateResult", {}).get("matchResults", [])[0].get("matchRecords", []))
-                if match_records:
-                    self.logger.info("Duplicate lead detected, returning existing lead ID.")
-                    return True, match_records[0]["record"]["Id"]
-            self.logger.error(f"Failed to create lead: {response.text}")
+            response = self._request("POST", "/sobjects/Lead/", json=self._lead_payload(lead_info))
+            result = self._lead_result(response)
+            self._record("create_lead", started, "success" if result[0] else "failure")
+            return result
+        except Exception as e:
+            self._record("create_lead", started, "error")
+            self.logger.error(f"Failed to create lead: {str(e)}")
             return False, None
+
+    async def acreate_lead(self, lead_info):
+        self.logger.info(f"Creating lead with info: {lead_info}")
+        started = time.perf_counter()
+        try:
+            if any(value == "N/A" for value in lead_info.values()):
+                self.logger.warning("Lead info contains 'N/A', aborting lead creation.")
+                return False, None
+            response = await self._arequest("POST", "/sobjects/Lead/", json=self._lead_payload(lead_info))
+            result = self._lead_result(response)
+            self._record("create_lead", started, "success" if result[0] else "failure")
+            return result
         except Exception as e:
+            self._record("create_lead", started, "error")
             self.logger.error(f"Failed to create lead: {str(e)}")
             return False, None
 
-    def create_meeting(self, lead_id, start_time_str):
-        self.logger.info(f"Creating meeting for lead_id={lead_id} at {start_time_str}")
+    def today(self):
+        """Today's date in the meeting timezone."""
+        return datetime.now(self.meeting_tz).date()
+
+    def _event_payload(self, lead_id, start_time_str, day=None):
+        start_dt = datetime.strptime(start_time_str, "%H:%M")
+        start_local_dt = self.meeting_tz.localize(datetime.combine(day or self.today(), start_dt.time()))
+        start_utc_dt = start_local_dt.astimezone(pytz.utc)
+        end_utc_dt = start_utc_dt + timedelta(minutes=self.slot_minutes)
+        return {
+            "Subject": "Call with Sales Advisor",
+            "StartDateTime": start_utc_dt.isoformat(),
+            "EndDateTime": end_utc_dt.isoformat(),
+            "OwnerId": "0055j00000BYNIBAA5",
+            "WhoId": lead_id,
+            "Location": "Virtual Call",
+            "Description": "Scheduled via Agentic Bot"
+        }
+
+    def _meeting_result(self, response, start_time_str, day=None):
+        if response.status_code == 201:
+            self.logger.info("Meeting created successfully.")
+            self.availability_cache.remove_slot((day or self.today()).isoformat(), start_time_str)
+            return True
+        self.logger.error(f"Failed to create meeting: {response.text}")
+        return False
+
+    def create_meeting(self, lead_id, start_time_str, day=None):
+        self.logger.info(f"Creating meeting for lead_id={lead_id} at {day or 'today'} {start_time_str}")
+        started = time.perf_counter()
         try:
-            if not self.access_token or not self.instance_url:
-                self._authenticate()
-            event_url = f"{self.instance_url}/services/data/v60.0/sobjects/Event/"
-            headers = {"Authorization": f"Bearer {self.access_token}", "Content-Type": "application/json"}
-            start_dt = datetime.strptime(start_time_str, "%H:%M")
-            ist = pytz.timezone('Asia/Kolkata')
-            today_local = datetime.now(ist).date()
-            start_local_dt = ist.localize(datetime.combine(today_local, start_dt.time()))
-            start_utc_dt = start_local_dt.astimezone(pytz.utc) + timedelta(hours=5) + timedelta(minutes=30)
-            end_utc_dt = start_utc_dt + timedelta(minutes=30)
-            event_payload = {
-                "Subject": "Call with Sales Advisor",
-                "StartDateTime": start_utc_dt.isoformat(),
-                "EndDateTime": end_utc_dt.isoformat(),
-                "OwnerId": "0055j00000BYNIBAA5",
-                "WhoId": lead_id,
-                "Location": "Virtual Call",
-                "Description": "Scheduled via Agentic Bot"
-            }
-            response = requests.post(event_url, headers=headers, json=event_payload)
-            if response.status_code == 201:
-                self.logger.info("Meeting created successfully.")
-                return True
-            else:
-                self.logger.error(f"Failed to create meeting: {response.text}")
-                return False
+            response = self._request("POST", "/sobjects/Event/", json=self._event_payload(lead_id, start_time_str, day))
+            result = self._meeting_result(response, start_time_str, day)
+            self._record("create_meeting", started, "success" if result else "failure")
+            return result
         except Exception as e:
+            self._record("create_meeting", started, "error")
             self.logger.error(f"Exception while creating meeting: {str(e)}")
             return False
 
-    def show_availableMeeting(self):
-        self.logger.info("Fetching available meeting slots...")
-        start_times = set()
+    async def acreate_meeting(self, lead_id, start_time_str, day=None):
+        self.logger.info(f"Creating meeting for lead_id={lead_id} at {day or 'today'} {start_time_str}")
+        started = time.perf_counter()
         try:
-            if not self.access_token or not self.instance_url:
-                self._authenticate()
-            event_url = f"{self.instance_url}/services/data/v60.0/query?q=SELECT+StartDateTime,+EndDateTime+FROM+Event+WHERE+StartDateTime+=+TODAY"
-            headers = {"Authorization": f"Bearer {self.access_token}", "Content-Type": "application/json"}
-            response = requests.get(event_url, headers=headers)
-            if response.status_code == 200:
-                data = response.json()
-                records = data.get("records", [])
-                fmt = "%H:%M"
-                start_time = datetime.strptime("08:00", fmt)
-                end_time = datetime.strptime("17:00", fmt)
-                all_slots = set()
-                current = start_time
-                while current < end_time:
-                    all_slots.add(current.strftime(fmt))
-                    current += timedelta(minutes=30)
-                for event in records:
-                    start = event.get("StartDateTime")
-                    if start:
-                        try:
-                            dt = datetime.strptime(start, "%Y-%m-%dT%H:%M:%S.%f%z")
-                            time_only = dt.strftime("%H:%M")
-                            start_times.add(time_only)
-                        except Exception:
-                            self.logger.warning(f"Could not parse event start time: {start}")
-                available_slots = sorted(all_slots - start_times)
-                self.logger.info(f"Available slots: {available_slots}")
-                return available_slots
+            response = await self._arequest("POST", "/sobjects/Event/", json=self._event_payload(lead_id, start_time_str, day))
+            result = self._meeting_result(response, start_time_str, day)
+            self._record("create_meeting", started, "success" if result else "failure")
+            return result
+        except Exception as e:
+            self._record("create_meeting", started, "error")
+            self.logger.error(f"Exception while creating meeting: {str(e)}")
+            return False
+
+    def _events_query(self, start_date, days):
+        start, end = day_bounds(self.meeting_tz, start_date, days)
+        fmt = "%Y-%m-%dT%H:%M:%SZ"
+        return {"q": EVENTS_SOQL.format(start=start.strftime(fmt), end=end.strftime(fmt))}
+
+    def _availability(self, response, start_date, days):
+        if response.status_code != 200:
             self.logger.error(f"Failed to fetch meeting slots: {response.text}")
-            return []
+            return None
+        busy = []
+        for event in response.json().get("records", []):
+            start, end = event.get("StartDateTime"), event.get("EndDateTime")
+            if not start:
+                continue
+            try:
+                start_dt = parse_sf_datetime(start)
+                end_dt = parse_sf_datetime(end) if end else start_dt + timedelta(minutes=self.slot_minutes)
+                busy.append((start_dt, end_dt))
+            except ValueError:
+                self.logger.warning(f"Could not parse event time: {start} - {end}")
+        availability = compute_availability(busy, start_date, days, self.work_start, self.work_end,
+                                            self.slot_minutes, self.meeting_tz, not_before=datetime.now(self.meeting_tz))
+        self.logger.info(f"Available slots: {availability}")
+        return availability
+
+    def _fetch_availability(self, start_date, days):
+        self.logger.info(f"Querying Salesforce for events from {start_date} over {days} day(s)...")
+        started = time.perf_counter()
+        try:
+            response = self._request("GET", "/query", params=self._events_query(start_date, days))
+            availability = self._availability(response, start_date, days)
+            self._record("query_events", started, "failure" if availability is None else "success")
+            return availability
         except Exception as e:
+            self._record("query_events", started, "error")
             self.logger.error(f"Exception while showing meeting: {str(e)}")
-            return []
+            return None
+
+    async def _afetch_availability(self, start_date, days):
+        self.logger.info(f"Querying Salesforce for events from {start_date} over {days} day(s)...")
+        started = time.perf_counter()
+        try:
+            response = await self._arequest("GET", "/query", params=self._events_query(start_date, days))
+            availability = self._availability(response, start_date, days)
+            self._record("query_events", started, "failure" if availability is None else "success")
+            return availability
+        except Exception as e:
+            self._record("query_events", started, "error")
+            self.logger.error(f"Exception while showing meeting: {str(e)}")
+            return None
+
+    def _availability_key(self, start_date, days):
+        return (start_date.isoformat(), days, self.work_start, self.work_end, self.slot_minutes)
+
+    def _upcoming(self, availability):
+        """Drop the slots that have started since ``availability`` was computed (it may come from the cache)."""
+        now = datetime.now(self.meeting_tz)
+        today, current = now.date().isoformat(), now.strftime("%H:%M")
+        return {day: [slot for slot in slots if day > today or slot > current] if day >= today else []
+                for day, slots in availability.items()}
+
+    def get_availability(self, start_date=None, days=1):
+        """Free slots per ISO date for ``days`` days from ``start_date`` (default today), from one SOQL query."""
+        start_date = start_date or self.today()
+        key = self._availability_key(start_date, days)
+        return self._upcoming(self.availability_cache.get(key, lambda: self._fetch_availability(start_date, days)) or {})
+
+    async def aget_availability(self, start_date=None, days=1):
+        start_date = start_date or self.today()
+        key = self._availability_key(start_date, days)
+        return self._upcoming(await self.availability_cache.aget(key, lambda: self._afetch_availability(start_date, days)) or {})
+
+    def _first_free_day(self, availability):
+        for day, slots in sorted(availability.items()):
+            if slots:
+                return datetime.strptime(day, "%Y-%m-%d").date(), slots
+        return None, []
+
+    def next_available_slots(self, days=MEETING_LOOKAHEAD_DAYS):
+        """(day, free slots) for the first of the next ``days`` days with a free slot, or (None, [])."""
+        return self._first_free_day(self.get_availability(self.today(), days))
+
+    async def anext_available_slots(self, days=MEETING_LOOKAHEAD_DAYS):
+        return self._first_free_day(await self.aget_availability(self.today(), days))
+
+    def show_availableMeeting(self):
+        self.logger.info("Fetching available meeting slots...")
+        today = self.today()
+        return self.get_availability(today).get(today.isoformat(), [])
+
+    async def ashow_availableMeeting(self):
+        self.logger.info("Fetching available meeting slots...")
+        today = self.today()
+        return (await self.aget_availability(today)).get(today.isoformat(), [])
@@ -0,0 +1,218 @@
+import asyncio
+import copy
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Any, Iterator, Optional
+from sales_rag_bot import SalesRAGAgent, AgentResources
+from session_store import SessionStore
+import logging
+
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "5000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_MEMORY_MB = float(os.getenv("SESSION_MEMORY_MB", "256"))
+
+# Rough fixed cost of one session (agent, LeadTool, MeetingTool, containers).
+SESSION_BASE_BYTES = 4096
+
+
+def estimate_session_bytes(agent: SalesRAGAgent) -> int:
+    """Approximate memory held by a session's per-conversation state."""
+    size = SESSION_BASE_BYTES
+    size += agent.conversation_history.approx_bytes()
+    size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in agent.lead_tool.partial_lead_info.items())
+    size += sum(sys.getsizeof(s) for s in agent.meeting_tool.available_slots)
+    return size
+
+
+class _Session:
+    __slots__ = ("agent", "lock", "alock", "last_access", "size")
+
+    def __init__(self, agent: SalesRAGAgent):
+        self.agent = agent
+        self.lock = threading.Lock()
+        self.alock = asyncio.Lock()
+        self.last_access = time.monotonic()
+        self.size = estimate_session_bytes(agent)
+
+
+class SessionManager:
+    """Per-sender conversations on top of one shared set of AgentResources.
+
+    Sessions only hold lightweight state (lead state, partial lead info, history,
+    offered slots) and are evicted least-recently-used first once the session
+    count or the approximate memory cap is exceeded, or when idle longer than
+    ``idle_ttl`` seconds.
+
+    With a ``store`` the stored record is the source of truth: each turn takes
+    the session's lease, refreshes the local agent if another worker has moved
+    the conversation on, and saves the record afterwards. Any number of
+    workers can then serve the same senders, and a restart loses nothing.
+    """
+
+    def __init__(self, resources: AgentResources, max_sessions: int = MAX_SESSIONS,
+                 idle_ttl: float = SESSION_IDLE_TTL, max_memory_mb: float = SESSION_MEMORY_MB,
+                 store: Optional[SessionStore] = None):
+        self.logger = logging.getLogger("session_manager")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.resources = resources
+        self.store = store
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self._total_bytes
+
+    def _get_session(self, session_id: str) -> _Session:
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session(SalesRAGAgent(resources=self.resources))
+                self._sessions[session_id] = session
+                self._total_bytes += session.size
+                self.logger.info(f"Created session for {session_id} ({len(self._sessions)} active)")
+                self._evict_over_capacity(keep=session_id)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_access = now
+            return session
+
+    def get(self, session_id: str) -> SalesRAGAgent:
+        return self._get_session(session_id).agent
+
+    def _refresh(self, agent: SalesRAGAgent, record: Optional[Dict[str, Any]]) -> None:
+        if record is None or record.get("version") != agent.record_version:
+            agent.load_record(record)
+
+    @contextmanager
+    def _rollback_on_failure(self, session_id: str, agent: SalesRAGAgent) -> Iterator[None]:
+        """Put the agent back as it was before the turn if the turn raises (or its stream is abandoned)."""
+        before = copy.deepcopy(agent.to_record())
+        try:
+            yield
+        except BaseException:
+            self.logger.warning(f"Turn for {session_id} did not complete; restoring the session's previous state")
+            agent.load_record(before)
+            raise
+
+    @contextmanager
+    def _turn(self, session_id: str, session: _Session) -> Iterator[None]:
+        # Messages from the same sender are handled one at a time, in order (across workers with a store).
+        with session.lock:
+            if self.store is None:
+                with self._rollback_on_failure(session_id, session.agent):
+                    yield
+                return
+            with self.store.lock(session_id):
+                self._refresh(session.agent, self.store.load(session_id))
+                with self._rollback_on_failure(session_id, session.agent):
+                    yield
+                # Not reached when the turn fails, so the stored state stays as it was.
+                session.agent.record_version += 1
+                self.store.save(session_id, session.agent.to_record())
+
+    @asynccontextmanager
+    async def _aturn(self, session_id: str, session: _Session) -> AsyncIterator[None]:
+        async with session.alock:
+            if self.store is None:
+                with self._rollback_on_failure(session_id, session.agent):
+                    yield
+                return
+            async with self.store.alock(session_id):
+                self._refresh(session.agent, await self.store.aload(session_id))
+                with self._rollback_on_failure(session_id, session.agent):
+                    yield
+                session.agent.record_version += 1
+                await self.store.asave(session_id, session.agent.to_record())
+
+    def process(self, session_id: str, message: str) -> Dict[str, Any]:
+        session = self._get_session(session_id)
+        with self._turn(session_id, session):
+            result = session.agent.process(message)
+        self._update_size(session_id, session)
+        return result
+
+    async def aprocess(self, session_id: str, message: str) -> Dict[str, Any]:
+        session = self._get_session(session_id)
+        async with self._aturn(session_id, session):
+            result = await session.agent.aprocess(message)
+        self._update_size(session_id, session)
+        return result
+
+    def stream(self, session_id: str, message: str) -> Iterator[Dict[str, Any]]:
+        session = self._get_session(session_id)
+        with self._turn(session_id, session):
+            yield from session.agent.stream(message)
+        self._update_size(session_id, session)
+
+    async def astream(self, session_id: str, message: str) -> AsyncIterator[Dict[str, Any]]:
+        session = self._get_session(session_id)
+        async with self._aturn(session_id, session):
+            async for event in session.agent.astream(message):
+                yield event
+        self._update_size(session_id, session)
+
+    def _update_size(self, session_id: str, session: _Session) -> None:
+        size = estimate_session_bytes(session.agent)
+        with self._lock:
+            if self._sessions.get(session_id) is session:
+                self._total_bytes += size - session.size
+                session.size = size
+                self._evict_over_capacity(keep=session_id)
+
+    def drop(self, session_id: str) -> None:
+        with self._lock:
+            self._remove(session_id)
+        if self.store is not None:
+            self.store.delete(session_id)
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            return self._evict_expired(time.monotonic())
+
+    def _remove(self, session_id: str) -> Optional[_Session]:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_bytes -= session.size
+        return session
+
+    def _evict_expired(self, now: float) -> int:
+        evicted = 0
+        # The dict is in LRU order, so stop at the first session that is still fresh.
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.idle_ttl:
+                break
+            self._remove(session_id)
+            evicted += 1
+        if evicted:
+            self.logger.info(f"Evicted {evicted} idle sessions")
+        return evicted
+
+    def _evict_over_capacity(self, keep: Optional[str] = None) -> None:
+        while len(self._sessions) > 1 and (
+            len(self._sessions) > self.max_sessions or self._total_bytes > self.max_memory_bytes
+        ):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                break
+            self._remove(session_id)
+            self.logger.info(f"Evicted least recently used session {session_id}")
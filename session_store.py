@@ -0,0 +1,225 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
+import logging
+
+# "memory" keeps sessions in the process only (single worker); "sqlite" shares them between
+# workers on one host; "redis" between hosts.
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+# Stored sessions idle this long are deleted.
+SESSION_STORE_TTL = float(os.getenv("SESSION_STORE_TTL", str(7 * 24 * 3600)))
+# A turn holding a session longer than this (a crashed worker) loses its lease.
+SESSION_LOCK_TTL = float(os.getenv("SESSION_LOCK_TTL", "120"))
+SESSION_LOCK_TIMEOUT = float(os.getenv("SESSION_LOCK_TIMEOUT", "60"))
+LOCK_POLL_INTERVAL = 0.02
+
+
+class SessionLockTimeout(Exception):
+    pass
+
+
+def encode_record(record: dict) -> str:
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+
+
+class SessionStore:
+    """Session records shared by every worker process, plus a per-session lease.
+
+    A networked backend implements ``load``/``save``/``delete`` as a keyed
+    get/set with expiry and ``try_acquire``/``release`` as an expiring
+    set-if-absent owned by a token (see RedisSessionStore). The async variants
+    run the blocking calls in a thread; a backend with a native async client
+    can override them.
+    """
+
+    def load(self, session_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def save(self, session_id: str, record: dict) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def try_acquire(self, session_id: str, owner: str, ttl: float) -> bool:
+        """Take the session's lease for ``ttl`` seconds unless someone else holds it."""
+        raise NotImplementedError
+
+    def release(self, session_id: str, owner: str) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    @contextmanager
+    def lock(self, session_id: str, timeout: float = SESSION_LOCK_TIMEOUT) -> Iterator[None]:
+        """Hold the session across processes for one turn, so turns of a sender never interleave."""
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not self.try_acquire(session_id, owner, SESSION_LOCK_TTL):
+            if time.monotonic() > deadline:
+                raise SessionLockTimeout(f"Session {session_id} is busy")
+            time.sleep(LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            self.release(session_id, owner)
+
+    @asynccontextmanager
+    async def alock(self, session_id: str, timeout: float = SESSION_LOCK_TIMEOUT) -> AsyncIterator[None]:
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not await asyncio.to_thread(self.try_acquire, session_id, owner, SESSION_LOCK_TTL):
+            if time.monotonic() > deadline:
+                raise SessionLockTimeout(f"Session {session_id} is busy")
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self.release, session_id, owner)
+
+    async def aload(self, session_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.load, session_id)
+
+    async def asave(self, session_id: str, record: dict) -> None:
+        await asyncio.to_thread(self.save, session_id, record)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in one SQLite file in WAL mode: any number of worker processes on a single host.
+
+    Each turn costs an indexed read and two small writes; WAL lets readers run
+    while another process writes.
+    """
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_STORE_TTL):
+        self.logger = logging.getLogger("session_store")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._saves = 0
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, record TEXT, updated REAL NOT NULL, "
+            "lock_owner TEXT, locked_until REAL NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+        self.logger.info(f"Session store at {path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared between threads; asyncio.to_thread uses several.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT record FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def save(self, session_id: str, record: dict) -> None:
+        self._conn().execute(
+            "INSERT INTO sessions (id, record, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET record = excluded.record, updated = excluded.updated",
+            (session_id, encode_record(record), time.time()),
+        )
+        self._saves += 1
+        if self._saves % 1000 == 0:
+            self.purge()
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def try_acquire(self, session_id: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            "INSERT INTO sessions (id, record, updated, lock_owner, locked_until) VALUES (?, NULL, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET lock_owner = excluded.lock_owner, locked_until = excluded.locked_until "
+            "WHERE sessions.locked_until < ?",
+            (session_id, now, owner, now + ttl, now),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, session_id: str, owner: str) -> None:
+        self._conn().execute(
+            "UPDATE sessions SET lock_owner = NULL, locked_until = 0 WHERE id = ? AND lock_owner = ?",
+            (session_id, owner),
+        )
+
+    def purge(self) -> int:
+        """Delete sessions idle longer than the TTL."""
+        now = time.time()
+        cursor = self._conn().execute(
+            "DELETE FROM sessions WHERE updated < ? AND locked_until < ?", (now - self.ttl, now)
+        )
+        if cursor.rowcount:
+            self.logger.info(f"Purged {cursor.rowcount} idle sessions")
+        return cursor.rowcount
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions in Redis, shared by workers on any number of hosts (needs the ``redis`` package)."""
+
+    # Delete the lease only if it is still ours.
+    RELEASE_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url: str = SESSION_REDIS_URL, ttl: float = SESSION_STORE_TTL, prefix: str = "chatbot:session:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def load(self, session_id: str) -> Optional[dict]:
+        data = self.client.get(self.prefix + session_id)
+        return json.loads(data) if data else None
+
+    def save(self, session_id: str, record: dict) -> None:
+        self.client.set(self.prefix + session_id, encode_record(record), ex=int(self.ttl))
+
+    def delete(self, session_id: str) -> None:
+        self.client.delete(self.prefix + session_id)
+
+    def try_acquire(self, session_id: str, owner: str, ttl: float) -> bool:
+        return bool(self.client.set(f"{self.prefix}{session_id}:lock", owner, nx=True, px=int(ttl * 1000)))
+
+    def release(self, session_id: str, owner: str) -> None:
+        self._release(keys=[f"{self.prefix}{session_id}:lock"], args=[owner])
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def create_session_store(kind: str = SESSION_STORE) -> Optional[SessionStore]:
+    """The store named by SESSION_STORE; None for "memory" (sessions stay in this process)."""
+    if kind == "memory":
+        return None
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    if kind == "redis":
+        return RedisSessionStore()
+    raise ValueError(f"Unknown SESSION_STORE {kind!r}, expected memory, sqlite or redis")
@@ -0,0 +1,30 @@
+import json
+from typing import Any, AsyncIterator, Dict
+from fastapi.responses import StreamingResponse
+import logging
+
+logger = logging.getLogger("sse")
+
+
+def format_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _encode(events: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            event = dict(event)
+            yield format_event(event.pop("type"), event)
+    except Exception as e:
+        logger.error(f"Streaming turn failed: {e}")
+        yield format_event("error", {"detail": str(e)})
+
+
+def stream_response(events: AsyncIterator[Dict[str, Any]]) -> StreamingResponse:
+    """Server-Sent Events for an agent's ``astream``: ``token`` events, then ``final`` (or ``error``)."""
+    return StreamingResponse(
+        _encode(events),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream and hiding the first token.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
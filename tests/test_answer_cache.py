@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from answer_cache import SemanticAnswerCache, is_standalone_question
+from benchmarks.fakes import FakeChatModel, fake_embeddings, fake_vector_store
+from faq_index import FAQIndex
+from pdf_qa_tool import NO_CONTEXT_REPLY, PDFQATool
+
+QUESTION = "What is Emaar Beachfront?"
+BEACHFRONT = "Emaar Beachfront has apartments with private beach access."
+REFUSAL = "Sorry, I can only answer questions related to Emaar Property, meetings, or our services,location."
+
+
+def qa_tool(reply: str = BEACHFRONT, **kwargs) -> PDFQATool:
+    embeddings = fake_embeddings()
+    return PDFQATool(None, llm=FakeChatModel(latency=0, responder=lambda prompt: reply), embeddings=embeddings,
+                     vector_store=fake_vector_store(embeddings), answer_cache=SemanticAnswerCache(),
+                     faq_index=FAQIndex(), answer_mode="auto", **kwargs)
+
+
+def ask(tool: PDFQATool, history=(), lead_info=None, lead_state="no_interest", message=QUESTION) -> str:
+    return tool.answer(message, [*history, f"Human: {message}"], lead_info or {}, lead_state)
+
+
+LATER_TURN = ["Human: Hi", "Assistant: Hello! How can I help?", "Human: Do you have villas in Dubai Hills?",
+              "Assistant: Yes, Dubai Hills Estate has villas and townhouses."]
+
+
+def test_first_turn_answer_is_reused():
+    tool = qa_tool()
+    assert ask(tool) == BEACHFRONT
+    assert ask(tool) == BEACHFRONT
+    assert tool.llm.calls == 1
+
+
+def test_answer_is_keyed_on_lead_state():
+    tool = qa_tool()
+    ask(tool)
+    ask(tool, lead_state="interest_detected")
+    assert tool.llm.calls == 2
+
+
+@pytest.mark.parametrize("mode", ["auto", "single_call", "two_call"])
+def test_repeated_question_hits_on_a_later_turn(mode):
+    tool = qa_tool()
+    tool.answer_mode = mode
+    ask(tool)
+    calls = tool.llm.calls
+    assert ask(tool, history=LATER_TURN) == BEACHFRONT
+    assert tool.llm.calls == calls
+
+
+def test_follow_up_questions_bypass_the_cache():
+    tool = qa_tool()
+    ask(tool, message="How much is it?")
+    ask(tool, history=LATER_TURN, message="How much is it?")
+    assert tool.llm.calls == 2
+    assert len(tool.answer_cache) == 0
+
+
+@pytest.mark.parametrize("question, standalone", [
+    ("What payment plans do you have?", True),
+    ("Is there a post-handover plan?", True),
+    ("How much is it?", False),
+    ("And the villas?", False),
+    ("What about Dubai Hills?", False),
+    ("price?", False),
+])
+def test_standalone_questions(question, standalone):
+    assert is_standalone_question(question) is standalone
+
+
+def test_personal_lead_info_bypasses_the_cache():
+    tool = qa_tool()
+    ask(tool, lead_info={"Name": "Sara Khan"})
+    assert len(tool.answer_cache) == 0
+
+
+def test_refusals_are_not_cached():
+    tool = qa_tool(reply=REFUSAL)
+    ask(tool)
+    tool._cache_store(QUESTION, None, "no_interest", NO_CONTEXT_REPLY)
+    assert len(tool.answer_cache) == 0
+
+
+def test_index_change_invalidates_answers():
+    tool = qa_tool()
+    ask(tool)
+    tool._index_changed("rebuilt")
+    assert len(tool.answer_cache) == 0
+    ask(tool)
+    assert tool.llm.calls == 2
+
+
+def test_semantic_lookup_threshold_and_lead_state():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.put("price of a villa", [1.0, 0.0], "no_interest", "From 3M AED.")
+    assert cache.get([0.99, 0.05], "no_interest") == "From 3M AED."
+    assert cache.get([0.99, 0.05], "interest_detected") is None
+    assert cache.get([0.5, 0.5], "no_interest") is None
+    assert cache.get_by_text("Price of a villa?", "no_interest") == "From 3M AED."
+
+
+def test_expired_and_evicted_entries_are_gone():
+    expired = SemanticAnswerCache(ttl=-1)
+    expired.put("price of a villa", np.ones(2), "no_interest", "From 3M AED.")
+    assert expired.get_by_text("price of a villa", "no_interest") is None
+    small = SemanticAnswerCache(max_entries=1)
+    small.put("first", None, "no_interest", "1")
+    small.put("second", None, "no_interest", "2")
+    assert small.get_by_text("first", "no_interest") is None
+    assert small.get_by_text("second", "no_interest") == "2"
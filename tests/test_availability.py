@@ -0,0 +1,40 @@
+from datetime import date, datetime, time, timedelta
+import pytz
+from availability import compute_availability
+from benchmarks.fake_salesforce import FakeSalesforce
+from meeting_tool import MeetingTool
+from salesforce_api import SalesforceAPI
+
+DAY = date(2026, 10, 19)
+
+
+def test_slots_before_not_before_are_dropped():
+    now = pytz.utc.localize(datetime.combine(DAY, time(10, 15)))
+    slots = compute_availability([], DAY, 2, time(9, 0), time(12, 0), 30, pytz.utc, not_before=now)
+    assert slots == {"2026-10-19": ["10:30", "11:00", "11:30"],
+                     "2026-10-20": ["09:00", "09:30", "10:00", "10:30", "11:00", "11:30"]}
+
+
+def test_busy_intervals_block_every_slot_they_touch():
+    start = pytz.utc.localize(datetime.combine(DAY, time(9, 10)))
+    slots = compute_availability([(start, start + timedelta(minutes=30))], DAY, 1, time(9, 0), time(11, 0), 30, pytz.utc)
+    assert slots == {"2026-10-19": ["10:00", "10:30"]}
+
+
+def test_offered_slots_are_upcoming_and_booked_on_their_day():
+    with FakeSalesforce() as fake:
+        salesforce = SalesforceAPI(auth_url=fake.auth_url, work_start="00:00", work_end="23:59", slot_minutes=30)
+        meeting_tool = MeetingTool(salesforce)
+        slots = meeting_tool.get_slots()
+        now = datetime.now(pytz.utc)
+        assert slots
+        assert meeting_tool.slot_day in (now.date(), now.date() + timedelta(days=1))
+        if meeting_tool.slot_day == now.date():
+            assert meeting_tool.slot_day_label() == "today"
+            assert all(slot > now.strftime("%H:%M") for slot in slots)
+        assert meeting_tool.schedule("00Q000000000001", slots[0])
+        booked = datetime.fromisoformat(fake.events[0]["StartDateTime"])
+        assert booked.date() == meeting_tool.slot_day
+        if meeting_tool.get_slots() and meeting_tool.slot_day == booked.date():
+            assert slots[0] not in meeting_tool.available_slots
+        salesforce.close()
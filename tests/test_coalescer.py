@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+import message_coalescer
+from message_coalescer import MessageCoalescer, coalesce_gap, merge_bodies
+
+
+class Turns:
+    """process_batch stand-in recording each batch's bodies."""
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    async def __call__(self, sender, messages):
+        self.batches.append((sender, [m.body for m in messages]))
+        if self.error is not None:
+            raise self.error
+        return f"reply to {merge_bodies(messages)!r}"
+
+
+def test_burst_becomes_one_turn_answered_on_the_newest_message():
+    async def run():
+        turns = Turns()
+        coalescer = MessageCoalescer(turns, gap=0.05, max_wait=1)
+        first = coalescer.add("alice", "Hi")
+        await asyncio.sleep(0.01)
+        second = coalescer.add("alice", "price of a villa?", "SM2")
+        return turns, await first, await second, coalescer.stats()
+
+    turns, first, second, stats = asyncio.run(run())
+    assert turns.batches == [("alice", ["Hi", "price of a villa?"])]
+    assert first is None
+    assert second == "reply to 'Hi\\nprice of a villa?'"
+    assert stats["coalesce_messages"] == 2
+    assert stats["coalesce_turns"] == 1
+    assert stats["coalesce_open_bursts"] == 0
+
+
+def test_senders_and_separate_bursts_get_their_own_turns():
+    async def run():
+        turns = Turns()
+        coalescer = MessageCoalescer(turns, gap=0.02, max_wait=1)
+        replies = await asyncio.gather(coalescer.submit("alice", "one"), coalescer.submit("bob", "two"))
+        replies.append(await coalescer.submit("alice", "three"))
+        return turns, replies
+
+    turns, replies = asyncio.run(run())
+    assert sorted(turns.batches) == [("alice", ["one"]), ("alice", ["three"]), ("bob", ["two"])]
+    assert all(replies)
+
+
+def test_max_messages_closes_the_burst():
+    async def run():
+        turns = Turns()
+        coalescer = MessageCoalescer(turns, gap=10, max_wait=10, max_messages=2)
+        futures = [coalescer.add("alice", body) for body in ("a", "b", "c")]
+        await futures[1]
+        await coalescer.stop()
+        return turns
+
+    assert asyncio.run(run()).batches == [("alice", ["a", "b"]), ("alice", ["c"])]
+
+
+def test_max_wait_cuts_off_a_steady_stream():
+    async def run():
+        turns = Turns()
+        coalescer = MessageCoalescer(turns, gap=0.05, max_wait=0.12)
+        for i in range(10):
+            coalescer.add("bob", str(i))
+            await asyncio.sleep(0.03)
+        await coalescer.stop()
+        return turns
+
+    batches = [bodies for _, bodies in asyncio.run(run()).batches]
+    assert len(batches) >= 2
+    assert [body for bodies in batches for body in bodies] == [str(i) for i in range(10)]
+
+
+def test_failed_turn_reaches_the_waiting_request():
+    async def run():
+        coalescer = MessageCoalescer(Turns(error=RuntimeError("LLM down")), gap=0.01, max_wait=1)
+        with pytest.raises(RuntimeError):
+            await coalescer.submit("alice", "hello")
+        return coalescer.stats()
+
+    assert asyncio.run(run())["coalesce_failed_turns"] == 1
+
+
+def test_stop_flushes_open_bursts():
+    async def run():
+        turns = Turns()
+        coalescer = MessageCoalescer(turns, gap=60, max_wait=60)
+        reply = coalescer.add("alice", "hello")
+        await asyncio.sleep(0)
+        await coalescer.stop()
+        return turns, reply.result()
+
+    turns, reply = asyncio.run(run())
+    assert turns.batches == [("alice", ["hello"])]
+    assert reply == "reply to 'hello'"
+
+
+def test_merge_skips_blank_bodies():
+    async def run():
+        coalescer = MessageCoalescer(Turns(), gap=0.01)
+        futures = [coalescer.add("alice", body) for body in (" Hi ", "", "  ", "villa?")]
+        return await futures[-1]
+
+    assert asyncio.run(run()) == "reply to 'Hi\\nvilla?'"
+
+
+def test_coalescing_is_on_by_default_only_with_fast_ack(monkeypatch):
+    monkeypatch.setattr(message_coalescer, "COALESCE_GAP", None)
+    assert coalesce_gap(fast_ack=True) == message_coalescer.FAST_ACK_COALESCE_GAP
+    assert coalesce_gap(fast_ack=False) == 0
+    assert not MessageCoalescer(Turns()).enabled
+    monkeypatch.setattr(message_coalescer, "COALESCE_GAP", "0.5")
+    assert coalesce_gap(fast_ack=False) == 0.5
+    assert MessageCoalescer(Turns()).gap == 0.5
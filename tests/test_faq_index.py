@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+import faq_index
+from faq_index import FAQCollector, FAQIndex, extract_qa_pairs
+
+FAQ_PAGE = """Frequently Asked Questions
+Q1: What is the booking deposit?
+A: 10% of the purchase price.
+Q2: Do you offer
+post-handover plans?
+A: Yes, on selected projects:
+- Emaar Beachfront
+- Dubai Hills Estate
+3
+"""
+
+
+class TableEmbeddings:
+    """Embeddings stand-in returning fixed vectors, so similarities are known exactly."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[t] for t in texts]
+
+
+def test_extracts_marked_and_wrapped_questions():
+    assert extract_qa_pairs(FAQ_PAGE) == [
+        ("What is the booking deposit?", "10% of the purchase price."),
+        ("Do you offer post-handover plans?", "Yes, on selected projects:\n- Emaar Beachfront\n- Dubai Hills Estate"),
+    ]
+
+
+def test_extracts_plain_question_lines():
+    text = "Where is Creek Harbour?\nNext to Ras Al Khor.\nIs there a golf course?\nYes, in Dubai Hills.\n"
+    assert extract_qa_pairs(text) == [("Where is Creek Harbour?", "Next to Ras Al Khor."),
+                                      ("Is there a golf course?", "Yes, in Dubai Hills.")]
+
+
+def test_brochure_with_a_single_question_is_not_an_faq():
+    assert extract_qa_pairs("Looking for a home by the sea?\nEmaar Beachfront has it all.\n") == []
+
+
+def test_overlong_answers_are_left_to_rag(monkeypatch):
+    monkeypatch.setattr(faq_index, "FAQ_MAX_ANSWER_CHARS", 30)
+    assert extract_qa_pairs(FAQ_PAGE + "Q3: Is there a pool?\nA: Yes.\n") == [
+        ("What is the booking deposit?", "10% of the purchase price."),
+        ("Is there a pool?", "Yes."),
+    ]
+
+
+def test_collector_joins_pages_of_a_file():
+    collector = FAQCollector()
+    collector.on_page("faq.pdf", 0, "Q: What is the booking deposit?\nA: 10% of the")
+    collector.on_page("faq.pdf", 1, "purchase price.\nQ: Is there a pool?\nA: Yes.")
+    assert collector.pairs("faq.pdf")[0] == ("What is the booking deposit?", "10% of the purchase price.")
+    assert collector.pairs("other.pdf") == []
+
+
+def indexed(threshold: float = 0.93) -> FAQIndex:
+    index = FAQIndex(threshold=threshold)
+    embeddings = TableEmbeddings({"What is the booking deposit?": [1.0, 0.0, 0.0],
+                                  "Is there a pool?": [0.0, 1.0, 0.0]})
+    index.add("faq.pdf", [("What is the booking deposit?", "10%."), ("Is there a pool?", "Yes.")], embeddings)
+    return index
+
+
+def near_miss() -> np.ndarray:
+    # cos = 0.9 to the deposit question: related ("What is the deposit for villas?"), not the same question.
+    return np.array([0.9, 0.0, np.sqrt(1 - 0.9 ** 2)])
+
+
+def test_close_paraphrase_matches():
+    entry, score = indexed().match([0.99, 0.05, 0.0])
+    assert entry.answer == "10%."
+    assert score >= 0.93
+
+
+def test_near_miss_question_does_not_match():
+    assert indexed().match(near_miss()) is None
+
+
+def test_threshold_is_configurable():
+    entry, score = indexed(threshold=0.85).match(near_miss())
+    assert entry.question == "What is the booking deposit?"
+    assert score == pytest.approx(0.9)
+
+
+def test_saved_index_keeps_matching(tmp_path):
+    index = indexed()
+    index.remove("other.pdf")
+    index.save(str(tmp_path))
+    loaded = FAQIndex.load(str(tmp_path), threshold=0.5)
+    assert loaded.threshold == 0.5
+    assert loaded.match([0.0, 1.0, 0.0])[0].answer == "Yes."
+    index.remove("faq.pdf")
+    assert len(index) == 0 and index.match([1.0, 0.0, 0.0]) is None
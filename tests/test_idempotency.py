@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from idempotency import IdempotencyStore
+
+
+class Turn:
+    """Counts runs; each run waits for ``release`` when given one."""
+
+    def __init__(self, result="reply", error=None, release=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.release = release
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return f"{self.result} {self.calls}"
+
+
+def test_redelivery_after_completion_replays_the_result():
+    async def run():
+        store, turn = IdempotencyStore(), Turn()
+        first = await store.run("SM1", turn)
+        second = await store.run("SM1", turn)
+        return store, turn, first, second
+
+    store, turn, first, second = asyncio.run(run())
+    assert first == second == "reply 1"
+    assert turn.calls == 1
+    assert store.stats() == {"entries": 1, "replays": 1, "attached": 0}
+
+
+def test_redelivery_while_running_attaches_to_the_turn():
+    async def run():
+        store, turn = IdempotencyStore(), Turn(release=asyncio.Event())
+        first = asyncio.create_task(store.run("SM1", turn))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(store.run("SM1", turn))
+        await asyncio.sleep(0)
+        turn.release.set()
+        return store, turn, await asyncio.gather(first, second)
+
+    store, turn, results = asyncio.run(run())
+    assert results == ["reply 1", "reply 1"]
+    assert turn.calls == 1
+    assert store.attached == 1
+
+
+def test_failed_turn_is_forgotten_so_a_retry_runs_it():
+    async def run():
+        store, failing = IdempotencyStore(), Turn(error=RuntimeError("LLM down"))
+        with pytest.raises(RuntimeError):
+            await store.run("SM1", failing)
+        assert len(store) == 0
+        return await store.run("SM1", Turn())
+
+    assert asyncio.run(run()) == "reply 1"
+
+
+def test_duplicate_attached_to_a_failing_turn_sees_the_error():
+    async def run():
+        store, turn = IdempotencyStore(), Turn(error=RuntimeError("LLM down"), release=asyncio.Event())
+        first = asyncio.create_task(store.run("SM1", turn))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(store.run("SM1", turn))
+        await asyncio.sleep(0)
+        turn.release.set()
+        return await asyncio.gather(first, second, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_requests_without_a_key_always_run():
+    async def run():
+        store, turn = IdempotencyStore(), Turn()
+        await store.run(None, turn)
+        await store.run("", turn)
+        return store, turn
+
+    store, turn = asyncio.run(run())
+    assert turn.calls == 2
+    assert len(store) == 0
+
+
+def test_entries_expire_and_stay_bounded():
+    async def run():
+        expired, turn = IdempotencyStore(ttl=0), Turn()
+        await expired.run("SM1", turn)
+        await expired.run("SM1", turn)
+        bounded = IdempotencyStore(max_entries=2)
+        for sid in ("SM1", "SM2", "SM3"):
+            await bounded.run(sid, Turn())
+        return turn, bounded
+
+    turn, bounded = asyncio.run(run())
+    assert turn.calls == 2
+    assert len(bounded) == 2
+    assert bounded._get("SM1") is None
+
+
+def test_claim_skips_keys_in_flight_or_done():
+    async def run():
+        store = IdempotencyStore()
+        claims = [store.claim("SM1"), store.claim("SM1")]
+        store.complete("SM1", "reply")
+        claims.append(store.claim("SM1"))
+        store.fail("SM2", RuntimeError("never claimed"))
+        return claims, store
+
+    claims, store = asyncio.run(run())
+    assert claims == [True, False, False]
+    assert store.replays == 2
@@ -0,0 +1,88 @@
+import os
+import pytest
+from benchmarks.fakes import fake_embeddings
+from knowledge_base import KnowledgeBase
+from conftest import make_pdf
+
+
+def brochure(path, project):
+    make_pdf(path, [[f"{project} offers apartments and villas in Dubai.", f"{project} payment plans start at 10% on booking."]])
+
+
+def sources(kb):
+    store = kb.vector_store
+    if store is None:
+        return []
+    return sorted(d.metadata["source"] for d in store.docstore._dict.values())
+
+
+@pytest.fixture
+def kb_dir(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    return docs
+
+
+def open_kb(docs, tmp_path):
+    return KnowledgeBase(str(docs), fake_embeddings(), "fake", index_dir=str(tmp_path / "index"))
+
+
+def test_sync_adds_and_removes_files(kb_dir, tmp_path):
+    brochure(kb_dir / "beachfront.pdf", "Emaar Beachfront")
+    kb = open_kb(kb_dir, tmp_path)
+    assert kb.files == ["beachfront.pdf"]
+
+    brochure(kb_dir / "hills.pdf", "Dubai Hills")
+    changes = kb.sync()
+    assert changes["added"] == ["hills.pdf"]
+    assert set(sources(kb)) == {"beachfront.pdf", "hills.pdf"}
+
+    os.remove(kb_dir / "beachfront.pdf")
+    changes = kb.sync()
+    assert changes["removed"] == ["beachfront.pdf"]
+    assert set(sources(kb)) == {"hills.pdf"}
+    assert kb.vector_store.index.ntotal == len(kb.manifest["hills.pdf"]["ids"])
+
+
+def test_changed_file_replaces_its_vectors(kb_dir, tmp_path):
+    brochure(kb_dir / "hills.pdf", "Dubai Hills")
+    kb = open_kb(kb_dir, tmp_path)
+    old_ids = kb.manifest["hills.pdf"]["ids"]
+
+    brochure(kb_dir / "hills.pdf", "Dubai Hills Estate")
+    os.utime(kb_dir / "hills.pdf", ns=(0, 1))
+    assert kb.sync()["changed"] == ["hills.pdf"]
+    assert not set(old_ids) & set(kb.manifest["hills.pdf"]["ids"])
+    assert kb.vector_store.index.ntotal == len(kb.manifest["hills.pdf"]["ids"])
+
+
+def test_identical_files_under_different_paths(kb_dir, tmp_path):
+    brochure(kb_dir / "brochure.pdf", "Emaar Beachfront")
+    (kb_dir / "copy").mkdir()
+    brochure(kb_dir / "copy" / "brochure.pdf", "Emaar Beachfront")
+    kb = open_kb(kb_dir, tmp_path)
+    copy_path = os.path.join("copy", "brochure.pdf")
+    assert kb.files == sorted(["brochure.pdf", copy_path])
+    assert not set(kb.manifest["brochure.pdf"]["ids"]) & set(kb.manifest[copy_path]["ids"])
+
+    # Removing one copy leaves the other's vectors in place.
+    os.remove(kb_dir / "brochure.pdf")
+    kb.sync()
+    assert set(sources(kb)) == {copy_path}
+
+
+def test_duplicate_added_by_sync(kb_dir, tmp_path):
+    brochure(kb_dir / "a.pdf", "Creek Harbour")
+    kb = open_kb(kb_dir, tmp_path)
+    brochure(kb_dir / "b.pdf", "Creek Harbour")
+    assert kb.sync()["added"] == ["b.pdf"]
+    assert set(sources(kb)) == {"a.pdf", "b.pdf"}
+
+
+def test_reload_from_disk_skips_reindexing(kb_dir, tmp_path):
+    brochure(kb_dir / "a.pdf", "Creek Harbour")
+    brochure(kb_dir / "b.pdf", "Creek Harbour")
+    first = open_kb(kb_dir, tmp_path)
+    second = open_kb(kb_dir, tmp_path)
+    assert second.manifest == first.manifest
+    assert second.index_key == first.index_key
@@ -0,0 +1,93 @@
+import json
+import re
+from types import SimpleNamespace
+import pytest
+from benchmarks.fakes import FakeChatModel
+from lead_extractor import extract_fields, find_phone, is_ambiguous
+from lead_state import LeadState
+from lead_tool import LeadTool
+from sales_rag_bot import SalesRAGAgent
+
+
+@pytest.mark.parametrize("message", [
+    "Call me tomorrow",
+    "call me at 5pm",
+    "It's Emaar Beachfront right?",
+    "This is Downtown Dubai pricing?",
+    "I'm Dubai based",
+    "I'm interested in buying a villa in Dubai Hills",
+    "budget 2500000-3000000",
+    "Is 3000000 enough?",
+])
+def test_questions_have_no_contact_fields(message):
+    assert extract_fields(message) == {}
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("My name is Sara Khan", {"Name": "Sara Khan"}),
+    ("my name is sara khan", {"Name": "Sara Khan"}),
+    ("Call me Bob", {"Name": "Bob"}),
+    ("sara.khan@example.com and +971501234567", {"Email": "sara.khan@example.com", "Phone": "+971501234567"}),
+    ("my number is 050 123 4567", {"Phone": "050 123 4567"}),
+])
+def test_extracts_contact_details(message, expected):
+    assert extract_fields(message) == expected
+
+
+@pytest.mark.parametrize("text", ["2500000-3000000", "2500000 - 3000000", "3000000000", "12345"])
+def test_amounts_are_not_phones(text):
+    assert find_phone(text) == ""
+
+
+@pytest.mark.parametrize("message", ["I'm Sara", "I am Omar Haddad, omar@example.com", "call me bob",
+                                     "this is John", "Hi, this is John Smith"])
+def test_possible_introductions_go_to_the_llm(message):
+    fields = extract_fields(message)
+    assert "Name" not in fields
+    assert is_ambiguous(message, fields)
+
+
+@pytest.mark.parametrize("message", ["budget 2500000-3000000", "Call me tomorrow"])
+def test_unambiguous_non_contact_messages(message):
+    assert not is_ambiguous(message, extract_fields(message))
+
+
+def extraction_model() -> FakeChatModel:
+    """Answers the extraction prompt the way the real model does for introductions."""
+    def respond(prompt):
+        message = prompt.split("Message:", 1)[1].split("\nReturn ONLY", 1)[0]
+        name = re.search(r"(?:I'm|I am|this is)\s+([A-Z][a-z]+(?: [A-Z][a-z]+)?)", message)
+        return json.dumps({"Name": name.group(1) if name else None, "Company": None, "Email": None, "Phone": None})
+    return FakeChatModel(latency=0, responder=respond)
+
+
+@pytest.mark.parametrize("message, name", [("I'm Sara Khan", "Sara Khan"), ("I am Sara", "Sara"),
+                                           ("Hi, this is John Smith", "John Smith")])
+def test_introductions_count_as_contact_info_once_the_llm_extracts_them(message, name):
+    lead_tool = LeadTool(SimpleNamespace())
+    lead_tool.state = LeadState.COLLECTING_INFO
+    llm = extraction_model()
+    lead_tool.update_state(message, llm)
+    assert llm.calls == 1
+    assert lead_tool.partial_lead_info["Name"] == name
+    assert lead_tool.received_contact_info
+
+
+@pytest.mark.parametrize("message", ["This is Downtown Dubai pricing?", "What is the price of a villa?"])
+def test_questions_are_not_contact_info(message):
+    lead_tool = LeadTool(SimpleNamespace())
+    lead_tool.state = LeadState.COLLECTING_INFO
+    lead_tool.partial_lead_info = {"Email": "sara@example.com"}
+    lead_tool.update_state(message, extraction_model())
+    assert not lead_tool.received_contact_info
+
+
+def test_introduction_is_not_answered_as_a_product_question():
+    answered = []
+    pdf_qa_tool = SimpleNamespace(stream_answer=lambda message, *args: answered.append(message) or iter(["Villas."]))
+    agent = SalesRAGAgent(resources=SimpleNamespace(llm=extraction_model(), salesforce=SimpleNamespace(),
+                                                    pdf_qa_tool=pdf_qa_tool))
+    agent.lead_tool.state = LeadState.COLLECTING_INFO
+    result = agent.process("I'm Sara Khan")
+    assert answered == []
+    assert result["lead_info"]["Name"] == "Sara Khan"
@@ -0,0 +1,136 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from benchmarks.fakes import FakeChatModel
+from lead_state import LeadState
+from llm_scheduler import LLMBusyError, LLMScheduler, Priority, current_priority, reset_llm_priority, set_llm_priority
+from sales_rag_bot import BUSY_REPLY, SalesRAGAgent
+
+
+async def wait_for_waiting(scheduler: LLMScheduler, n: int) -> None:
+    while scheduler.stats()["waiting"] < n:
+        await asyncio.sleep(0.001)
+
+
+def test_waiters_are_admitted_by_priority_then_age():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, rate=0, max_queue=10, queue_timeout=5)
+        order = []
+
+        async def call(name, priority):
+            async with scheduler.aslot(priority):
+                order.append(name)
+
+        await scheduler.aacquire(Priority.FAQ)
+        tasks = []
+        for name, priority in [("summary", Priority.BACKGROUND), ("faq1", Priority.FAQ),
+                               ("lead", Priority.LEAD), ("faq2", Priority.FAQ)]:
+            tasks.append(asyncio.create_task(call(name, priority)))
+            await wait_for_waiting(scheduler, len(tasks))
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(run()) == ["lead", "faq1", "faq2", "summary"]
+
+
+def test_full_queue_displaces_a_lower_priority_waiter():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, rate=0, max_queue=1, queue_timeout=5)
+        await scheduler.aacquire(Priority.FAQ)
+        background = asyncio.create_task(scheduler.aacquire(Priority.BACKGROUND))
+        await wait_for_waiting(scheduler, 1)
+        lead = asyncio.create_task(scheduler.aacquire(Priority.LEAD))
+        with pytest.raises(LLMBusyError):
+            await background
+        scheduler.release()
+        await lead
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["shed"] == 1
+    assert stats["in_flight"] == 1
+
+
+def test_full_queue_refuses_a_newcomer_of_equal_priority():
+    async def run():
+        scheduler = LLMScheduler(max_concurrency=1, rate=0, max_queue=1, queue_timeout=5)
+        await scheduler.aacquire(Priority.FAQ)
+        waiting = asyncio.create_task(scheduler.aacquire(Priority.FAQ))
+        await wait_for_waiting(scheduler, 1)
+        with pytest.raises(LLMBusyError):
+            await scheduler.aacquire(Priority.FAQ)
+        scheduler.release()
+        await waiting
+
+    asyncio.run(run())
+
+
+def test_free_slot_is_granted_even_with_no_queue():
+    scheduler = LLMScheduler(max_concurrency=1, rate=0, max_queue=0)
+    with scheduler.slot(Priority.BACKGROUND):
+        assert scheduler.stats()["in_flight"] == 1
+    assert scheduler.stats() == {"in_flight": 0, "waiting": 0, "admitted": 1, "shed": 0}
+
+
+def test_waiting_past_the_timeout_sheds_the_call():
+    scheduler = LLMScheduler(max_concurrency=1, rate=0, max_queue=10, queue_timeout=0.05)
+    scheduler.acquire(Priority.FAQ)
+    with pytest.raises(LLMBusyError):
+        scheduler.acquire(Priority.LEAD)
+    assert scheduler.stats()["waiting"] == 0
+
+
+def test_reset_undoes_every_priority_set_since():
+    token = set_llm_priority(Priority.BACKGROUND)
+    set_llm_priority(Priority.LEAD)
+    assert current_priority() == Priority.LEAD
+    reset_llm_priority(token)
+    assert current_priority() == Priority.FAQ
+
+
+class ShedAnswers:
+    """PDF QA tool whose answer call is always shed, recording the priority it ran at."""
+
+    def __init__(self):
+        self.priorities = []
+
+    def stream_answer(self, *args):
+        self.priorities.append(current_priority())
+        raise LLMBusyError("LLM capacity exhausted (queue_full)")
+        yield
+
+    async def astream_answer(self, *args):
+        self.priorities.append(current_priority())
+        raise LLMBusyError("LLM capacity exhausted (queue_full)")
+        yield
+
+
+def shed_agent() -> SalesRAGAgent:
+    resources = SimpleNamespace(llm=FakeChatModel(latency=0), salesforce=SimpleNamespace(), pdf_qa_tool=ShedAnswers())
+    return SalesRAGAgent(resources=resources)
+
+
+def test_shed_turn_replies_busy_and_leaves_no_trace():
+    agent = shed_agent()
+    result = agent.process("I want to buy a villa in Dubai Hills")
+    assert result["response"] == BUSY_REPLY
+    assert agent.pdf_qa_tool.priorities == [Priority.LEAD]
+    assert list(agent.conversation_history) == []
+    assert agent.lead_tool.state == LeadState.NO_INTEREST
+    assert agent.lead_tool.partial_lead_info == {}
+    assert current_priority() == Priority.FAQ
+
+
+def test_shed_async_turn_replies_busy_and_leaves_no_trace():
+    async def run():
+        agent = shed_agent()
+        result = await agent.aprocess("I want to buy a villa in Dubai Hills")
+        return agent, result, current_priority()
+
+    agent, result, priority = asyncio.run(run())
+    assert result["response"] == BUSY_REPLY
+    assert agent.pdf_qa_tool.priorities == [Priority.LEAD]
+    assert list(agent.conversation_history) == []
+    assert agent.lead_tool.state == LeadState.NO_INTEREST
+    assert priority == Priority.FAQ
@@ -0,0 +1,60 @@
+import asyncio
+from reply_dispatcher import RecordingReplySender, ReplySender, ReplyWorkerPool, TurnJob
+
+SORRY = "Sorry, please send that again."
+
+
+async def run_jobs(process_turn, sender: ReplySender, jobs):
+    pool = ReplyWorkerPool(process_turn, sender, workers=2, failure_message=SORRY)
+    pool.start()
+    for job in jobs:
+        assert pool.submit(job)
+    await pool.stop()
+    return pool
+
+
+async def answer_or_fail(job: TurnJob) -> str:
+    if job.body == "boom":
+        raise RuntimeError("LLM down")
+    return f"reply to {job.body}"
+
+
+def test_replies_are_sent_to_the_sender():
+    sender = RecordingReplySender()
+    pool = asyncio.run(run_jobs(answer_or_fail, sender, [TurnJob("whatsapp:+971500000001", "whatsapp:+1415", "hi", "SM1")]))
+    assert sender.sent == [("whatsapp:+971500000001", "whatsapp:+1415", "reply to hi")]
+    assert pool.stats()["completed"] == 1
+
+
+def test_failed_turn_sends_the_failure_message():
+    sender = RecordingReplySender()
+    jobs = [TurnJob("whatsapp:+971500000001", "whatsapp:+1415", "boom", "SM1"),
+            TurnJob("whatsapp:+971500000002", "whatsapp:+1415", "hi", "SM2")]
+    pool = asyncio.run(run_jobs(answer_or_fail, sender, jobs))
+    assert sorted(sender.sent) == [("whatsapp:+971500000001", "whatsapp:+1415", SORRY),
+                                   ("whatsapp:+971500000002", "whatsapp:+1415", "reply to hi")]
+    assert pool.stats()["failed"] == 1
+    assert pool.stats()["completed"] == 1
+
+
+class BrokenSender(RecordingReplySender):
+    async def send(self, to: str, from_: str, body: str) -> None:
+        if body == SORRY:
+            raise ConnectionError("Twilio unreachable")
+        await super().send(to, from_, body)
+
+
+def test_worker_survives_a_failed_failure_notice():
+    sender = BrokenSender()
+    jobs = [TurnJob("a", "b", "boom"), TurnJob("a", "b", "boom"), TurnJob("a", "b", "hi")]
+    pool = ReplyWorkerPool(answer_or_fail, sender, workers=1, failure_message=SORRY)
+
+    async def run():
+        pool.start()
+        for job in jobs:
+            pool.submit(job)
+        await pool.stop()
+
+    asyncio.run(run())
+    assert sender.sent == [("a", "b", "reply to hi")]
+    assert pool.stats()["failed"] == 2
@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from benchmarks.fakes import FakeChatModel
+from lead_state import LeadState
+from metrics import TURNS
+from session_manager import SessionManager
+from session_store import SQLiteSessionStore
+
+INTEREST = "I want to buy a villa in Dubai Hills"
+
+
+class FlakyAnswers:
+    """PDF QA tool that answers, or raises once ``fail`` is set."""
+
+    def __init__(self):
+        self.fail = False
+
+    def stream_answer(self, *args):
+        if self.fail:
+            raise RuntimeError("vector store unavailable")
+        yield "Dubai Hills has villas."
+
+    async def astream_answer(self, *args):
+        if self.fail:
+            raise RuntimeError("vector store unavailable")
+        yield "Dubai Hills has villas."
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def sessions(request, tmp_path):
+    resources = SimpleNamespace(llm=FakeChatModel(latency=0), salesforce=SimpleNamespace(), pdf_qa_tool=FlakyAnswers())
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db")) if request.param == "sqlite" else None
+    manager = SessionManager(resources, store=store)
+    yield manager
+    if store is not None:
+        store.close()
+
+
+def test_failed_turn_leaves_the_session_as_it_was(sessions):
+    sessions.process("alice", "What is Emaar Beachfront?")
+    agent = sessions.get("alice")
+    history = list(agent.conversation_history)
+    sessions.resources.pdf_qa_tool.fail = True
+    with pytest.raises(RuntimeError):
+        sessions.process("alice", INTEREST)
+    assert agent.lead_tool.state == LeadState.NO_INTEREST
+    assert list(agent.conversation_history) == history
+    sessions.resources.pdf_qa_tool.fail = False
+    assert sessions.process("alice", INTEREST)["lead_state"] != LeadState.NO_INTEREST.value
+    assert len(agent.conversation_history) == len(history) + 2
+
+
+def test_failed_async_turn_leaves_the_session_as_it_was(sessions):
+    async def run():
+        await sessions.aprocess("bob", "What is Emaar Beachfront?")
+        sessions.resources.pdf_qa_tool.fail = True
+        with pytest.raises(RuntimeError):
+            await sessions.aprocess("bob", INTEREST)
+
+    asyncio.run(run())
+    agent = sessions.get("bob")
+    assert agent.lead_tool.state == LeadState.NO_INTEREST
+    assert len(agent.conversation_history) == 2
+
+
+def test_abandoned_stream_is_rolled_back(sessions):
+    events = sessions.stream("carol", INTEREST)
+    next(events)
+    events.close()
+    agent = sessions.get("carol")
+    assert agent.lead_tool.state == LeadState.NO_INTEREST
+    assert list(agent.conversation_history) == []
+
+
+def turns_counted() -> float:
+    return sum(TURNS.value(lead_state=state.value) for state in LeadState)
+
+
+def test_agent_stream_closed_early_restores_the_turn_and_counts_it(sessions):
+    agent = sessions.get("dave")
+    counted = turns_counted()
+    events = agent.stream(INTEREST)
+    next(events)
+    events.close()
+    assert agent.lead_tool.state == LeadState.NO_INTEREST
+    assert agent.lead_tool.partial_lead_info == {}
+    assert list(agent.conversation_history) == []
+    assert turns_counted() == counted + 1
+
+
+def test_agent_stream_closed_after_the_final_event_keeps_the_turn(sessions):
+    agent = sessions.get("erin")
+    events = agent.stream(INTEREST)
+    for event in events:
+        if event["type"] == "final":
+            break
+    events.close()
+    assert agent.lead_tool.state != LeadState.NO_INTEREST
+    assert len(agent.conversation_history) == 2
@@ -0,0 +1,173 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import IO, Any, Dict, List, Tuple
+import logging
+
+TRANSCRIPT_DIR = os.getenv("TRANSCRIPT_DIR", "chat_history")
+# Buffered lines are written at least this often (seconds), or sooner once this many bytes are waiting.
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", "1.0"))
+TRANSCRIPT_FLUSH_BYTES = int(os.getenv("TRANSCRIPT_FLUSH_BYTES", str(64 * 1024)))
+# "always": fsync after every write batch; "interval": at most every TRANSCRIPT_FSYNC_INTERVAL
+# seconds; "never": leave it to the OS.
+TRANSCRIPT_FSYNC = os.getenv("TRANSCRIPT_FSYNC", "interval")
+TRANSCRIPT_FSYNC_INTERVAL = float(os.getenv("TRANSCRIPT_FSYNC_INTERVAL", "5.0"))
+FSYNC_POLICIES = ("always", "interval", "never")
+# Open append handles kept around; one per active transcript.
+MAX_OPEN_FILES = 64
+
+
+def message_record(session_id: str, role: str, content: str) -> Dict[str, Any]:
+    return {"session_id": session_id, "ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "role": role, "content": content}
+
+
+class TranscriptWriter:
+    """Append-only JSONL chat transcripts, one compact line per message.
+
+    ``append`` only queues the line; a background thread appends queued lines
+    to their files in batches, so the caller never waits on disk I/O and each
+    message is written once.
+    """
+
+    def __init__(self, flush_interval: float = TRANSCRIPT_FLUSH_INTERVAL, flush_bytes: int = TRANSCRIPT_FLUSH_BYTES,
+                 fsync: str = TRANSCRIPT_FSYNC, fsync_interval: float = TRANSCRIPT_FSYNC_INTERVAL):
+        self.logger = logging.getLogger("transcript_writer")
+        handler = logging.StreamHandler()
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+        handler.setFormatter(formatter)
+        if not self.logger.hasHandlers():
+            self.logger.addHandler(handler)
+        self.logger.setLevel(logging.INFO)
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._buffer: List[Tuple[str, str]] = []
+        self._buffered_bytes = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # Held while taking and writing a batch, so batches reach the files in order.
+        self._write_lock = threading.Lock()
+        self._handles: "OrderedDict[str, IO[str]]" = OrderedDict()
+        self._dirty = set()
+        self._last_fsync = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="transcript-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, path: str, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n"
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("TranscriptWriter is closed")
+            self._buffer.append((path, line))
+            self._buffered_bytes += len(line)
+            if self._buffered_bytes >= self.flush_bytes:
+                self._cond.notify()
+
+    def flush(self) -> None:
+        """Write everything queued so far before returning."""
+        self._write_pending()
+
+    def close(self) -> None:
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        with self._write_lock:
+            for f in self._handles.values():
+                self._close_handle(f)
+            self._handles.clear()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if not self._closed and self._buffered_bytes < self.flush_bytes:
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            self._write_pending()
+            if closed:
+                return
+
+    def _write_pending(self) -> None:
+        with self._write_lock:
+            with self._cond:
+                batch, self._buffer, self._buffered_bytes = self._buffer, [], 0
+            if not batch:
+                return
+            by_path: Dict[str, List[str]] = {}
+            for path, line in batch:
+                by_path.setdefault(path, []).append(line)
+            for path, lines in by_path.items():
+                try:
+                    f = self._handle(path)
+                    f.write("".join(lines))
+                    f.flush()
+                    self._dirty.add(path)
+                except OSError as e:
+                    self.logger.error(f"Failed to write {len(lines)} transcript lines to {path}: {e}")
+            now = time.monotonic()
+            if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+                for path in self._dirty:
+                    if path in self._handles:
+                        os.fsync(self._handles[path].fileno())
+                self._dirty.clear()
+                self._last_fsync = now
+
+    def _handle(self, path: str) -> IO[str]:
+        f = self._handles.get(path)
+        if f is not None:
+            self._handles.move_to_end(path)
+            return f
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(path, "a", encoding="utf-8")
+        self._handles[path] = f
+        while len(self._handles) > MAX_OPEN_FILES:
+            _, old = self._handles.popitem(last=False)
+            self._close_handle(old)
+        return f
+
+    def _close_handle(self, f: IO[str]) -> None:
+        try:
+            f.flush()
+            if self.fsync != "never":
+                os.fsync(f.fileno())
+            f.close()
+        except OSError as e:
+            self.logger.error(f"Failed to close transcript {f.name}: {e}")
+        self._dirty.discard(f.name)
+
+
+def read_transcript(path: str) -> List[Dict[str, Any]]:
+    """Every record in a transcript; a line torn by a crash mid-write is skipped."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def load_session(path: str) -> Dict[str, Any]:
+    """Rebuild a session (``session_id``, ``last_updated``, ``messages``) from its transcript."""
+    records = read_transcript(path)
+    return {
+        "session_id": records[0].get("session_id") if records else None,
+        "last_updated": records[-1].get("ts") if records else None,
+        "messages": [{"role": r["role"], "content": r["content"]} for r in records],
+    }
@@ -1,24 +1,131 @@
-from fastapi import FastAPI, Request
+import os
+from typing import List, Optional
+from fastapi import Request
 from fastapi.responses import Response
 from twilio.twiml.messaging_response import MessagingResponse
-from main import SalesRAGAgent
+from app_factory import create_app
+from reply_dispatcher import ReplyWorkerPool, TurnJob, TwilioReplySender
+from idempotency import IdempotencyStore
+from message_coalescer import InboundMessage, MessageCoalescer, coalesce_gap, merge_bodies
+from metrics import REGISTRY
 
-app = FastAPI()
+# "1": acknowledge the webhook immediately and deliver the reply through the Twilio messages API
+ASYNC_REPLIES = os.getenv("WHATSAPP_ASYNC_REPLIES", "0") == "1"
 
-# Initialize chatbot with the specific PDF
+# Shared LLM client, PDF index and Salesforce client, loaded in the background (APP_WARMUP);
+# one lightweight session per sender, kept in SESSION_STORE (sqlite/redis) when several workers serve the webhook
 pdf_path = '/home/ubuntu/WhatsappWithTwilio/Emaar_FAQ.pdf'
-chatbot = SalesRAGAgent(pdf_path)
+app = create_app(pdf_path)
+lazy_sessions = app.state.sessions
+# Twilio re-delivers slow webhooks; turns are keyed on MessageSid so a retry never runs twice
+idempotency = IdempotencyStore()
+
+async def process_turn(sender: str, user_input: str) -> str:
+    sessions = await lazy_sessions.aget()
+    return (await sessions.aprocess(sender, user_input))['response']
+
+async def process_claimed_turn(message_sid: str, sender: str, user_input: str) -> str:
+    try:
+        reply_text = await process_turn(sender, user_input)
+    except BaseException as e:
+        if message_sid:
+            idempotency.fail(message_sid, e)
+        raise
+    if message_sid:
+        idempotency.complete(message_sid, reply_text)
+    return reply_text
+
+async def process_job(job: TurnJob) -> str:
+    return await process_claimed_turn(job.message_sid, job.sender, job.body)
+
+reply_pool = ReplyWorkerPool(process_job, TwilioReplySender()) if ASYNC_REPLIES else None
+
+async def process_burst(sender: str, messages: List[InboundMessage]) -> Optional[str]:
+    user_input = merge_bodies(messages)
+    if reply_pool is None:
+        return await process_turn(sender, user_input)
+    # The burst's single reply answers the earlier MessageSids too.
+    for message in messages[:-1]:
+        if message.message_sid:
+            idempotency.complete(message.message_sid, None)
+    last = messages[-1]
+    if reply_pool.submit(TurnJob(sender, last.to, user_input, last.message_sid)):
+        return None
+    # The webhook has already been answered, so a reply that can't be queued is sent from here.
+    try:
+        reply_text = await process_claimed_turn(last.message_sid, sender, user_input)
+    except Exception:
+        await reply_pool.send_failure_notice(sender, last.to)
+        raise
+    await reply_pool.reply_sender.send(sender, last.to, reply_text)
+    return reply_text
+
+# Quick successive messages from a sender ("hi" / "I'm interested" / "my name is X") become one turn;
+# on by default only with fast-ack replies, since it delays each turn by the gap (WHATSAPP_COALESCE_GAP)
+coalescer = MessageCoalescer(process_burst, gap=coalesce_gap(fast_ack=ASYNC_REPLIES))
+
+def session_count() -> int:
+    return len(lazy_sessions.sessions) if lazy_sessions.sessions is not None else 0
+
+def session_memory_bytes() -> int:
+    return lazy_sessions.sessions.memory_bytes if lazy_sessions.sessions is not None else 0
+
+REGISTRY.gauge("chatbot_sessions", "Active conversation sessions.", session_count)
+REGISTRY.gauge("chatbot_session_memory_bytes", "Estimated memory held by conversation sessions.", session_memory_bytes)
+if reply_pool is not None:
+    REGISTRY.gauge("chatbot_reply_queue_depth", "Turns waiting for a reply worker.", lambda: reply_pool.stats()["queue_depth"])
+
+@app.on_event("startup")
+async def startup_event():
+    if reply_pool is not None:
+        reply_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await coalescer.stop()
+    if reply_pool is not None:
+        await reply_pool.stop()
+
+def twiml(reply_text: str = None) -> Response:
+    twilio_resp = MessagingResponse()
+    if reply_text:
+        twilio_resp.message(reply_text)
+    return Response(content=str(twilio_resp), media_type="application/xml")
 
 @app.post("/webhook/whatsapp")
 async def whatsapp_webhook(request: Request):
     form = await request.form()
     user_input = form.get('Body', '')
-    
-    # Use the correct method from SalesRAGAgent
-    reply_text = chatbot.process(user_input)['response']
+    sender = form.get('From', '')
+    message_sid = form.get('MessageSid')
+    # While cold, answer 503 before claiming the MessageSid so Twilio's retry is processed.
+    await lazy_sessions.aget()
+
+    if reply_pool is not None:
+        # The reply for a known MessageSid is already queued or sent out of band.
+        if message_sid and not idempotency.claim(message_sid):
+            return twiml()
+        if coalescer.enabled:
+            coalescer.add(sender, user_input, message_sid, form.get('To', ''))
+            return twiml()
+        # Fast ack: empty TwiML now, reply later from a worker. Falls back to inline if the queue is full.
+        if reply_pool.submit(TurnJob(sender, form.get('To', ''), user_input, message_sid)):
+            return twiml()
+        reply_text = await process_claimed_turn(message_sid, sender, user_input)
+    elif coalescer.enabled:
+        # Only the burst's newest message gets the reply; the earlier ones are answered with empty TwiML.
+        reply_text = await idempotency.run(
+            message_sid, lambda: coalescer.submit(sender, user_input, message_sid, form.get('To', '')))
+    else:
+        reply_text = await idempotency.run(message_sid, lambda: process_turn(sender, user_input))
 
     # Twilio WhatsApp response
-    twilio_resp = MessagingResponse()
-    twilio_resp.message(reply_text)
-    
-    return Response(content=str(twilio_resp), media_type="application/xml")
+    return twiml(reply_text)
+
+@app.get("/webhook/whatsapp/stats")
+async def whatsapp_stats():
+    stats = {"sessions": session_count(), "session_memory_bytes": session_memory_bytes(),
+             "idempotency": idempotency.stats(), **coalescer.stats()}
+    if reply_pool is not None:
+        stats.update(reply_pool.stats())
+    return stats